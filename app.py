@@ -1,10 +1,20 @@
 from flask import Flask
 from flask_cors import CORS
-from flasgger import Swagger
 from config import Config
 from routes.datasets import datasets_bp
 from routes.quality_logs import quality_logs_bp
-from utils.database import init_db
+from routes.admin import admin_bp
+from routes.jobs import jobs_bp
+from utils.database import init_db, get_db
+from utils.apidocs import init_apidocs
+from utils.change_stream import start_change_stream_listener
+from utils.metrics import init_metrics
+from utils.admission import init_admission
+from utils.profiling import init_profiling
+from utils.resilience import init_resilience
+from utils.commands import register_commands
+from services.quality_log_service import publish_quality_log_change
+from services.storage.snapshot import apply_catalog_change
 
 def create_app():
     app = Flask(__name__)
@@ -14,23 +24,31 @@ def create_app():
     
     CORS(app)
     
-    swagger = Swagger(app, template={
-        "swagger": "2.0",
-        "info": {
-            "title": "Dataset Catalog API",
-            "description": "A lightweight API for managing datasets and quality logs",
-            "version": "1.0.0"
-        },
-        "host": "localhost:5000",
-        "basePath": "/",
-        "schemes": ["http"]
-    })
+    if app.config['METRICS_ENABLED']:
+        init_metrics(app)
     
-
-    init_db()
+    if app.config['ADMISSION_ENABLED']:
+        init_admission(app)
+    
+    init_resilience(app)
+    
+    if app.config['ADMIN_TOKEN'] or app.config['PROFILING_SAMPLE_RATE'] > 0:
+        init_profiling(app)
+    
+    init_apidocs(app)
     
     app.register_blueprint(datasets_bp)
     app.register_blueprint(quality_logs_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(jobs_bp)
+    
+    register_commands(app)
+    
+    if app.config['CHANGE_STREAMS_ENABLED'] and Config.STORAGE_BACKEND == 'mongo':
+        listener = start_change_stream_listener(get_db())
+        listener.add_handler(publish_quality_log_change)
+        if Config.CATALOG_SNAPSHOT_ENABLED:
+            listener.add_handler(apply_catalog_change)
     
     @app.route('/')
     def index():
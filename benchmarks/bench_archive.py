@@ -0,0 +1,116 @@
+"""
+Measure what partial indexes and archival save on a catalog where a share of
+the datasets are soft-deleted: total index size of the datasets collection and
+latency of the dataset queries, in three layouts:
+
+- legacy: the single-field indexes on name, owner, tags, created_at and is_deleted
+- partial: the INDEXES from utils.database, which only cover active datasets
+- archived: the partial indexes after the deleted datasets moved to datasets_archive
+
+Needs a mongod; the catalog is written to MONGODB_DB.
+
+    python benchmarks/bench_archive.py --datasets 200000 --deleted-fraction 0.4
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from pymongo import IndexModel
+from benchmarks.bench_storage import time_operations
+from benchmarks.generator import CatalogSpec, load_catalog, owner_name, tag_name
+from services.dataset_service import DatasetService
+from services.storage.mongo import MongoDatasetRepository
+
+LEGACY_INDEXES = [
+    IndexModel("name"),
+    IndexModel("owner"),
+    IndexModel("tags"),
+    IndexModel([("created_at", -1)]),
+    IndexModel("is_deleted"),
+    IndexModel([("last_quality_status", 1), ("last_quality_at", -1)])
+]
+
+def operations(datasets, spec, sample):
+    return {
+        "list_all": lambda: datasets.list_active(None, None, 0, 20),
+        "list_page_50": lambda: datasets.list_active(None, None, 50 * 20, 20),
+        "list_owner": lambda: datasets.list_active(owner_name(0), None, 0, 20),
+        "list_tag": lambda: datasets.list_active(None, tag_name(0), 0, 20),
+        "list_rare_tag": lambda: datasets.list_active(None, tag_name(spec.num_tags - 1), 0, 20),
+        "count_all": lambda: datasets.count_active(),
+        "count_owner": lambda: datasets.count_active(owner_name(0)),
+        "by_name": lambda: datasets.find_active_by_name(sample["name"], sample["owner"]),
+        "top_tags": lambda: datasets.top_tags(10),
+        "failing": lambda: datasets.failing_datasets(None, None, 10)
+    }
+
+def index_sizes(db):
+    stats = db.command("collStats", "datasets")
+    return stats["totalIndexSize"], stats["indexSizes"]
+
+def soft_delete_fraction(db, fraction, deleted_at):
+    """Soft-delete every dataset whose position in _id order falls in the deleted fraction"""
+    step = max(1, round(1 / fraction)) if fraction else 0
+    if not step:
+        return 0
+    ids = [doc["_id"] for index, doc in enumerate(db.datasets.find({}, {"_id": 1}).sort("_id", 1))
+           if index % step == 0]
+    db.datasets.update_many({"_id": {"$in": ids}}, {"$set": {"is_deleted": True, "updated_at": deleted_at}})
+    return len(ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=100000)
+    parser.add_argument('--deleted-fraction', type=float, default=0.3)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from utils.database import init_db, get_db, create_indexes
+    init_db()
+    db = get_db()
+    spec = CatalogSpec(num_datasets=args.datasets, logs_per_dataset=0, seed=args.seed)
+    load_catalog(db, spec)
+    db.datasets_archive.drop()
+
+    deleted = soft_delete_fraction(db, args.deleted_fraction, datetime.utcnow() - timedelta(days=365))
+    repository = MongoDatasetRepository(db)
+    repository.rebuild_facets()
+    sample = db.datasets.find_one({"is_deleted": False})
+    print(f"{args.datasets} datasets, {deleted} soft-deleted")
+
+    results, sizes = {}, {}
+
+    db.datasets.drop_indexes()
+    db.datasets.create_indexes(LEGACY_INDEXES)
+    sizes["legacy"] = index_sizes(db)
+    results["legacy"] = time_operations(operations(repository, spec, sample), args.runs)
+
+    db.datasets.drop_indexes()
+    create_indexes()
+    sizes["partial"] = index_sizes(db)
+    results["partial"] = time_operations(operations(repository, spec, sample), args.runs)
+
+    archived = DatasetService().archive_deleted_datasets(grace_days=0, batch_size=1000)["datasets"]
+    db.command("compact", "datasets")
+    sizes["archived"] = index_sizes(db)
+    results["archived"] = time_operations(operations(repository, spec, sample), args.runs)
+    print(f"Archived {archived} datasets")
+
+    print("\nIndex size of the datasets collection:")
+    for layout, (total, per_index) in sizes.items():
+        detail = ", ".join(f"{name} {size / 1024:.0f} KiB" for name, size in sorted(per_index.items()))
+        print(f"{layout:>10}: {total / 1024 / 1024:8.2f} MiB  ({detail})")
+
+    layouts = list(results)
+    print(f"\n{'operation':>16}" + "".join(f"{l + ' p50':>16}{l + ' p95':>16}" for l in layouts))
+    for name in results["legacy"]:
+        row = "".join(f"{results[l][name][0]:14.3f}ms{results[l][name][1]:14.3f}ms" for l in layouts)
+        print(f"{name:>16}{row}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare response formats on the routes that return stored documents: JSON
+(decode, serialize_doc, jsonify), MessagePack (decode, serialize_doc, pack)
+and BSON (raw documents copied through). For each route and format, reports
+wall-clock p50/p95, CPU time per request in this process and response bytes.
+
+The mongo backend (default) needs a mongod and seeds MONGODB_DB; the memory
+backend has no raw documents to pass through, so its BSON numbers include
+encoding. MessagePack is skipped when msgpack is not installed.
+
+    python benchmarks/bench_formats.py --datasets 20000 --logs-per-dataset 200
+    python benchmarks/bench_formats.py --backend memory
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from benchmarks.generator import CatalogSpec, load_catalog, load_repositories, owner_name
+from config import Config
+from utils.formats import offered_formats
+
+def measure(client, path, accept, runs):
+    """Wall p50 and p95 in ms, mean CPU ms and response bytes of GET path"""
+    wall, cpu = [], []
+    size = 0
+    for _ in range(runs):
+        cpu_started, started = time.process_time(), time.perf_counter()
+        response = client.get(path, headers={'Accept': accept})
+        wall.append((time.perf_counter() - started) * 1000)
+        cpu.append((time.process_time() - cpu_started) * 1000)
+        assert response.status_code == 200 and response.mimetype == accept, (path, accept, response.status)
+        size = len(response.data)
+    wall.sort()
+    return statistics.median(wall), wall[min(int(len(wall) * 0.95), len(wall) - 1)], statistics.mean(cpu), size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=5000)
+    parser.add_argument('--logs-per-dataset', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100, help='Documents per page')
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backend', choices=('mongo', 'memory'), default='mongo')
+    args = parser.parse_args()
+
+    Config.STORAGE_BACKEND = args.backend
+    Config.METRICS_ENABLED = False
+    from app import create_app
+    from services.storage import get_dataset_repository, get_quality_log_repository
+    from utils.database import get_db
+    app = create_app()
+
+    spec = CatalogSpec(num_datasets=args.datasets, logs_per_dataset=args.logs_per_dataset, seed=args.seed)
+    started = time.perf_counter()
+    if args.backend == 'mongo':
+        load_catalog(get_db(), spec)
+        dataset_id = get_db().datasets.find_one({}, sort=[("created_at", -1)])["_id"]
+    else:
+        dataset_id = load_repositories(get_dataset_repository(), get_quality_log_repository(), spec)[-1]
+    print(f"Loaded {args.backend}: {args.datasets} datasets / {args.datasets * args.logs_per_dataset} logs "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    routes = {
+        "datasets page": f"/datasets?limit={args.limit}",
+        "owner page": f"/datasets?owner={owner_name(0)}&limit={args.limit}",
+        "dataset": f"/datasets/{dataset_id}",
+        "quality logs page": f"/datasets/{dataset_id}/quality-logs?limit={args.limit}"
+    }
+    client = app.test_client()
+    print(f"\n{'route':>18}{'format':>22}{'p50':>12}{'p95':>12}{'cpu/req':>12}{'bytes':>10}")
+    for name, path in routes.items():
+        for accept in offered_formats(raw_bson=True):
+            measure(client, path, accept, 5)
+            p50, p95, cpu, size = measure(client, path, accept, args.runs)
+            print(f"{name:>18}{accept:>22}{p50:10.3f}ms{p95:10.3f}ms{cpu:10.3f}ms{size:10d}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure the throughput cost of request and MongoDB command instrumentation.
+
+Runs the same request mix through the Flask test client with METRICS_ENABLED
+on and off, each in its own process (the MongoDB command listener is bound to
+the process-wide client), alternating rounds to cancel out drift. Fails if the
+instrumented throughput is more than --max-overhead percent lower.
+
+    python benchmarks/bench_metrics_overhead.py --requests 5000 --rounds 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+def run_worker(metrics_enabled, num_requests):
+    from config import Config
+    Config.METRICS_ENABLED = metrics_enabled
+    Config.CACHE_TTL_SECONDS = 0
+    
+    from app import create_app
+    client = create_app().test_client()
+    
+    client.post('/datasets', json={"name": "bench", "owner": "bench", "tags": ["bench"]})
+    dataset_id = client.get('/datasets?owner=bench').get_json()['data']['datasets'][0]['id']
+    paths = ['/', '/datasets?owner=bench', f'/datasets/{dataset_id}', f'/datasets/{dataset_id}/quality-summary']
+    
+    for i in range(num_requests // 10):
+        client.get(paths[i % len(paths)])
+    
+    started = time.perf_counter()
+    for i in range(num_requests):
+        response = client.get(paths[i % len(paths)])
+        assert response.status_code < 500, response.data
+    
+    return num_requests / (time.perf_counter() - started)
+
+def spawn(metrics_enabled, num_requests):
+    output = subprocess.check_output([
+        sys.executable, __file__, '--worker',
+        '--metrics' if metrics_enabled else '--no-metrics',
+        '--requests', str(num_requests)
+    ])
+    return json.loads(output.decode().strip().splitlines()[-1])['rps']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--max-overhead', type=float, default=2.0, help='Maximum allowed overhead in percent')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--metrics', dest='metrics', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--no-metrics', dest='metrics', action='store_false', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        print(json.dumps({"rps": run_worker(args.metrics, args.requests)}))
+        return
+    
+    plain_rps, instrumented_rps = [], []
+    for _ in range(args.rounds):
+        plain_rps.append(spawn(False, args.requests))
+        instrumented_rps.append(spawn(True, args.requests))
+    
+    best_plain = max(plain_rps)
+    best_instrumented = max(instrumented_rps)
+    overhead = (best_plain - best_instrumented) / best_plain * 100
+    
+    print(f"uninstrumented: {best_plain:8.0f} req/s")
+    print(f"instrumented:   {best_instrumented:8.0f} req/s")
+    print(f"overhead:       {overhead:8.2f}% (limit {args.max_overhead}%)")
+    
+    sys.exit(1 if overhead > args.max_overhead else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark GET /quality-overview on a large synthetic catalog.
+
+Seeds a dedicated database (100k datasets and 10M quality logs by default)
+with the deterministic generator and times the overview aggregation.
+
+    python benchmarks/bench_quality_overview.py --datasets 100000 --logs-per-dataset 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from benchmarks.generator import CatalogSpec, load_catalog, owner_name, tag_name
+from utils.database import init_db, get_db
+from services.quality_log_service import QualityLogService
+
+TARGET_P95_MS = 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=100000)
+    parser.add_argument('--logs-per-dataset', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded data')
+    parser.add_argument('--target-p95-ms', type=float, default=TARGET_P95_MS)
+    args = parser.parse_args()
+    
+    init_db()
+    db = get_db()
+    
+    if not args.skip_seed:
+        spec = CatalogSpec(
+            num_datasets=args.datasets,
+            logs_per_dataset=args.logs_per_dataset,
+            seed=args.seed,
+            history_days=14,
+            end_time=datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        )
+        started = time.perf_counter()
+        load_catalog(db, spec)
+        print(f"Seeded {args.datasets} datasets / {args.datasets * args.logs_per_dataset} logs "
+              f"in {time.perf_counter() - started:.1f}s")
+    
+    service = QualityLogService()
+    scenarios = {
+        "global": {},
+        "owner": {"owner": owner_name(0)},
+        "tag": {"tag": tag_name(0)}
+    }
+    
+    failed = False
+    for name, params in scenarios.items():
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            service.get_quality_overview(limit=10, days=7, **params)
+            timings.append((time.perf_counter() - started) * 1000)
+        
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        verdict = "OK" if p95 <= args.target_p95_ms else "OVER TARGET"
+        failed = failed or p95 > args.target_p95_ms
+        print(f"{name:>8}: p50={p50:8.1f}ms p95={p95:8.1f}ms target={args.target_p95_ms:.0f}ms {verdict}")
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
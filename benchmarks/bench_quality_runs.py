@@ -0,0 +1,120 @@
+"""
+Measure what run-length encoding saves on quality history where datasets
+report the same status many times in a row: documents, data and index size
+of quality_logs against quality_status_runs, and latency of the questions
+the runs answer, asked of raw logs and of runs:
+
+- failing_since: when did the dataset's current status start
+- transitions: the dataset's last 20 status flips
+
+Each dataset's statuses follow a two-state chain that flips with
+--flip-rate per check. Needs a mongod; the history is written to MONGODB_DB.
+
+    python benchmarks/bench_quality_runs.py --datasets 1000 --logs-per-dataset 5000 --flip-rate 0.002
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from benchmarks.bench_storage import time_operations
+from benchmarks.generator import BATCH_SIZE, CatalogSpec, DEFAULT_END_TIME, _batched, generate_datasets
+from services.quality_log_service import QualityLogService
+
+def generate_streaky_logs(dataset_ids, logs_per_dataset, flip_rate, seed):
+    """Yield quality logs one minute apart whose status flips with probability flip_rate per check"""
+    rng = random.Random(seed)
+    start = DEFAULT_END_TIME - timedelta(minutes=logs_per_dataset)
+    for dataset_id in dataset_ids:
+        status = "PASS"
+        for index in range(logs_per_dataset):
+            if rng.random() < flip_rate:
+                status = "FAIL" if status == "PASS" else "PASS"
+            yield {
+                "dataset_id": dataset_id,
+                "status": status,
+                "details": f"{status.lower()}ed {index} checks",
+                "timestamp": start + timedelta(minutes=index)
+            }
+
+def failing_since_from_logs(db, dataset_id):
+    latest = db.quality_logs.find_one({"dataset_id": dataset_id}, sort=[("timestamp", -1)])
+    flipped = db.quality_logs.find_one(
+        {"dataset_id": dataset_id, "status": {"$ne": latest["status"]}}, sort=[("timestamp", -1)]
+    )
+    query = {"dataset_id": dataset_id}
+    if flipped is not None:
+        query["timestamp"] = {"$gt": flipped["timestamp"]}
+    return db.quality_logs.find_one(query, sort=[("timestamp", 1)])["timestamp"]
+
+def transitions_from_logs(db, dataset_id, limit):
+    pipeline = [
+        {"$match": {"dataset_id": dataset_id}},
+        {"$setWindowFields": {
+            "sortBy": {"timestamp": 1},
+            "output": {"previous_status": {"$shift": {"output": "$status", "by": -1}}}
+        }},
+        {"$match": {"previous_status": {"$ne": None}, "$expr": {"$ne": ["$status", "$previous_status"]}}},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": limit}
+    ]
+    return list(db.quality_logs.aggregate(pipeline, allowDiskUse=True))
+
+def collection_size(db, name):
+    stats = db.command("collStats", name)
+    return stats["count"], stats["size"], stats["storageSize"], stats["totalIndexSize"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=500)
+    parser.add_argument('--logs-per-dataset', type=int, default=2000)
+    parser.add_argument('--flip-rate', type=float, default=0.005)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from utils.database import init_db, get_db, create_indexes
+    init_db()
+    db = get_db()
+    for name in ("datasets", "quality_logs", "quality_log_buckets", "quality_status_runs"):
+        db[name].drop()
+    create_indexes()
+
+    spec = CatalogSpec(num_datasets=args.datasets, logs_per_dataset=0, seed=args.seed)
+    dataset_ids = []
+    for batch in _batched(generate_datasets(spec), BATCH_SIZE):
+        dataset_ids.extend(db.datasets.insert_many(batch, ordered=False).inserted_ids)
+    logs = generate_streaky_logs(dataset_ids, args.logs_per_dataset, args.flip_rate, args.seed)
+    for batch in _batched(logs, BATCH_SIZE):
+        db.quality_logs.insert_many(batch, ordered=False)
+
+    service = QualityLogService()
+    started = time.perf_counter()
+    service.rebuild_quality_runs()
+    print(f"Migrated {args.datasets * args.logs_per_dataset} logs to runs in {time.perf_counter() - started:.1f}s")
+
+    print(f"\n{'collection':>20}{'documents':>12}{'data MiB':>12}{'storage MiB':>14}{'index MiB':>12}")
+    for name in ("quality_logs", "quality_status_runs"):
+        count, size, storage, indexes = collection_size(db, name)
+        print(f"{name:>20}{count:12d}{size / 2**20:12.2f}{storage / 2**20:14.2f}{indexes / 2**20:12.2f}")
+
+    sample = [str(dataset_id) for dataset_id in dataset_ids[:: max(1, len(dataset_ids) // args.runs)]]
+    picks = iter(sample * args.runs * 2)
+    operations = {
+        "failing_since logs": lambda: failing_since_from_logs(db, ObjectId(next(picks))),
+        "failing_since runs": lambda: service.get_quality_transitions(next(picks), 0)["since"],
+        "transitions logs": lambda: transitions_from_logs(db, ObjectId(next(picks)), 20),
+        "transitions runs": lambda: service.get_quality_transitions(next(picks), 20)
+    }
+    print(f"\n{'operation':>20}{'p50':>12}{'p95':>12}")
+    for name, (p50, p95) in time_operations(operations, args.runs).items():
+        print(f"{name:>20}{p50:10.3f}ms{p95:10.3f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Measure the catalog snapshot: memory per dataset and listing latency, against
+the in-memory repository and, with --mongo, MongoDB.
+
+    python benchmarks/bench_snapshot.py --datasets 200000
+    python benchmarks/bench_snapshot.py --datasets 200000 --mongo
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from bson import ObjectId
+from benchmarks.generator import CatalogSpec, generate_datasets, load_catalog, owner_name, tag_name
+from services.storage.memory import MemoryDatasetRepository
+from services.storage.snapshot import CatalogSnapshot
+
+def measure_memory(build):
+    """Bytes allocated by build() that are still live afterwards, and its result"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+def build_snapshot(docs):
+    snapshot = CatalogSnapshot()
+    snapshot.load(docs)
+    return snapshot
+
+def build_memory(docs):
+    repository = MemoryDatasetRepository()
+    for doc in docs:
+        repository.insert(dict(doc))
+    return repository
+
+def operations(list_active, count_active, top_tags, spec):
+    return {
+        "list_all": lambda: list_active(None, None, 0, 20),
+        "list_page_50": lambda: list_active(None, None, 50 * 20, 20),
+        "list_owner": lambda: list_active(owner_name(0), None, 0, 20),
+        "list_tag": lambda: list_active(None, tag_name(0), 0, 20),
+        "list_rare_tag": lambda: list_active(None, tag_name(spec.num_tags - 1), 0, 20),
+        "list_owner_tag": lambda: list_active(owner_name(0), tag_name(0), 0, 20),
+        "count_all": lambda: count_active(None, None),
+        "count_owner_tag": lambda: count_active(owner_name(0), tag_name(0)),
+        "top_tags": lambda: top_tags(10)
+    }
+
+def time_operations(ops, runs):
+    results = {}
+    for name, op in ops.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            op()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[min(int(len(timings) * 0.95), len(timings) - 1)])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mongo', action='store_true', help='Also seed MONGODB_DB and time the same queries')
+    args = parser.parse_args()
+
+    spec = CatalogSpec(num_datasets=args.datasets, logs_per_dataset=0, seed=args.seed)
+
+    def documents():
+        return [dict(doc, _id=ObjectId()) for doc in generate_datasets(spec)]
+
+    # Each structure is built from freshly generated documents, so strings
+    # are not shared between them and every allocation is counted.
+    raw_bytes, _ = measure_memory(documents)
+    snapshot_bytes, snapshot = measure_memory(lambda: build_snapshot(documents()))
+    memory_bytes, repository = measure_memory(lambda: build_memory(documents()))
+
+    print(f"Memory per dataset ({args.datasets} datasets):")
+    print(f"{'list of dicts':>24}: {raw_bytes / args.datasets:8.0f} B")
+    print(f"{'catalog snapshot':>24}: {snapshot_bytes / args.datasets:8.0f} B")
+    print(f"{'in-memory repository':>24}: {memory_bytes / args.datasets:8.0f} B")
+
+    results = {
+        "snapshot": time_operations(operations(snapshot.list, snapshot.count, snapshot.top_tags, spec), args.runs),
+        "memory": time_operations(operations(repository.list_active, repository.count_active,
+                                             repository.top_tags, spec), args.runs)
+    }
+
+    if args.mongo:
+        from utils.database import init_db, get_db
+        from services.storage.mongo import MongoDatasetRepository
+        init_db()
+        load_catalog(get_db(), spec)
+        mongo = MongoDatasetRepository(get_db())
+        results["mongo"] = time_operations(operations(mongo.list_active, mongo.count_active,
+                                                      mongo.top_tags, spec), args.runs)
+
+    backends = list(results)
+    print(f"\n{'operation':>16}" + "".join(f"{b + ' p50':>16}{b + ' p95':>16}" for b in backends))
+    for name in results["snapshot"]:
+        row = "".join(f"{results[b][name][0]:14.3f}ms{results[b][name][1]:14.3f}ms" for b in backends)
+        print(f"{name:>16}{row}")
+
+if __name__ == '__main__':
+    main()
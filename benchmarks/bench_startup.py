@@ -0,0 +1,78 @@
+"""
+Measure worker cold start: importing the app, create_app(), and the first
+/apidocs spec request, each in a fresh interpreter.
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --storage-backend memory --import-profile
+
+--import-profile also prints the slowest modules from `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/apispec_1.json')
+assert response.status_code == 200, response.status_code
+spec = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_apispec_ms": (spec - created) * 1000
+}))
+"""
+
+def run_probe(env):
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def import_profile(env, top):
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        rows.append((int(cumulative_us), int(self_us), name))
+    rows.sort(reverse=True)
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--storage-backend', default=os.getenv('STORAGE_BACKEND', 'mongo'))
+    parser.add_argument('--index-build-mode', default=os.getenv('INDEX_BUILD_MODE', 'background'),
+                        help='startup, background or off')
+    parser.add_argument('--import-profile', action='store_true')
+    parser.add_argument('--top', type=int, default=20, help='Modules to show in the import profile')
+    args = parser.parse_args()
+
+    env = dict(os.environ, STORAGE_BACKEND=args.storage_backend, INDEX_BUILD_MODE=args.index_build_mode,
+               FLASK_DEBUG='false', CHANGE_STREAMS_ENABLED='false')
+    results = [run_probe(env) for _ in range(args.runs)]
+
+    print(f"{args.runs} cold starts, STORAGE_BACKEND={args.storage_backend}, INDEX_BUILD_MODE={args.index_build_mode}")
+    for key in ("import_ms", "create_app_ms", "first_apispec_ms"):
+        values = sorted(result[key] for result in results)
+        print(f"{key:>18}: median={statistics.median(values):8.1f}ms max={values[-1]:8.1f}ms")
+
+    if args.import_profile:
+        import_profile(env, args.top)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare the in-memory and MongoDB storage backends on the repository calls the
+services make: listing, filtering, counting, trends and the overview pass rates.
+
+Both backends are loaded with the same deterministic catalog. MongoDB uses a
+dedicated database; pass --backends memory to run without a mongod.
+
+    python benchmarks/bench_storage.py --datasets 20000 --logs-per-dataset 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from benchmarks.generator import CatalogSpec, load_catalog, load_repositories, owner_name, tag_name
+from services.storage.memory import MemoryDatasetRepository, MemoryQualityLogRepository
+from services.storage.mongo import MongoDatasetRepository, MongoQualityLogRepository
+
+def load_memory(spec):
+    datasets = MemoryDatasetRepository()
+    quality_logs = MemoryQualityLogRepository(datasets)
+    return datasets, quality_logs, load_repositories(datasets, quality_logs, spec)
+
+def load_mongo(spec):
+    from utils.database import init_db, get_db
+    init_db()
+    db = get_db()
+    dataset_ids = load_catalog(db, spec)
+    return MongoDatasetRepository(db), MongoQualityLogRepository(db), dataset_ids
+
+def operations(datasets, quality_logs, dataset_ids, spec):
+    end = spec.end_time
+    start = end - timedelta(days=spec.history_days)
+    trend_ids = dataset_ids[:10]
+    return {
+        "list_all": lambda: datasets.list_active(None, None, 0, 20),
+        "list_page_50": lambda: datasets.list_active(None, None, 50 * 20, 20),
+        "list_owner": lambda: datasets.list_active(owner_name(0), None, 0, 20),
+        "list_tag": lambda: datasets.list_active(None, tag_name(0), 0, 20),
+        "list_rare_tag": lambda: datasets.list_active(None, tag_name(spec.num_tags - 1), 0, 20),
+        "list_owner_tag": lambda: datasets.list_active(owner_name(0), tag_name(0), 0, 20),
+        "count_all": lambda: datasets.count_active(),
+        "count_tag": lambda: datasets.count_active(tag=tag_name(0)),
+        "top_tags": lambda: datasets.top_tags(10),
+        "logs_page": lambda: quality_logs.list_for_dataset(dataset_ids[0], 0, 20),
+        "trend_buckets": lambda: quality_logs.bucket_trend(trend_ids, start, end, "day"),
+        "trend_logs": lambda: quality_logs.log_trend(trend_ids, start, end, "day"),
+        "pass_rates_7d": lambda: quality_logs.pass_rates_since(end - timedelta(days=7), None, None, 10),
+        "failing": lambda: datasets.failing_datasets(None, None, 10)
+    }
+
+def time_operations(ops, runs):
+    results = {}
+    for name, op in ops.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            op()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[min(int(len(timings) * 0.95), len(timings) - 1)])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=20000)
+    parser.add_argument('--logs-per-dataset', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backends', default='memory,mongo', help='Comma-separated subset of memory,mongo')
+    args = parser.parse_args()
+
+    spec = CatalogSpec(num_datasets=args.datasets, logs_per_dataset=args.logs_per_dataset, seed=args.seed)
+    loaders = {"memory": load_memory, "mongo": load_mongo}
+
+    results = {}
+    for backend in [name for name in args.backends.split(',') if name]:
+        started = time.perf_counter()
+        datasets, quality_logs, dataset_ids = loaders[backend](spec)
+        print(f"Loaded {backend}: {args.datasets} datasets / {args.datasets * args.logs_per_dataset} logs "
+              f"in {time.perf_counter() - started:.1f}s")
+        results[backend] = time_operations(operations(datasets, quality_logs, dataset_ids, spec), args.runs)
+
+    backends = list(results)
+    if not backends:
+        parser.error("No backends selected")
+    print(f"{'operation':>16}" + "".join(f"{b + ' p50':>14}{b + ' p95':>14}" for b in backends))
+    for name in results[backends[0]]:
+        row = "".join(f"{results[b][name][0]:12.3f}ms{results[b][name][1]:12.3f}ms" for b in backends)
+        print(f"{name:>16}{row}")
+
+if __name__ == '__main__':
+    main()
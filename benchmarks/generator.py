@@ -0,0 +1,151 @@
+"""
+Deterministic synthetic catalog generator.
+
+Owners and tags follow a Zipf distribution, so a few owners and tags cover most
+datasets, as in real catalogs. The same seed and end time always produce the
+same documents.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+DEFAULT_END_TIME = datetime(2024, 1, 1)
+BATCH_SIZE = 10000
+
+def owner_name(index):
+    return f"owner_{index:05d}"
+
+def tag_name(index):
+    return f"tag_{index:04d}"
+
+def zipf_cum_weights(n, s):
+    """Cumulative Zipf weights for ranks 1..n, for random.choices"""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+class CatalogSpec:
+    """Parameters of a synthetic catalog"""
+
+    def __init__(self, num_datasets=1000, logs_per_dataset=50, seed=42, num_owners=None,
+                 num_tags=200, max_tags_per_dataset=5, zipf_s=1.1, fail_rate=0.1,
+                 history_days=30, end_time=DEFAULT_END_TIME):
+        self.num_datasets = num_datasets
+        self.logs_per_dataset = logs_per_dataset
+        self.seed = seed
+        self.num_owners = num_owners or max(num_datasets // 20, 1)
+        self.num_tags = num_tags
+        self.max_tags_per_dataset = max_tags_per_dataset
+        self.zipf_s = zipf_s
+        self.fail_rate = fail_rate
+        self.history_days = history_days
+        self.end_time = end_time
+
+    @property
+    def owners(self):
+        return [owner_name(i) for i in range(self.num_owners)]
+
+    @property
+    def tags(self):
+        return [tag_name(i) for i in range(self.num_tags)]
+
+def generate_datasets(spec):
+    """Yield dataset documents for a catalog spec"""
+    rng = random.Random(spec.seed)
+    owners, tags = spec.owners, spec.tags
+    owner_weights = zipf_cum_weights(len(owners), spec.zipf_s)
+    tag_weights = zipf_cum_weights(len(tags), spec.zipf_s)
+
+    for i in range(spec.num_datasets):
+        num_tags = rng.randint(1, spec.max_tags_per_dataset)
+        created_at = spec.end_time - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        yield {
+            "name": f"dataset_{i:07d}",
+            "owner": rng.choices(owners, cum_weights=owner_weights)[0],
+            "description": f"Synthetic dataset {i}",
+            "tags": sorted(set(rng.choices(tags, cum_weights=tag_weights, k=num_tags))),
+            "created_at": created_at,
+            "updated_at": created_at,
+            "is_deleted": False
+        }
+
+def generate_quality_logs(spec, dataset_ids):
+    """Yield quality log documents for each dataset ID, in dataset order"""
+    rng = random.Random(spec.seed + 1)
+    window = spec.history_days * 24 * 3600
+
+    for dataset_id in dataset_ids:
+        fail_rate = rng.random() * spec.fail_rate * 2
+        for _ in range(spec.logs_per_dataset):
+            yield {
+                "dataset_id": dataset_id,
+                "status": "FAIL" if rng.random() < fail_rate else "PASS",
+                "details": None,
+                "timestamp": spec.end_time - timedelta(seconds=rng.randint(0, window))
+            }
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def load_repositories(datasets, quality_logs, spec):
+    """Load a synthetic catalog into storage repositories, e.g. the in-memory backend"""
+    dataset_ids = [datasets.insert(doc) for doc in generate_datasets(spec)]
+    for log in generate_quality_logs(spec, dataset_ids):
+        quality_logs.insert(log)
+    quality_logs.rebuild_buckets()
+    quality_logs.rebuild_runs()
+    quality_logs.rebuild_latest_status()
+    return dataset_ids
+
+def rollback_writes(db, spec):
+    """Remove what load-test writes added after the catalog was seeded, so every run measures the same catalog
+
+    Seeded datasets and logs are dated at or before spec.end_time; anything
+    later was written through the API.
+    """
+    from services.storage.mongo import MongoDatasetRepository, MongoQualityLogRepository
+
+    cutoff = spec.end_time
+    affected = db.quality_logs.distinct("dataset_id", {"timestamp": {"$gt": cutoff}})
+    logs = db.quality_logs.delete_many({"timestamp": {"$gt": cutoff}}).deleted_count
+    datasets = db.datasets.delete_many({"created_at": {"$gt": cutoff}}).deleted_count
+    db.quality_log_buckets.delete_many({"bucket": {"$gt": cutoff}})
+    if affected:
+        MongoQualityLogRepository(db).rebuild_runs(affected)
+        MongoQualityLogRepository(db).rebuild_latest_status(affected)
+    if datasets:
+        MongoDatasetRepository(db).rebuild_facets()
+    return datasets, logs
+
+def load_catalog(db, spec):
+    """Replace the datasets and quality logs in db with a synthetic catalog"""
+    from utils.database import create_indexes
+    from services.dataset_service import DatasetService
+    from services.quality_log_service import QualityLogService
+
+    db.datasets.drop()
+    db.dataset_facets.drop()
+    db.quality_logs.drop()
+    db.quality_log_buckets.drop()
+    db.quality_status_runs.drop()
+    create_indexes()
+
+    dataset_ids = []
+    for batch in _batched(generate_datasets(spec), BATCH_SIZE):
+        dataset_ids.extend(db.datasets.insert_many(batch, ordered=False).inserted_ids)
+
+    for batch in _batched(generate_quality_logs(spec, dataset_ids), BATCH_SIZE):
+        db.quality_logs.insert_many(batch, ordered=False)
+
+    DatasetService().rebuild_facets()
+    service = QualityLogService()
+    service.rebuild_quality_buckets()
+    service.rebuild_quality_runs()
+    service.rebuild_latest_status()
+
+    return dataset_ids
@@ -0,0 +1,89 @@
+"""
+Throughput and latency percentiles, with baseline save and comparison.
+"""
+import json
+from collections import defaultdict
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def summarize(samples, elapsed_seconds):
+    """Summarize (scenario, latency_seconds, status) samples per scenario and overall"""
+    by_scenario = defaultdict(list)
+    errors = defaultdict(int)
+    for name, latency, status in samples:
+        by_scenario[name].append(latency)
+        if status is None or status >= 500:
+            errors[name] += 1
+
+    def stats(latencies, error_count):
+        latencies = sorted(latencies)
+        return {
+            "requests": len(latencies),
+            "errors": error_count,
+            "throughput_rps": len(latencies) / elapsed_seconds if elapsed_seconds else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000
+        }
+
+    report = {
+        "elapsed_seconds": elapsed_seconds,
+        "overall": stats([s[1] for s in samples], sum(errors.values())),
+        "scenarios": {
+            name: stats(latencies, errors[name])
+            for name, latencies in sorted(by_scenario.items())
+        }
+    }
+    return report
+
+def format_report(report):
+    lines = [f"{'scenario':<24}{'reqs':>8}{'errs':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    rows = list(report["scenarios"].items()) + [("overall", report["overall"])]
+    for name, stats in rows:
+        lines.append(
+            f"{name:<24}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>10.1f}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+def save_baseline(report, path, metadata=None):
+    with open(path, "w") as f:
+        json.dump(dict(report, metadata=metadata or {}), f, indent=2, sort_keys=True)
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(report, baseline, tolerance_percent=10.0):
+    """List regressions: throughput drops or p95/p99 increases beyond the tolerance"""
+    regressions = []
+    rows = dict(report["scenarios"], overall=report["overall"])
+    baseline_rows = dict(baseline["scenarios"], overall=baseline["overall"])
+
+    for name, base in baseline_rows.items():
+        current = rows.get(name)
+        if current is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+
+        if base["throughput_rps"] > 0:
+            drop = (base["throughput_rps"] - current["throughput_rps"]) / base["throughput_rps"] * 100
+            if drop > tolerance_percent:
+                regressions.append(
+                    f"{name}: throughput {current['throughput_rps']:.1f} rps is {drop:.1f}% below "
+                    f"baseline {base['throughput_rps']:.1f} rps"
+                )
+
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] > 0:
+                rise = (current[key] - base[key]) / base[key] * 100
+                if rise > tolerance_percent:
+                    regressions.append(
+                        f"{name}: {key} {current[key]:.2f} is {rise:.1f}% above baseline {base[key]:.2f}"
+                    )
+
+    return regressions
@@ -0,0 +1,160 @@
+"""
+Reproducible load test against a running API backed by a local mongod.
+
+    # seed a synthetic catalog, then hammer the API for 30s at 16 concurrent clients
+    python -m benchmarks.run --seed-data --datasets 10000 --logs-per-dataset 50 \
+        --concurrency 16 --duration 30 --save-baseline benchmarks/baseline.json
+
+    # later, on a new build, compare against the saved baseline
+    python -m benchmarks.run --concurrency 16 --duration 30 --compare benchmarks/baseline.json
+
+The API must use the same database as the seeder (MONGODB_URI / MONGODB_DB,
+default dataset_catalog_bench). Writes made by the load test are rolled back
+before and after each run, so every run measures the seeded catalog.
+
+    # no mongod: serve the API from this process on the in-memory backend
+    python -m benchmarks.run --in-process --compare benchmarks/baseline-memory.json
+"""
+import argparse
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DB', 'dataset_catalog_bench')
+
+from benchmarks.generator import CatalogSpec, DEFAULT_END_TIME, load_catalog, load_repositories, rollback_writes
+from benchmarks.report import summarize, format_report, save_baseline, load_baseline, compare
+from benchmarks.scenarios import SCENARIOS, RequestContext
+
+def worker(base_url, catalog, seed, deadline, scenarios, weights, samples):
+    ctx = RequestContext(base_url, catalog, seed, samples)
+    while time.monotonic() < deadline:
+        scenario = ctx.rng.choices(scenarios, weights=weights)[0]
+        scenario(ctx)
+
+def start_in_process_api(spec):
+    """Serve the API on a free local port from a memory-backed app seeded with spec"""
+    os.environ['STORAGE_BACKEND'] = 'memory'
+    from werkzeug.serving import make_server
+    from app import create_app
+    from services.storage import get_dataset_repository, get_quality_log_repository
+
+    dataset_ids = load_repositories(get_dataset_repository(), get_quality_log_repository(), spec)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", [str(i) for i in dataset_ids[:10000]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--seed-data', action='store_true', help='Replace the database with a synthetic catalog first')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Serve a freshly seeded in-memory API from this process instead of --base-url')
+    parser.add_argument('--datasets', type=int, default=1000)
+    parser.add_argument('--logs-per-dataset', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-time', default=DEFAULT_END_TIME.isoformat(),
+                        help='Latest synthetic log timestamp (ISO 8601)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Comma-separated subset of scenarios')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='Allowed regression in percent')
+    args = parser.parse_args()
+
+    spec = CatalogSpec(
+        num_datasets=args.datasets,
+        logs_per_dataset=args.logs_per_dataset,
+        seed=args.seed,
+        end_time=datetime.fromisoformat(args.end_time)
+    )
+
+    db = None
+    started = time.perf_counter()
+    if args.in_process:
+        base_url, dataset_ids = start_in_process_api(spec)
+    else:
+        from utils.database import init_db, get_db
+        init_db()
+        db = get_db()
+        base_url = args.base_url
+        if args.seed_data:
+            load_catalog(db, spec)
+        else:
+            rolled_back = rollback_writes(db, spec)
+            if any(rolled_back):
+                print(f"Rolled back {rolled_back[0]} datasets and {rolled_back[1]} logs from earlier runs")
+        dataset_ids = [str(d["_id"]) for d in db.datasets.find({"is_deleted": False}, {"_id": 1}).limit(10000)]
+    if args.in_process or args.seed_data:
+        print(f"Seeded {spec.num_datasets} datasets and {spec.num_datasets * spec.logs_per_dataset} logs "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    catalog = {
+        "dataset_ids": dataset_ids,
+        "owners": spec.owners,
+        "tags": spec.tags,
+        "end_time": spec.end_time
+    }
+    if not catalog["dataset_ids"]:
+        parser.error("No datasets found; run with --seed-data first")
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    scenarios = [SCENARIOS[name][0] for name in names]
+    weights = [SCENARIOS[name][1] for name in names]
+
+    per_worker = [[] for _ in range(args.concurrency)]
+    deadline = time.monotonic() + args.duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(worker, base_url, catalog, args.seed + i, deadline, scenarios, weights, per_worker[i])
+            for i in range(args.concurrency)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    samples = [sample for worker_samples in per_worker for sample in worker_samples]
+
+    if db is not None:
+        rollback_writes(db, spec)
+
+    report = summarize(samples, elapsed)
+    print(format_report(report))
+
+    if args.save_baseline:
+        save_baseline(report, args.save_baseline, metadata={
+            "datasets": spec.num_datasets,
+            "logs_per_dataset": spec.logs_per_dataset,
+            "seed": spec.seed,
+            "backend": "memory (in-process)" if args.in_process else "mongo",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "scenarios": names,
+            "python": platform.python_version(),
+            "recorded_at": datetime.utcnow().isoformat()
+        })
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        regressions = compare(report, load_baseline(args.compare), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Load-test scenarios covering every JSON route in routes/.
+
+The SSE routes are left out: a client that disconnects after the first bytes
+leaves a server thread blocked until the next heartbeat, which skews the
+latency of every other scenario.
+
+Each scenario issues one or more requests through a RequestContext, which
+keeps a persistent HTTP connection per worker thread and records the latency
+and status of every request.
+"""
+import http.client
+import json
+import random
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+class RequestContext:
+    """Per-thread HTTP connection, RNG and sample recorder"""
+
+    def __init__(self, base_url, catalog, seed, samples):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.catalog = catalog
+        self.rng = random.Random(seed)
+        self.samples = samples
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, name, method, path, body=None):
+        headers = {"Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        started = time.perf_counter()
+        status, data = None, None
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            status = response.status
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+        self.samples.append((name, time.perf_counter() - started, status))
+
+        if data and status is not None and status < 300:
+            try:
+                return json.loads(data)
+            except ValueError:
+                return None
+        return None
+
+    def dataset_id(self):
+        return self.rng.choice(self.catalog["dataset_ids"])
+
+    def owner(self):
+        return self.rng.choice(self.catalog["owners"][:20])
+
+    def tag(self):
+        return self.rng.choice(self.catalog["tags"][:20])
+
+def list_datasets(ctx):
+    ctx.request("list_datasets", "GET", f"/datasets?page={ctx.rng.randint(1, 5)}&limit=20")
+
+def list_datasets_by_owner(ctx):
+    ctx.request("list_datasets_by_owner", "GET", f"/datasets?owner={ctx.owner()}")
+
+def list_datasets_by_tag(ctx):
+    ctx.request("list_datasets_by_tag", "GET", f"/datasets?tag={ctx.tag()}")
+
+def get_dataset(ctx):
+    ctx.request("get_dataset", "GET", f"/datasets/{ctx.dataset_id()}")
+
+def dataset_stats(ctx):
+    ctx.request("dataset_stats", "GET", "/datasets/stats")
+
+def dataset_lifecycle(ctx):
+    name = f"bench_{ctx.rng.getrandbits(64):016x}"
+    created = ctx.request("create_dataset", "POST", "/datasets",
+                          {"name": name, "owner": ctx.owner(), "tags": [ctx.tag()]})
+    if not created:
+        return
+    dataset_id = created["data"]["id"]
+    ctx.request("update_dataset", "PUT", f"/datasets/{dataset_id}", {"description": "updated by benchmark"})
+    ctx.request("delete_dataset", "DELETE", f"/datasets/{dataset_id}")
+
+def create_quality_log(ctx):
+    status = "FAIL" if ctx.rng.random() < 0.1 else "PASS"
+    ctx.request("create_quality_log", "POST", f"/datasets/{ctx.dataset_id()}/quality-logs",
+                {"status": status, "details": "benchmark check"})
+
+def get_quality_logs(ctx):
+    ctx.request("get_quality_logs", "GET", f"/datasets/{ctx.dataset_id()}/quality-logs?page=1&limit=20")
+
+def quality_summary(ctx):
+    ctx.request("quality_summary", "GET", f"/datasets/{ctx.dataset_id()}/quality-summary")
+
+def quality_status(ctx):
+    ctx.request("quality_status", "GET", f"/datasets/{ctx.dataset_id()}/quality-status")
+
+def quality_trend(ctx):
+    end = ctx.catalog["end_time"]
+    start = end - timedelta(days=30)
+    ctx.request("quality_trend", "GET",
+                f"/datasets/{ctx.dataset_id()}/quality-trend?granularity=day"
+                f"&start={start.isoformat()}&end={end.isoformat()}")
+
+def multi_quality_trend(ctx):
+    end = ctx.catalog["end_time"]
+    start = end - timedelta(days=30)
+    ids = ",".join(ctx.rng.sample(ctx.catalog["dataset_ids"], min(10, len(ctx.catalog["dataset_ids"]))))
+    ctx.request("multi_quality_trend", "GET",
+                f"/quality-trend?dataset_ids={ids}&granularity=week"
+                f"&start={start.isoformat()}&end={end.isoformat()}")
+
+def quality_overview(ctx):
+    ctx.request("quality_overview", "GET", f"/quality-overview?limit=10&owner={ctx.owner()}")
+
+SCENARIOS = {
+    "list_datasets": (list_datasets, 10),
+    "list_datasets_by_owner": (list_datasets_by_owner, 5),
+    "list_datasets_by_tag": (list_datasets_by_tag, 5),
+    "get_dataset": (get_dataset, 20),
+    "dataset_stats": (dataset_stats, 2),
+    "dataset_lifecycle": (dataset_lifecycle, 2),
+    "create_quality_log": (create_quality_log, 15),
+    "get_quality_logs": (get_quality_logs, 10),
+    "quality_summary": (quality_summary, 8),
+    "quality_status": (quality_status, 10),
+    "quality_trend": (quality_trend, 5),
+    "multi_quality_trend": (multi_quality_trend, 2),
+    "quality_overview": (quality_overview, 2)
+}
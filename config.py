@@ -5,7 +5,92 @@ class Config:
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
     MONGODB_DB = os.getenv('MONGODB_DB', 'dataset_catalog')
     
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo')
+    CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', 'False').lower() == 'true'
+    CATALOG_SNAPSHOT_REFRESH_SECONDS = float(os.getenv('CATALOG_SNAPSHOT_REFRESH_SECONDS', '300'))
+    
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
     ITEMS_PER_PAGE = int(os.getenv('ITEMS_PER_PAGE', '20'))
+    
+    CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', '10'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_STALE_SECONDS = float(os.getenv('CACHE_STALE_SECONDS', '300'))
+    CACHE_SWR_SECONDS = float(os.getenv('CACHE_SWR_SECONDS', '30'))
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_REDIS_TIMEOUT_MS = int(os.getenv('CACHE_REDIS_TIMEOUT_MS', '100'))
+    CACHE_REDIS_RETRY_SECONDS = float(os.getenv('CACHE_REDIS_RETRY_SECONDS', '5'))
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'catalog:')
+    CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', '1024'))
+    
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_RATE_PER_SECOND = float(os.getenv('ADMISSION_RATE_PER_SECOND', '20'))
+    ADMISSION_BURST = float(os.getenv('ADMISSION_BURST', '100'))
+    ADMISSION_MAX_CLIENTS = int(os.getenv('ADMISSION_MAX_CLIENTS', '10000'))
+    ADMISSION_API_KEYS = [key for key in os.getenv('ADMISSION_API_KEYS', '').split(',') if key]
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '16'))
+    ADMISSION_MAX_QUEUED = int(os.getenv('ADMISSION_MAX_QUEUED', '32'))
+    ADMISSION_QUEUE_TIMEOUT_MS = int(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', '2000'))
+    ADMISSION_BACKEND = os.getenv('ADMISSION_BACKEND', 'local')
+    ADMISSION_REDIS_URL = os.getenv('ADMISSION_REDIS_URL', CACHE_REDIS_URL)
+    
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+    IDEMPOTENCY_WAIT_MS = int(os.getenv('IDEMPOTENCY_WAIT_MS', '10000'))
+    IDEMPOTENCY_LOCK_SECONDS = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '60'))
+    
+    MONGO_BUDGET_LOOKUP_MS = int(os.getenv('MONGO_BUDGET_LOOKUP_MS', '500'))
+    MONGO_BUDGET_LIST_MS = int(os.getenv('MONGO_BUDGET_LIST_MS', '2000'))
+    MONGO_BUDGET_AGGREGATE_MS = int(os.getenv('MONGO_BUDGET_AGGREGATE_MS', '5000'))
+    MONGO_BUDGET_WRITE_MS = int(os.getenv('MONGO_BUDGET_WRITE_MS', '2000'))
+    
+    MONGO_READ_PREFERENCE_LOOKUP = os.getenv('MONGO_READ_PREFERENCE_LOOKUP', 'primary')
+    MONGO_READ_PREFERENCE_LIST = os.getenv('MONGO_READ_PREFERENCE_LIST', 'primary')
+    MONGO_READ_PREFERENCE_AGGREGATE = os.getenv('MONGO_READ_PREFERENCE_AGGREGATE', 'primary')
+    MONGO_MAX_STALENESS_SECONDS = int(os.getenv('MONGO_MAX_STALENESS_SECONDS', '-1'))
+    MONGO_READ_CONCERN_LOOKUP = os.getenv('MONGO_READ_CONCERN_LOOKUP', '')
+    MONGO_READ_CONCERN_LIST = os.getenv('MONGO_READ_CONCERN_LIST', '')
+    MONGO_READ_CONCERN_AGGREGATE = os.getenv('MONGO_READ_CONCERN_AGGREGATE', '')
+    MONGO_WRITE_CONCERN = os.getenv('MONGO_WRITE_CONCERN', '')
+    
+    CIRCUIT_BREAKER_FAILURES = int(os.getenv('CIRCUIT_BREAKER_FAILURES', '5'))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '30'))
+    
+    CHANGE_STREAMS_ENABLED = os.getenv('CHANGE_STREAMS_ENABLED', 'False').lower() == 'true'
+    CHANGE_STREAM_LISTENER_ID = os.getenv('CHANGE_STREAM_LISTENER_ID')
+    
+    SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', '256'))
+    SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+    SSE_REPLAY_LIMIT = int(os.getenv('SSE_REPLAY_LIMIT', '1000'))
+    
+    INDEX_BUILD_MODE = os.getenv('INDEX_BUILD_MODE', 'background')
+    
+    SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '5'))
+    
+    ARCHIVE_GRACE_DAYS = float(os.getenv('ARCHIVE_GRACE_DAYS', '30'))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+    
+    JOBS_MAX_WORKERS = int(os.getenv('JOBS_MAX_WORKERS', '2'))
+    JOBS_MAX_QUEUED = int(os.getenv('JOBS_MAX_QUEUED', '20'))
+    JOBS_BUDGET_MS = int(os.getenv('JOBS_BUDGET_MS', '600000'))
+    JOBS_HEARTBEAT_SECONDS = float(os.getenv('JOBS_HEARTBEAT_SECONDS', '10'))
+    JOBS_RETENTION_DAYS = float(os.getenv('JOBS_RETENTION_DAYS', '7'))
+    
+    IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '4'))
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+    
+    API_SPEC_FILE = os.getenv('API_SPEC_FILE')
+    
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '1'))
+    PROFILING_KEEP = int(os.getenv('PROFILING_KEEP', '50'))
+    PROFILING_DIR = os.getenv('PROFILING_DIR')
+    
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '100'))
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS', '300'))
+    SLOW_QUERY_MAX_SHAPES = int(os.getenv('SLOW_QUERY_MAX_SHAPES', '200'))
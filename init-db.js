@@ -6,15 +6,33 @@ db.createCollection('datasets');
 db.createCollection('quality_logs');
 
 
-db.datasets.createIndex({ "name": 1 });
-db.datasets.createIndex({ "owner": 1 });
-db.datasets.createIndex({ "tags": 1 });
-db.datasets.createIndex({ "created_at": -1 });
-db.datasets.createIndex({ "is_deleted": 1 });
+const active = { partialFilterExpression: { "is_deleted": false } };
+db.datasets.createIndex({ "created_at": -1 }, { name: "active_created_at", ...active });
+db.datasets.createIndex({ "owner": 1, "created_at": -1 }, { name: "active_owner_created_at", ...active });
+db.datasets.createIndex({ "tags": 1, "created_at": -1 }, { name: "active_tags_created_at", ...active });
+db.datasets.createIndex({ "name": 1, "owner": 1 }, { name: "active_name_owner", ...active });
+db.datasets.createIndex({ "last_quality_status": 1, "last_quality_at": -1 }, { name: "active_last_quality", ...active });
+db.datasets.createIndex({ "updated_at": 1 }, { name: "deleted_updated_at", partialFilterExpression: { "is_deleted": true } });
+db.datasets.createIndex({ "updated_at": 1, "_id": 1 });
+
+db.dataset_facets.createIndex({ "field": 1, "value": 1 }, { unique: true });
+db.dataset_facets.createIndex({ "field": 1, "count": -1, "value": 1 });
 
 db.quality_logs.createIndex({ "dataset_id": 1 });
 db.quality_logs.createIndex({ "check_type": 1 });
-db.quality_logs.createIndex({ "timestamp": -1 });
-db.quality_logs.createIndex({ "dataset_id": 1, "timestamp": -1 });
+db.quality_logs.createIndex({ "timestamp": 1, "_id": 1 });
+db.quality_logs.createIndex({ "dataset_id": 1, "timestamp": -1, "_id": -1 });
+
+db.quality_log_buckets.createIndex({ "dataset_id": 1, "bucket": 1 }, { unique: true });
+db.quality_log_buckets.createIndex({ "bucket": 1 });
+
+db.quality_status_runs.createIndex({ "dataset_id": 1, "first_ts": -1, "_id": -1 });
+db.quality_status_runs.createIndex({ "dataset_id": 1 }, { name: "open_run", unique: true, partialFilterExpression: { "open": true } });
+
+db.jobs.createIndex({ "type": 1, "_id": -1 });
+db.jobs.createIndex({ "status": 1, "_id": -1 });
+db.jobs.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 });
+
+db.idempotency_keys.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 });
 
 print('Database initialization completed!');
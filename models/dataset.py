@@ -41,3 +41,5 @@ class DatasetResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     is_deleted: bool = False
+    last_quality_status: Optional[str] = None
+    last_quality_at: Optional[datetime] = None
@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict
+
+class JobCreate(BaseModel):
+    type: str = Field(..., min_length=1, max_length=50)
+    params: Dict[str, Any] = Field(default_factory=dict)
@@ -0,0 +1,75 @@
+from flask import Blueprint, request
+from utils.admin import admin_required
+from utils.slow_queries import slow_query_recorder
+from utils.helpers import serialize_doc, create_error_response, create_success_response
+
+admin_bp = Blueprint('admin', __name__)
+
+SLOW_QUERY_SORTS = ("total_ms", "max_ms", "avg_ms", "count")
+
+@admin_bp.route('/admin/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """
+    Get MongoDB commands slower than SLOW_QUERY_THRESHOLD_MS, grouped by query shape
+    ---
+    tags:
+      - Admin
+    parameters:
+      - in: header
+        name: X-Admin-Token
+        type: string
+        required: true
+      - in: query
+        name: sort
+        type: string
+        enum: [total_ms, max_ms, avg_ms, count]
+        default: total_ms
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+    responses:
+      200:
+        description: Query shapes with their timings and latest explain() summary
+      403:
+        description: Missing or wrong admin token
+    """
+    try:
+        sort = request.args.get('sort', 'total_ms')
+        limit = int(request.args.get('limit', 50))
+        
+        if sort not in SLOW_QUERY_SORTS:
+            raise ValueError(f"Sort must be one of: {', '.join(SLOW_QUERY_SORTS)}")
+        if limit < 1 or limit > 1000:
+            limit = 50
+        
+        return create_success_response({
+            "threshold_ms": slow_query_recorder.threshold_ms,
+            "queries": serialize_doc(slow_query_recorder.report(limit, sort))
+        })
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@admin_bp.route('/admin/slow-queries', methods=['DELETE'])
+@admin_required
+def reset_slow_queries():
+    """
+    Forget the recorded slow query shapes
+    ---
+    tags:
+      - Admin
+    parameters:
+      - in: header
+        name: X-Admin-Token
+        type: string
+        required: true
+    responses:
+      200:
+        description: Slow query log cleared
+    """
+    slow_query_recorder.reset()
+    return create_success_response(None, "Slow query log cleared")
@@ -2,7 +2,14 @@ from flask import Blueprint, request, jsonify
 from pydantic import ValidationError
 from services.dataset_service import DatasetService
 from models.dataset import DatasetCreate, DatasetUpdate
-from utils.helpers import serialize_doc, validate_object_id, create_error_response, create_success_response
+from utils.validation import validate_json, format_validation_error
+from utils.resilience import StorageUnavailable
+from utils.formats import wants_raw_bson
+from utils.idempotency import idempotent
+from utils.helpers import (
+    serialize_doc, validate_object_id, create_error_response, create_success_response,
+    create_unavailable_response
+)
 
 datasets_bp = Blueprint('datasets', __name__)
 
@@ -10,6 +17,7 @@ def get_dataset_service():
     return DatasetService()
 
 @datasets_bp.route('/datasets', methods=['POST'])
+@idempotent
 def create_dataset():
     """
     Create a new dataset
@@ -41,20 +49,27 @@ def create_dataset():
               items:
                 type: string
               example: ["customer", "2024", "analysis"]
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Retries with the same key get the first attempt's response instead of creating again
     responses:
       201:
         description: Dataset created successfully
       400:
         description: Invalid input data
       409:
-        description: Dataset already exists
+        description: Dataset already exists, or a request with the same Idempotency-Key is still in progress
+      422:
+        description: Idempotency-Key was already used for a different request
     """
     try:
-        data = request.get_json()
-        if not data:
+        raw = request.get_data()
+        if not raw.strip():
             return create_error_response("Request body is required")
         
-        dataset_data = DatasetCreate(**data)
+        dataset_data = validate_json(DatasetCreate, raw)
         result = get_dataset_service().create_dataset(dataset_data)
         
         return create_success_response(
@@ -64,9 +79,11 @@ def create_dataset():
         )
         
     except ValidationError as e:
-        return create_error_response(f"Validation error: {e}")
+        return create_error_response(f"Validation error: {format_validation_error(e)}")
     except ValueError as e:
         return create_error_response(str(e), 409)
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -77,6 +94,10 @@ def get_datasets():
     ---
     tags:
       - Datasets
+    produces:
+      - application/json
+      - application/msgpack
+      - application/bson
     parameters:
       - in: query
         name: owner
@@ -111,13 +132,17 @@ def get_datasets():
         if limit < 1 or limit > 100:
             limit = 20
         
-        result = get_dataset_service().get_datasets(owner, tag, page, limit)
-        result['datasets'] = serialize_doc(result['datasets'])
+        raw = wants_raw_bson()
+        result = get_dataset_service().get_datasets(owner, tag, page, limit, raw)
+        if not raw:
+            result['datasets'] = serialize_doc(result['datasets'])
         
-        return create_success_response(result)
+        return create_success_response(result, raw_bson=raw)
         
     except ValueError as e:
         return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -128,6 +153,10 @@ def get_dataset(dataset_id):
     ---
     tags:
       - Datasets
+    produces:
+      - application/json
+      - application/msgpack
+      - application/bson
     parameters:
       - in: path
         name: dataset_id
@@ -144,12 +173,15 @@ def get_dataset(dataset_id):
         if not validate_object_id(dataset_id):
             return create_error_response("Invalid dataset ID")
         
-        dataset = get_dataset_service().get_dataset_by_id(dataset_id)
+        raw = wants_raw_bson()
+        dataset = get_dataset_service().get_dataset_by_id(dataset_id, raw)
         if not dataset:
             return create_error_response("Dataset not found", 404)
         
-        return create_success_response(serialize_doc(dataset))
+        return create_success_response(dataset if raw else serialize_doc(dataset), raw_bson=raw)
         
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -194,11 +226,13 @@ def update_dataset(dataset_id):
         if not validate_object_id(dataset_id):
             return create_error_response("Invalid dataset ID")
         
-        data = request.get_json()
-        if not data:
+        raw = request.get_data()
+        if not raw.strip():
             return create_error_response("Request body is required")
         
-        update_data = DatasetUpdate(**data)
+        update_data = validate_json(DatasetUpdate, raw)
+        if not update_data.model_fields_set:
+            return create_error_response("Request body is required")
         result = get_dataset_service().update_dataset(dataset_id, update_data)
         
         if not result:
@@ -210,9 +244,11 @@ def update_dataset(dataset_id):
         )
         
     except ValidationError as e:
-        return create_error_response(f"Validation error: {e}")
+        return create_error_response(f"Validation error: {format_validation_error(e)}")
     except ValueError as e:
         return create_error_response(str(e), 409)
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -248,6 +284,110 @@ def delete_dataset(dataset_id):
             "Dataset deleted successfully"
         )
         
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@datasets_bp.route('/datasets/facets/<any(owners, tags):facet>', methods=['GET'])
+def get_dataset_facet(facet):
+    """
+    Get every owner or tag with its number of datasets, for filters and autocomplete
+    ---
+    tags:
+      - Datasets
+    parameters:
+      - in: path
+        name: facet
+        type: string
+        enum: [owners, tags]
+        required: true
+      - in: query
+        name: prefix
+        type: string
+        description: Only values starting with this prefix
+      - in: query
+        name: sort
+        type: string
+        enum: [count, value]
+        default: count
+        description: Most datasets first, or alphabetical
+      - in: query
+        name: page
+        type: integer
+        default: 1
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+        description: Values per page (max 500)
+    responses:
+      200:
+        description: Values with dataset counts
+      400:
+        description: Invalid parameter
+    """
+    try:
+        prefix = request.args.get('prefix') or None
+        sort = request.args.get('sort', 'count')
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 50))
+        
+        if page < 1:
+            page = 1
+        if limit < 1 or limit > 500:
+            limit = 50
+        
+        result = get_dataset_service().get_facet(facet, prefix, sort, page, limit)
+        
+        return create_success_response(result)
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@datasets_bp.route('/datasets/changes', methods=['GET'])
+def get_dataset_changes():
+    """
+    Get datasets created, updated or deleted since a sync token, for mirroring the catalog
+    ---
+    tags:
+      - Datasets
+    parameters:
+      - in: query
+        name: token
+        type: string
+        description: next_token from the previous response; omit it to start from the beginning
+      - in: query
+        name: limit
+        type: integer
+        default: 100
+        description: Changes per response (max 1000)
+    responses:
+      200:
+        description: Changed datasets in updated_at order, with deleted ones as is_deleted tombstones
+      400:
+        description: Invalid token
+    """
+    try:
+        token = request.args.get('token') or None
+        limit = int(request.args.get('limit', 100))
+        
+        if limit < 1 or limit > 1000:
+            limit = 100
+        
+        result = get_dataset_service().get_changes(token, limit)
+        result['changes'] = serialize_doc(result['changes'])
+        
+        return create_success_response(result)
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -266,5 +406,7 @@ def get_dataset_stats():
         stats = get_dataset_service().get_dataset_stats()
         return create_success_response(stats)
         
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
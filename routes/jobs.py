@@ -0,0 +1,190 @@
+from flask import Blueprint, request
+from pydantic import ValidationError
+from services.job_service import JobService, JOB_TYPES
+from models.job import JobCreate
+from utils.jobs import JobQueueFull, FINISHED, QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+from utils.validation import validate_json, format_validation_error
+from utils.resilience import StorageUnavailable
+from utils.helpers import (
+    serialize_doc, validate_object_id, create_error_response, create_success_response,
+    create_unavailable_response
+)
+
+jobs_bp = Blueprint('jobs', __name__)
+
+JOB_STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+
+def get_job_service():
+    return JobService()
+
+@jobs_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit a background job
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - in: body
+        name: job
+        required: true
+        schema:
+          type: object
+          required:
+            - type
+          properties:
+            type:
+              type: string
+              enum: ["dataset_stats", "quality_overview", "quality_trend"]
+              example: "quality_trend"
+            params:
+              type: object
+              example: {"dataset_ids": ["64f8a1b2c3d4e5f6a7b8c9d0"], "granularity": "week"}
+    responses:
+      202:
+        description: Job queued; poll the URL in the Location header
+      400:
+        description: Unknown job type or invalid params
+      503:
+        description: Too many jobs queued in this worker
+    """
+    try:
+        raw = request.get_data()
+        if not raw.strip():
+            return create_error_response("Request body is required")
+        
+        job_data = validate_json(JobCreate, raw)
+        job = get_job_service().submit_job(job_data.type, job_data.params)
+        
+        response, status_code = create_success_response(serialize_doc(job), "Job queued", 202)
+        response.headers['Location'] = f"/jobs/{job['_id']}"
+        return response, status_code
+        
+    except ValidationError as e:
+        return create_error_response(f"Validation error: {format_validation_error(e)}")
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except JobQueueFull as e:
+        response, status_code = create_error_response(str(e), 503)
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, status_code
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """
+    List recent background jobs, without their results
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - in: query
+        name: type
+        type: string
+      - in: query
+        name: status
+        type: string
+        enum: ["queued", "running", "succeeded", "failed", "cancelled"]
+      - in: query
+        name: limit
+        type: integer
+        default: 20
+    responses:
+      200:
+        description: Jobs, newest first
+    """
+    try:
+        job_type = request.args.get('type')
+        status = request.args.get('status')
+        limit = int(request.args.get('limit', 20))
+        
+        if job_type and job_type not in JOB_TYPES:
+            raise ValueError(f"Job type must be one of: {', '.join(JOB_TYPES)}")
+        if status and status not in JOB_STATUSES:
+            raise ValueError(f"Status must be one of: {', '.join(JOB_STATUSES)}")
+        if limit < 1 or limit > 100:
+            limit = 20
+        
+        jobs = get_job_service().list_jobs(job_type, status, limit)
+        return create_success_response(serialize_doc(jobs))
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get a background job's status, progress and result
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: The job; result is set once status is succeeded, error once it is failed
+      404:
+        description: Job not found
+    """
+    try:
+        if not validate_object_id(job_id):
+            return create_error_response("Invalid job ID")
+        
+        job = get_job_service().get_job(job_id)
+        if not job:
+            return create_error_response("Job not found", 404)
+        
+        return create_success_response(serialize_doc(job))
+        
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@jobs_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    Cancel a background job
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: Job cancelled, or asked to stop if it is running
+      404:
+        description: Job not found
+      409:
+        description: Job already finished
+    """
+    try:
+        if not validate_object_id(job_id):
+            return create_error_response("Invalid job ID")
+        
+        job = get_job_service().cancel_job(job_id)
+        if not job:
+            return create_error_response("Job not found", 404)
+        if job["status"] in FINISHED and job["status"] != CANCELLED:
+            return create_error_response(f"Job already {job['status']}", 409)
+        
+        return create_success_response(serialize_doc(job), "Job cancelled" if job["status"] == CANCELLED
+                                       else "Job will stop at its next checkpoint")
+        
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
@@ -1,15 +1,95 @@
-from flask import Blueprint, request
+from flask import Blueprint, Response, current_app, request, stream_with_context
 from pydantic import ValidationError
-from services.quality_log_service import QualityLogService
-from models.quality_log import QualityLogCreate
-from utils.helpers import serialize_doc, validate_object_id, create_error_response, create_success_response
+from services.quality_log_service import QualityLogService, trend_range
+from models.quality_log import QualityLogCreate, QualityStatus
+from utils.events import quality_event_broker, format_sse
+from utils.validation import validate_json, validate_json_list, format_validation_error
+from utils.resilience import StorageUnavailable
+from utils.formats import wants_raw_bson
+from utils.idempotency import idempotent
+from utils.helpers import (
+    serialize_doc, validate_object_id,
+    create_error_response, create_success_response, create_unavailable_response
+)
 
 quality_logs_bp = Blueprint('quality_logs', __name__)
 
+MAX_TREND_DATASETS = 100
+
+MAX_BULK_QUALITY_LOGS = 1000
+
+SSE_RETRY_MS = 3000
+
 def get_quality_log_service():
     return QualityLogService()
 
+def stream_quality_events(dataset_id=None):
+    status = request.args.get('status')
+    if status and status not in QualityStatus.__members__:
+        return create_error_response("Status must be PASS or FAIL")
+    
+    filters = {
+        "dataset_id": dataset_id,
+        "owner": request.args.get('owner'),
+        "tag": request.args.get('tag'),
+        "status": status
+    }
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id and not validate_object_id(last_event_id):
+        return create_error_response("Invalid Last-Event-ID")
+    
+    heartbeat = current_app.config['SSE_HEARTBEAT_SECONDS']
+    replay_limit = current_app.config['SSE_REPLAY_LIMIT']
+    
+    def generate():
+        subscription = quality_event_broker.subscribe(filters)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            
+            replayed = set()
+            if last_event_id:
+                try:
+                    events = get_quality_log_service().get_quality_events_since(
+                        last_event_id, limit=replay_limit, **filters
+                    )
+                except StorageUnavailable as e:
+                    # Nothing has been sent yet, so the client reconnects with
+                    # the same Last-Event-ID once the database is back.
+                    yield f"retry: {e.retry_after * 1000}\n\n"
+                    return
+                for event in events:
+                    replayed.add(event["id"])
+                    yield format_sse(event)
+            
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if subscription.overflowed:
+                    yield "event: overflow\ndata: {\"reconnect\": true}\n\n"
+                    return
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["id"] in replayed:
+                    continue
+                yield format_sse(event)
+        finally:
+            quality_event_broker.unsubscribe(subscription)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def build_quality_trend(dataset_ids):
+    granularity = request.args.get('granularity', 'day')
+    start, end = trend_range(granularity, request.args.get('start'), request.args.get('end'))
+    
+    trend = get_quality_log_service().get_quality_trend(dataset_ids, start, end, granularity)
+    return serialize_doc(trend)
+
 @quality_logs_bp.route('/datasets/<dataset_id>/quality-logs', methods=['POST'])
+@idempotent
 def create_quality_log(dataset_id):
     """
     Add a quality log for a dataset
@@ -38,6 +118,11 @@ def create_quality_log(dataset_id):
             details:
               type: string
               example: "All data quality checks passed"
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Retries with the same key get the first attempt's response instead of creating again
     responses:
       201:
         description: Quality log created successfully
@@ -45,16 +130,20 @@ def create_quality_log(dataset_id):
         description: Invalid input data
       404:
         description: Dataset not found
+      409:
+        description: A request with the same Idempotency-Key is still in progress
+      422:
+        description: Idempotency-Key was already used for a different request
     """
     try:
         if not validate_object_id(dataset_id):
             return create_error_response("Invalid dataset ID")
         
-        data = request.get_json()
-        if not data:
+        raw = request.get_data()
+        if not raw.strip():
             return create_error_response("Request body is required")
         
-        log_data = QualityLogCreate(**data)
+        log_data = validate_json(QualityLogCreate, raw)
         result = get_quality_log_service().create_quality_log(dataset_id, log_data)
         
         return create_success_response(
@@ -64,9 +153,74 @@ def create_quality_log(dataset_id):
         )
         
     except ValidationError as e:
-        return create_error_response(f"Validation error: {e}")
+        return create_error_response(f"Validation error: {format_validation_error(e)}")
     except ValueError as e:
         return create_error_response(str(e), 404)
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/datasets/<dataset_id>/quality-logs/bulk', methods=['POST'])
+def create_quality_logs_bulk(dataset_id):
+    """
+    Add several quality logs for a dataset in one request
+    ---
+    tags:
+      - Quality Logs
+    parameters:
+      - in: path
+        name: dataset_id
+        type: string
+        required: true
+        description: Dataset ID
+      - in: body
+        name: quality_logs
+        description: Up to 1000 quality logs
+        required: true
+        schema:
+          type: array
+          items:
+            type: object
+            required:
+              - status
+            properties:
+              status:
+                type: string
+                enum: ["PASS", "FAIL"]
+              details:
+                type: string
+    responses:
+      201:
+        description: Quality logs created successfully
+      400:
+        description: Invalid input data
+      404:
+        description: Dataset not found
+    """
+    try:
+        if not validate_object_id(dataset_id):
+            return create_error_response("Invalid dataset ID")
+        
+        raw = request.get_data()
+        if not raw.strip():
+            return create_error_response("Request body is required")
+        
+        logs_data = validate_json_list(QualityLogCreate, raw, MAX_BULK_QUALITY_LOGS)
+        result = get_quality_log_service().create_quality_logs(dataset_id, logs_data)
+        
+        return create_success_response(
+            serialize_doc(result),
+            f"{len(result)} quality logs created successfully",
+            201
+        )
+        
+    except ValidationError as e:
+        return create_error_response(f"Validation error: {format_validation_error(e)}")
+    except ValueError as e:
+        return create_error_response(str(e), 404)
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -77,6 +231,10 @@ def get_quality_logs(dataset_id):
     ---
     tags:
       - Quality Logs
+    produces:
+      - application/json
+      - application/msgpack
+      - application/bson
     parameters:
       - in: path
         name: dataset_id
@@ -111,13 +269,113 @@ def get_quality_logs(dataset_id):
         if limit < 1 or limit > 100:
             limit = 20
         
-        result = get_quality_log_service().get_quality_logs(dataset_id, page, limit)
-        result['logs'] = serialize_doc(result['logs'])
+        raw = wants_raw_bson()
+        result = get_quality_log_service().get_quality_logs(dataset_id, page, limit, raw)
+        if not raw:
+            result['logs'] = serialize_doc(result['logs'])
+        
+        return create_success_response(result, raw_bson=raw)
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/datasets/<dataset_id>/quality-runs', methods=['GET'])
+def get_quality_runs(dataset_id):
+    """
+    Get a dataset's quality history as runs of the same status
+    ---
+    tags:
+      - Quality Logs
+    parameters:
+      - in: path
+        name: dataset_id
+        type: string
+        required: true
+        description: Dataset ID
+      - in: query
+        name: page
+        type: integer
+        default: 1
+        description: Page number
+      - in: query
+        name: limit
+        type: integer
+        default: 20
+        description: Runs per page
+    responses:
+      200:
+        description: Status runs (status, first_ts, last_ts, count, last_details), newest first
+      400:
+        description: Invalid dataset ID
+    """
+    try:
+        if not validate_object_id(dataset_id):
+            return create_error_response("Invalid dataset ID")
+        
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 20))
+        
+        if page < 1:
+            page = 1
+        if limit < 1 or limit > 100:
+            limit = 20
+        
+        result = get_quality_log_service().get_quality_runs(dataset_id, page, limit)
+        result['runs'] = serialize_doc(result['runs'])
         
         return create_success_response(result)
         
     except ValueError as e:
         return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/datasets/<dataset_id>/quality-transitions', methods=['GET'])
+def get_quality_transitions(dataset_id):
+    """
+    Get a dataset's current quality status, since when it has held, and its latest status flips
+    ---
+    tags:
+      - Quality Logs
+    parameters:
+      - in: path
+        name: dataset_id
+        type: string
+        required: true
+        description: Dataset ID
+      - in: query
+        name: limit
+        type: integer
+        default: 20
+        description: Maximum number of transitions, newest first
+    responses:
+      200:
+        description: Current status and status transitions
+      400:
+        description: Invalid dataset ID
+    """
+    try:
+        if not validate_object_id(dataset_id):
+            return create_error_response("Invalid dataset ID")
+        
+        limit = int(request.args.get('limit', 20))
+        if limit < 1 or limit > 100:
+            limit = 20
+        
+        result = get_quality_log_service().get_quality_transitions(dataset_id, limit)
+        
+        return create_success_response(serialize_doc(result))
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -149,6 +407,8 @@ def get_quality_summary(dataset_id):
         
     except ValueError as e:
         return create_error_response(str(e))
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
 
@@ -181,5 +441,231 @@ def get_latest_quality_status(dataset_id):
         
         return create_success_response(serialize_doc(status))
         
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
     except Exception as e:
         return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/datasets/<dataset_id>/quality-trend', methods=['GET'])
+def get_quality_trend(dataset_id):
+    """
+    Get quality pass rate per time bucket for a dataset
+    ---
+    tags:
+      - Quality Logs
+    parameters:
+      - in: path
+        name: dataset_id
+        type: string
+        required: true
+        description: Dataset ID
+      - in: query
+        name: granularity
+        type: string
+        enum: ["hour", "day", "week", "month"]
+        default: day
+        description: Bucket size
+      - in: query
+        name: start
+        type: string
+        format: date-time
+        description: Range start (ISO 8601, inclusive)
+      - in: query
+        name: end
+        type: string
+        format: date-time
+        description: Range end (ISO 8601, exclusive, defaults to now)
+    responses:
+      200:
+        description: Quality trend
+      400:
+        description: Invalid parameters
+    """
+    try:
+        if not validate_object_id(dataset_id):
+            return create_error_response("Invalid dataset ID")
+        
+        return create_success_response(build_quality_trend([dataset_id]))
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/quality-trend', methods=['GET'])
+def get_multi_dataset_quality_trend():
+    """
+    Get quality pass rate per time bucket across several datasets
+    ---
+    tags:
+      - Quality Logs
+    parameters:
+      - in: query
+        name: dataset_ids
+        type: string
+        required: true
+        description: Comma-separated dataset IDs
+      - in: query
+        name: granularity
+        type: string
+        enum: ["hour", "day", "week", "month"]
+        default: day
+        description: Bucket size
+      - in: query
+        name: start
+        type: string
+        format: date-time
+        description: Range start (ISO 8601, inclusive)
+      - in: query
+        name: end
+        type: string
+        format: date-time
+        description: Range end (ISO 8601, exclusive, defaults to now)
+    responses:
+      200:
+        description: Quality trend
+      400:
+        description: Invalid parameters
+    """
+    try:
+        dataset_ids = [i for i in request.args.get('dataset_ids', '').split(',') if i]
+        if not dataset_ids:
+            return create_error_response("dataset_ids is required")
+        if len(dataset_ids) > MAX_TREND_DATASETS:
+            return create_error_response(f"At most {MAX_TREND_DATASETS} datasets per request")
+        if not all(validate_object_id(dataset_id) for dataset_id in dataset_ids):
+            return create_error_response("Invalid dataset ID")
+        
+        return create_success_response(build_quality_trend(dataset_ids))
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/quality-overview', methods=['GET'])
+def get_quality_overview():
+    """
+    Get fleet-wide quality overview across all datasets
+    ---
+    tags:
+      - Quality Logs
+    parameters:
+      - in: query
+        name: owner
+        type: string
+        description: Restrict to datasets of this owner
+      - in: query
+        name: tag
+        type: string
+        description: Restrict to datasets with this tag
+      - in: query
+        name: limit
+        type: integer
+        default: 10
+        description: Number of failing and worst datasets to return
+      - in: query
+        name: days
+        type: integer
+        default: 7
+        description: Pass rate window in days
+    responses:
+      200:
+        description: Quality overview
+      400:
+        description: Invalid parameters
+    """
+    try:
+        owner = request.args.get('owner')
+        tag = request.args.get('tag')
+        limit = int(request.args.get('limit', 10))
+        days = int(request.args.get('days', 7))
+        
+        if limit < 1 or limit > 100:
+            limit = 10
+        if days < 1 or days > 90:
+            days = 7
+        
+        overview = get_quality_log_service().get_quality_overview(owner, tag, limit, days)
+        return create_success_response(serialize_doc(overview))
+        
+    except ValueError as e:
+        return create_error_response(f"Invalid parameter: {e}")
+    except StorageUnavailable as e:
+        return create_unavailable_response(e.retry_after)
+    except Exception as e:
+        return create_error_response(f"Internal server error: {str(e)}", 500)
+
+@quality_logs_bp.route('/quality-events', methods=['GET'])
+def get_quality_events():
+    """
+    Stream new quality logs across all datasets as Server-Sent Events
+    ---
+    tags:
+      - Quality Logs
+    produces:
+      - text/event-stream
+    parameters:
+      - in: query
+        name: owner
+        type: string
+        description: Only datasets of this owner
+      - in: query
+        name: tag
+        type: string
+        description: Only datasets with this tag
+      - in: query
+        name: status
+        type: string
+        enum: ["PASS", "FAIL"]
+        description: Only logs with this status
+      - in: header
+        name: Last-Event-ID
+        type: string
+        description: Replay logs written after this event ID before streaming
+    responses:
+      200:
+        description: Event stream
+      400:
+        description: Invalid parameters
+    """
+    return stream_quality_events()
+
+@quality_logs_bp.route('/datasets/<dataset_id>/quality-events', methods=['GET'])
+def get_dataset_quality_events(dataset_id):
+    """
+    Stream new quality logs for a dataset as Server-Sent Events
+    ---
+    tags:
+      - Quality Logs
+    produces:
+      - text/event-stream
+    parameters:
+      - in: path
+        name: dataset_id
+        type: string
+        required: true
+        description: Dataset ID
+      - in: query
+        name: status
+        type: string
+        enum: ["PASS", "FAIL"]
+        description: Only logs with this status
+      - in: header
+        name: Last-Event-ID
+        type: string
+        description: Replay logs written after this event ID before streaming
+    responses:
+      200:
+        description: Event stream
+      400:
+        description: Invalid parameters
+    """
+    if not validate_object_id(dataset_id):
+        return create_error_response("Invalid dataset ID")
+    
+    return stream_quality_events(dataset_id)
@@ -1,23 +1,41 @@
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 from bson import ObjectId
-from utils.database import get_db
+from bson.errors import InvalidId
+from config import Config
+from services.storage import get_dataset_repository, get_quality_log_repository
+from utils.cache import dataset_cache, stats_cache, invalidate_dataset
+from utils.resilience import guarded
 from models.dataset import DatasetCreate, DatasetUpdate
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+
+FACET_FIELDS = {"owners": "owner", "tags": "tag"}
+FACET_SORTS = ("count", "value")
+
+EPOCH = datetime(1970, 1, 1)
+
+def encode_sync_token(updated_at: datetime, dataset_id: ObjectId) -> str:
+    """Opaque changes-feed position after the dataset with this updated_at and ID"""
+    millis = (updated_at - EPOCH) // timedelta(milliseconds=1)
+    return base64.urlsafe_b64encode(f"{millis}.{dataset_id}".encode()).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> Tuple[datetime, ObjectId]:
+    """Parse a token from encode_sync_token"""
+    try:
+        millis, dataset_id = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().split(".")
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(dataset_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise ValueError("Invalid sync token")
 
 class DatasetService:
     def __init__(self):
-        self.db = get_db()
-        self.collection = self.db.datasets
+        self.repository = get_dataset_repository()
 
     def create_dataset(self, dataset_data: DatasetCreate) -> Dict[str, Any]:
         """Create a new dataset"""
         now = datetime.utcnow()
         
-        existing = self.collection.find_one({
-            "name": dataset_data.name,
-            "owner": dataset_data.owner,
-            "is_deleted": False
-        })
+        existing = guarded("lookup", lambda: self.repository.find_active_by_name(dataset_data.name, dataset_data.owner))
         
         if existing:
             raise ValueError("Dataset with this name already exists for this owner")
@@ -32,32 +50,20 @@ class DatasetService:
             "is_deleted": False
         }
         
-        result = self.collection.insert_one(dataset_doc)
-        dataset_doc["_id"] = result.inserted_id
+        dataset_doc["_id"] = guarded("write", lambda: self.repository.insert(dataset_doc))
+        
+        stats_cache.clear()
         
         return dataset_doc
 
     def get_datasets(self, owner: Optional[str] = None, tag: Optional[str] = None, 
-                    page: int = 1, limit: int = 20) -> Dict[str, Any]:
-        """Get datasets with optional filtering and pagination"""
-        query = {"is_deleted": False}
-        
-        if owner:
-            query["owner"] = owner
-        
-        if tag:
-            query["tags"] = {"$in": [tag]}
-        
+                    page: int = 1, limit: int = 20, raw: bool = False) -> Dict[str, Any]:
+        """Get datasets with optional filtering and pagination, as RawBSONDocuments if raw"""
         skip = (page - 1) * limit
         
-        total = self.collection.count_documents(query)
+        total = guarded("list", lambda: self.repository.count_active(owner, tag))
         
-        datasets = list(
-            self.collection.find(query)
-            .sort("created_at", -1)
-            .skip(skip)
-            .limit(limit)
-        )
+        datasets = guarded("list", lambda: self.repository.list_active(owner, tag, skip, limit, raw))
         
         return {
             "datasets": datasets,
@@ -67,15 +73,53 @@ class DatasetService:
             "total_pages": (total + limit - 1) // limit
         }
 
-    def get_dataset_by_id(self, dataset_id: str) -> Optional[Dict[str, Any]]:
-        """Get a dataset by ID"""
+    def get_changes(self, token: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """Get datasets created, updated or deleted after a changes-feed position, oldest change first"""
+        after = decode_sync_token(token) if token else None
+        
+        # updated_at is stamped by each worker before its write lands, so a
+        # change can become visible after later-stamped ones were served. The
+        # feed stops SYNC_SETTLE_SECONDS short of now to leave it room.
+        until = datetime.utcnow() - timedelta(seconds=Config.SYNC_SETTLE_SECONDS)
+        
+        datasets = guarded("list", lambda: self.repository.changed_since(after, until, limit + 1))
+        has_more = len(datasets) > limit
+        datasets = datasets[:limit]
+        
+        if datasets:
+            token = encode_sync_token(datasets[-1]["updated_at"], datasets[-1]["_id"])
+        
+        return {
+            "changes": [
+                {"_id": dataset["_id"], "is_deleted": True, "updated_at": dataset["updated_at"]}
+                if dataset["is_deleted"] else dataset
+                for dataset in datasets
+            ],
+            "next_token": token,
+            "has_more": has_more
+        }
+
+    def get_dataset_by_id(self, dataset_id: str, raw: bool = False) -> Optional[Dict[str, Any]]:
+        """Get a dataset by ID; raw reads return a RawBSONDocument from storage, bypassing the cache"""
         if not ObjectId.is_valid(dataset_id):
             return None
         
-        return self.collection.find_one({
-            "_id": ObjectId(dataset_id),
-            "is_deleted": False
-        })
+        if raw:
+            return guarded("lookup", lambda: self.repository.find_active(ObjectId(dataset_id), raw=True))
+        
+        cached = dataset_cache.get(dataset_id)
+        if cached is not None:
+            return dict(cached)
+        
+        def load():
+            dataset = self.repository.find_active(ObjectId(dataset_id))
+            if dataset is not None:
+                dataset_cache.set(dataset_id, dataset)
+            return dataset
+        
+        dataset = guarded("lookup", load, stale=lambda: dataset_cache.get_stale(dataset_id))
+        
+        return dict(dataset) if dataset is not None else None
 
     def update_dataset(self, dataset_id: str, update_data: DatasetUpdate) -> Optional[Dict[str, Any]]:
         """Update a dataset"""
@@ -94,21 +138,17 @@ class DatasetService:
             update_doc["tags"] = update_data.tags
         
         if update_data.name:
-            existing = self.collection.find_one({
-                "_id": {"$ne": ObjectId(dataset_id)},
-                "name": update_data.name,
-                "owner": update_data.owner or self.get_dataset_by_id(dataset_id)["owner"],
-                "is_deleted": False
-            })
+            owner = update_data.owner or self.get_dataset_by_id(dataset_id)["owner"]
+            existing = guarded("lookup", lambda: self.repository.find_active_by_name(
+                update_data.name, owner, exclude_id=ObjectId(dataset_id)
+            ))
             
             if existing:
                 raise ValueError("Dataset with this name already exists for this owner")
         
-        result = self.collection.find_one_and_update(
-            {"_id": ObjectId(dataset_id), "is_deleted": False},
-            {"$set": update_doc},
-            return_document=True
-        )
+        result = guarded("write", lambda: self.repository.update_active(ObjectId(dataset_id), update_doc))
+        
+        invalidate_dataset(dataset_id)
         
         return result
 
@@ -117,36 +157,72 @@ class DatasetService:
         if not ObjectId.is_valid(dataset_id):
             return False
         
-        result = self.collection.update_one(
-            {"_id": ObjectId(dataset_id), "is_deleted": False},
-            {"$set": {"is_deleted": True, "updated_at": datetime.utcnow()}}
-        )
+        deleted = guarded("write", lambda: self.repository.soft_delete(ObjectId(dataset_id), datetime.utcnow()))
         
-        return result.modified_count > 0
+        invalidate_dataset(dataset_id)
+        
+        return deleted
 
     def get_dataset_stats(self) -> Dict[str, Any]:
         """Get dataset statistics"""
-        total_datasets = self.collection.count_documents({"is_deleted": False})
-        
-        pipeline = [
-            {"$match": {"is_deleted": False}},
-            {"$group": {"_id": "$owner", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]
-        top_owners = list(self.collection.aggregate(pipeline))
-        
-        pipeline = [
-            {"$match": {"is_deleted": False}},
-            {"$unwind": "$tags"},
-            {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        top_tags = list(self.collection.aggregate(pipeline))
+        return stats_cache.get_or_load("dataset_stats", "aggregate", self._load_dataset_stats)
+
+    def recompute_dataset_stats(self) -> Dict[str, Any]:
+        """Recompute dataset statistics without the cache and cache the result"""
+        stats = guarded("aggregate", self._load_dataset_stats)
+        stats_cache.set("dataset_stats", stats)
+        return stats
+
+    def _load_dataset_stats(self) -> Dict[str, Any]:
+        return {
+            "total_datasets": self.repository.count_active(),
+            "top_owners": self.repository.top_owners(5),
+            "top_tags": self.repository.top_tags(10)
+        }
+
+    def get_facet(self, facet: str, prefix: Optional[str] = None, sort: str = "count",
+                  page: int = 1, limit: int = 50) -> Dict[str, Any]:
+        """Get every owner or tag of non-deleted datasets with its dataset count"""
+        if facet not in FACET_FIELDS:
+            raise ValueError(f"Facet must be one of: {', '.join(FACET_FIELDS)}")
+        
+        if sort not in FACET_SORTS:
+            raise ValueError(f"Sort must be one of: {', '.join(FACET_SORTS)}")
+        
+        skip = (page - 1) * limit
+        
+        total, values = guarded("list", lambda: self.repository.facet(FACET_FIELDS[facet], prefix, sort, skip, limit))
         
         return {
-            "total_datasets": total_datasets,
-            "top_owners": top_owners,
-            "top_tags": top_tags
+            "facet": facet,
+            "prefix": prefix,
+            "sort": sort,
+            "values": values,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit
         }
+
+    def rebuild_facets(self) -> None:
+        """Rebuild the owner and tag counts behind the facets from dataset documents"""
+        self.repository.rebuild_facets()
+
+    def archive_deleted_datasets(self, grace_days: float = Config.ARCHIVE_GRACE_DAYS, include_logs: bool = False,
+                                 batch_size: int = Config.ARCHIVE_BATCH_SIZE) -> Dict[str, int]:
+        """Move datasets soft-deleted more than grace_days ago, and optionally their quality logs, to the archive"""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=grace_days)
+        quality_logs = get_quality_log_repository()
+        archived = {"datasets": 0, "quality_logs": 0}
+        
+        # Logs go first, so a run stopped part way leaves the dataset behind
+        # to be picked up again by the next one.
+        while True:
+            dataset_ids = self.repository.deleted_before(cutoff, batch_size)
+            if include_logs and dataset_ids:
+                archived["quality_logs"] += quality_logs.archive_for_datasets(dataset_ids, now)
+            moved = self.repository.archive(dataset_ids, now) if dataset_ids else 0
+            archived["datasets"] += moved
+            if moved < batch_size:
+                return archived
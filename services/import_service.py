@@ -0,0 +1,365 @@
+"""
+Bulk import of datasets and quality logs from NDJSON or CSV files.
+
+Records are streamed from the file, validated against DatasetCreate and
+QualityLogCreate in batches on a process pool, and written batch by batch in
+file order with unordered inserts. Every record gets an ObjectId derived from
+its position and content, so running an import again never inserts a record
+twice, and a checkpoint file records how far the import got so a re-run skips
+the records already written. Facets, buckets, status runs and the latest
+status on datasets are rebuilt once at the end instead of per record.
+"""
+import calendar
+import csv
+import gzip
+import hashlib
+import json
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from bson import ObjectId
+from pydantic import ValidationError
+from config import Config
+from models.dataset import DatasetCreate
+from models.quality_log import QualityLogCreate
+from services.storage import get_dataset_repository, get_quality_log_repository
+from utils.helpers import parse_datetime_param
+from utils.validation import format_validation_error
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Tuple, Union
+
+IMPORT_KINDS = ("datasets", "quality_logs")
+IMPORT_FORMATS = ("ndjson", "csv")
+FORMAT_SUFFIXES = {".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson", ".csv": "csv"}
+
+# CSV cells are strings, so a tags cell lists them separated by this
+CSV_TAG_SEPARATOR = ";"
+
+# Derived data is rebuilt for this many imported datasets per call
+REBUILD_CHUNK = 1000
+
+# Rejected records beyond this many are only in the errors file
+MAX_REPORTED_ERRORS = 10
+
+def detect_format(path: str) -> str:
+    """Tell the format of a file from its extension, ignoring a trailing .gz"""
+    name = path[:-3] if path.endswith(".gz") else path
+    fmt = FORMAT_SUFFIXES.get(os.path.splitext(name)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the format of {path}, it must be one of: {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+def read_records(path: str, fmt: str) -> Iterator[Union[str, Dict[str, str]]]:
+    """Stream the records of a file, gunzipping it if it ends in .gz: NDJSON lines unparsed, CSV rows as dicts"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield line
+
+def csv_fields(row: Dict[str, str]) -> Dict[str, Any]:
+    """Drop empty cells, which mean unset, and split the tags cell"""
+    fields = {key: value for key, value in row.items() if key is not None and value not in (None, "")}
+    if "tags" in fields:
+        fields["tags"] = [tag.strip() for tag in fields["tags"].split(CSV_TAG_SEPARATOR) if tag.strip()]
+    return fields
+
+def parse_time_field(fields: Dict[str, Any], name: str, default: datetime) -> datetime:
+    value = fields.pop(name, None)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{name} must be an ISO 8601 string")
+    return parse_datetime_param(value, default)
+
+def import_object_id(timestamp: datetime, kind: str, number: int, record: Any) -> ObjectId:
+    """An ObjectId for the number-th record of a file that comes out the same on every run over it.
+    
+    The timestamp part is the record's own time, so imported documents sort
+    among the others as if they had been written then.
+    """
+    seconds = calendar.timegm(timestamp.utctimetuple())
+    if not 0 <= seconds <= 0xFFFFFFFF:
+        raise ValueError("Timestamps must be between 1970 and 2106")
+    digest = hashlib.blake2b(f"{kind}:{number}:{record}".encode(), digest_size=8).digest()
+    return ObjectId(struct.pack(">I", seconds) + digest)
+
+def dataset_document(fields: Dict[str, Any], number: int, record: Any, default_time: datetime) -> Dict[str, Any]:
+    created_at = parse_time_field(fields, "created_at", default_time)
+    dataset = DatasetCreate.model_validate(fields)
+    return {
+        "_id": import_object_id(created_at, "datasets", number, record),
+        "name": dataset.name,
+        "owner": dataset.owner,
+        "description": dataset.description,
+        "tags": dataset.tags,
+        "created_at": created_at,
+        "is_deleted": False
+    }
+
+def quality_log_document(fields: Dict[str, Any], number: int, record: Any, default_time: datetime) -> Dict[str, Any]:
+    """A quality log whose dataset_id is still a (name, owner) pair if the record named its dataset"""
+    timestamp = parse_time_field(fields, "timestamp", default_time)
+    dataset_id = fields.pop("dataset_id", None)
+    name, owner = fields.pop("dataset_name", None), fields.pop("owner", None)
+    
+    if dataset_id is not None:
+        if not isinstance(dataset_id, str) or not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
+        dataset = ObjectId(dataset_id)
+    elif isinstance(name, str) and isinstance(owner, str) and name and owner:
+        dataset = (name, owner)
+    else:
+        raise ValueError("Either dataset_id or dataset_name and owner is required")
+    
+    log = QualityLogCreate.model_validate(fields)
+    return {
+        "_id": import_object_id(timestamp, "quality_logs", number, record),
+        "dataset_id": dataset,
+        "status": log.status.value,
+        "details": log.details,
+        "timestamp": timestamp
+    }
+
+DOCUMENT_BUILDERS = {"datasets": dataset_document, "quality_logs": quality_log_document}
+
+def validate_batch(kind: str, start: int, records: List[Union[str, Dict[str, str]]],
+                   default_time: datetime) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, str]]]:
+    """Turn the records numbered from start + 1 into documents, returning them and the rejected records' errors.
+    
+    Runs in the worker processes, so it only takes and returns picklable values.
+    """
+    build = DOCUMENT_BUILDERS[kind]
+    docs, errors = [], []
+    for number, record in enumerate(records, start + 1):
+        try:
+            if isinstance(record, str):
+                fields = json.loads(record)
+                if not isinstance(fields, dict):
+                    raise ValueError("Record must be a JSON object")
+            else:
+                fields = csv_fields(record)
+            docs.append((number, build(fields, number, record, default_time)))
+        except ValidationError as e:
+            errors.append((number, f"Validation error: {format_validation_error(e)}"))
+        except (ValueError, TypeError) as e:
+            errors.append((number, str(e)))
+    return docs, errors
+
+def batched(records: Iterable[Any], size: int, start: int) -> Iterator[Tuple[int, List[Any]]]:
+    """Split records into lists of size, each with the number of records before it"""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield start, batch
+        start += len(batch)
+
+class InlineExecutor:
+    """Executor stand-in that runs every call as it is submitted, for imports without worker processes"""
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class ImportCheckpoint:
+    """How far an import of one file got, saved atomically after every batch it writes"""
+
+    def __init__(self, path: Optional[str], source: str, kind: str):
+        self.path = path
+        self.state = {
+            "source": os.path.abspath(source),
+            "kind": kind,
+            "records": 0,
+            "inserted": 0,
+            "existing": 0,
+            "invalid": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished": False
+        }
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("source") != self.state["source"] or saved.get("kind") != kind:
+                raise ValueError(f"Checkpoint {path} belongs to an import of another file or kind")
+            self.state.update(saved)
+
+    def save(self):
+        if self.path is None:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temporary, self.path)
+
+class ImportService:
+    def __init__(self):
+        self.datasets = get_dataset_repository()
+        self.quality_logs = get_quality_log_repository()
+        # Dataset lookups for quality logs, cached for the whole import
+        self._ids_by_name = {}
+        self._active_ids = {}
+
+    def import_file(self, path: str, kind: str, fmt: Optional[str] = None, workers: int = Config.IMPORT_WORKERS,
+                    batch_size: int = Config.IMPORT_BATCH_SIZE, checkpoint_path: Optional[str] = None,
+                    errors_path: Optional[str] = None,
+                    progress: Optional[Callable[[Dict[str, int], float], None]] = None) -> Dict[str, Any]:
+        """Import datasets or quality logs from an NDJSON or CSV file and report counts and throughput.
+        
+        Quality log records name their dataset by dataset_id, or by
+        dataset_name and owner. With a checkpoint_path, an import that stopped
+        resumes after the last batch it wrote.
+        """
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Kind must be one of: {', '.join(IMPORT_KINDS)}")
+        fmt = fmt or detect_format(path)
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Format must be one of: {', '.join(IMPORT_FORMATS)}")
+        if batch_size < 1 or workers < 0:
+            raise ValueError("Batch size must be positive and workers must not be negative")
+        
+        checkpoint = ImportCheckpoint(checkpoint_path, path, kind)
+        state = checkpoint.state
+        resumed = state["records"] > 0
+        # Records without a time of their own get the first run's start, so
+        # their IDs do not change when the import is resumed
+        default_time = datetime.fromisoformat(state["started_at"])
+        
+        counts = {"records": 0, "inserted": 0, "existing": 0, "invalid": 0}
+        errors = []
+        affected = set()
+        started = time.perf_counter()
+        
+        def write(future):
+            docs, rejected = future.result()
+            end = max([number for number, _ in docs] + [number for number, _ in rejected])
+            if kind == "datasets":
+                inserted, existing = self._write_datasets(docs)
+            else:
+                inserted, existing, unresolved = self._write_quality_logs(docs, affected)
+                rejected = sorted(rejected + unresolved)
+            
+            if errors_file is not None:
+                for number, message in rejected:
+                    errors_file.write(json.dumps({"record": number, "error": message}) + "\n")
+                errors_file.flush()
+            errors.extend(rejected[:MAX_REPORTED_ERRORS - len(errors)])
+            
+            batch_counts = {"records": end - state["records"], "inserted": inserted, "existing": existing,
+                            "invalid": len(rejected)}
+            for key, value in batch_counts.items():
+                counts[key] += value
+                state[key] += value
+            checkpoint.save()
+            if progress is not None:
+                progress(counts, time.perf_counter() - started)
+        
+        errors_file = open(errors_path, "a") if errors_path else None
+        try:
+            records = islice(read_records(path, fmt), state["records"], None)
+            with (ProcessPoolExecutor(workers) if workers > 0 else InlineExecutor()) as executor:
+                # Keep every worker busy while batches are written in file order
+                pending = deque()
+                for start, batch in batched(records, batch_size, state["records"]):
+                    pending.append(executor.submit(validate_batch, kind, start, batch, default_time))
+                    if len(pending) > 2 * workers:
+                        write(pending.popleft())
+                while pending:
+                    write(pending.popleft())
+        finally:
+            if errors_file is not None:
+                errors_file.close()
+        
+        # Which datasets an earlier run touched is not kept, so a resumed
+        # import rebuilds derived data for all of them
+        self._rebuild(kind, None if resumed else list(affected))
+        state["finished"] = True
+        checkpoint.save()
+        
+        seconds = time.perf_counter() - started
+        return dict(
+            counts,
+            total_records=state["records"],
+            seconds=seconds,
+            records_per_second=counts["records"] / seconds if seconds > 0 else 0.0,
+            errors=errors
+        )
+
+    def _write_datasets(self, docs: List[Tuple[int, Dict[str, Any]]]) -> Tuple[int, int]:
+        """Insert the datasets whose name is not taken for their owner, returning (inserted, existing)"""
+        keys = list({(doc["name"], doc["owner"]) for _, doc in docs})
+        taken = set(self.datasets.find_active_ids_by_names(keys))
+        now = datetime.utcnow()
+        fresh = []
+        for _, doc in docs:
+            key = (doc["name"], doc["owner"])
+            if key not in taken:
+                taken.add(key)
+                # updated_at is the import time so changes feed mirrors pick the datasets up
+                fresh.append(dict(doc, updated_at=now))
+        
+        inserted = self.datasets.import_many(fresh)
+        return inserted, len(docs) - inserted
+
+    def _write_quality_logs(self, docs: List[Tuple[int, Dict[str, Any]]],
+                            affected: set) -> Tuple[int, int, List[Tuple[int, str]]]:
+        """Insert quality logs of existing datasets, returning (inserted, existing, errors of the rest)"""
+        names = {doc["dataset_id"] for _, doc in docs if isinstance(doc["dataset_id"], tuple)}
+        names = [key for key in names if key not in self._ids_by_name]
+        if names:
+            found = self.datasets.find_active_ids_by_names(names)
+            self._ids_by_name.update((key, found.get(key)) for key in names)
+        
+        ids = {doc["dataset_id"] for _, doc in docs if isinstance(doc["dataset_id"], ObjectId)}
+        ids = [dataset_id for dataset_id in ids if dataset_id not in self._active_ids]
+        if ids:
+            self._active_ids.update((dataset_id, False) for dataset_id in ids)
+            self._active_ids.update(
+                (doc["_id"], True) for doc in self.datasets.find_by_ids(ids, ["is_deleted"])
+                if not doc.get("is_deleted")
+            )
+        
+        resolved, errors = [], []
+        for number, doc in docs:
+            dataset_id = doc["dataset_id"]
+            if isinstance(dataset_id, tuple):
+                dataset_id = self._ids_by_name[dataset_id]
+            elif not self._active_ids[dataset_id]:
+                dataset_id = None
+            if dataset_id is None:
+                errors.append((number, "Dataset not found"))
+                continue
+            resolved.append(dict(doc, dataset_id=dataset_id))
+            affected.add(dataset_id)
+        
+        inserted = self.quality_logs.import_many(resolved)
+        return inserted, len(resolved) - inserted, errors
+
+    def _rebuild(self, kind: str, dataset_ids: Optional[List[ObjectId]]) -> None:
+        """Recompute what the imported records feed into, for the given datasets or all of them"""
+        if kind == "datasets":
+            self.datasets.rebuild_facets()
+            return
+        
+        chunks = [None] if dataset_ids is None else [
+            dataset_ids[index:index + REBUILD_CHUNK] for index in range(0, len(dataset_ids), REBUILD_CHUNK)
+        ]
+        for chunk in chunks:
+            self.quality_logs.rebuild_buckets(chunk)
+            self.quality_logs.rebuild_runs(chunk)
+            self.quality_logs.rebuild_latest_status(chunk)
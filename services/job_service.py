@@ -0,0 +1,149 @@
+from datetime import datetime
+from bson import ObjectId
+from services.storage import get_job_repository
+from services.dataset_service import DatasetService
+from services.quality_log_service import QualityLogService, trend_range
+from utils.jobs import (
+    job_runner, JobQueueFull, WORKER_ID, QUEUED, RUNNING, FAILED, CANCELLED
+)
+from utils.resilience import guarded
+from typing import List, Optional, Dict, Any
+
+MAX_TREND_JOB_DATASETS = 10000
+
+# Trend jobs aggregate this many datasets per step, reporting progress in between
+TREND_JOB_CHUNK = 100
+
+def parse_int_param(params: Dict[str, Any], name: str, default: int, low: int, high: int) -> int:
+    value = int(params.get(name, default))
+    if value < low or value > high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+def parse_no_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    if params:
+        raise ValueError("This job type takes no params")
+    return {}
+
+def parse_overview_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "owner": params.get("owner"),
+        "tag": params.get("tag"),
+        "limit": parse_int_param(params, "limit", 10, 1, 1000),
+        "days": parse_int_param(params, "days", 7, 1, 365)
+    }
+
+def parse_trend_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    dataset_ids = params.get("dataset_ids")
+    if not isinstance(dataset_ids, list) or not dataset_ids:
+        raise ValueError("dataset_ids must be a non-empty list")
+    if len(dataset_ids) > MAX_TREND_JOB_DATASETS:
+        raise ValueError(f"At most {MAX_TREND_JOB_DATASETS} dataset IDs are allowed")
+    if not all(isinstance(dataset_id, str) and ObjectId.is_valid(dataset_id) for dataset_id in dataset_ids):
+        raise ValueError("Invalid dataset ID")
+    
+    granularity = params.get("granularity", "day")
+    start, end = trend_range(granularity, params.get("start"), params.get("end"))
+    if start >= end:
+        raise ValueError("Start must be before end")
+    
+    return {"dataset_ids": dataset_ids, "start": start, "end": end, "granularity": granularity}
+
+def run_dataset_stats(context) -> Dict[str, Any]:
+    return DatasetService().recompute_dataset_stats()
+
+def run_quality_overview(context, owner: Optional[str], tag: Optional[str], limit: int, days: int) -> Dict[str, Any]:
+    return QualityLogService().get_quality_overview(owner, tag, limit, days)
+
+def run_quality_trend(context, dataset_ids: List[str], start: datetime, end: datetime,
+                      granularity: str) -> Dict[str, Any]:
+    """The multi-dataset quality trend, computed TREND_JOB_CHUNK datasets at a time"""
+    trend = QualityLogService().get_quality_trend(dataset_ids, start, end, granularity,
+                                                  chunk_size=TREND_JOB_CHUNK, progress=context.progress)
+    trend["dataset_count"] = len(trend.pop("dataset_ids"))
+    return trend
+
+# Job type -> (parse the submitted params into keyword arguments, run(context, **kwargs))
+JOB_TYPES = {
+    "dataset_stats": (parse_no_params, run_dataset_stats),
+    "quality_overview": (parse_overview_params, run_quality_overview),
+    "quality_trend": (parse_trend_params, run_quality_trend)
+}
+
+class JobService:
+    def __init__(self):
+        self.repository = get_job_repository()
+
+    def submit_job(self, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and queue a background job"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Job type must be one of: {', '.join(JOB_TYPES)}")
+        
+        parse, run = JOB_TYPES[job_type]
+        kwargs = parse(params)
+        
+        if not job_runner.has_capacity():
+            raise JobQueueFull(max(1, int(job_runner.heartbeat_seconds)))
+        
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "params": params,
+            "status": QUEUED,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "cancel_requested": False,
+            "worker": WORKER_ID,
+            "created_at": now,
+            "heartbeat_at": now
+        }
+        
+        job["_id"] = guarded("write", lambda: self.repository.insert(job))
+        
+        try:
+            job_runner.submit(job["_id"], job_type, self.repository, lambda context: run(context, **kwargs))
+        except JobQueueFull:
+            self.repository.update(job["_id"], self._finished(FAILED, error="Too many background jobs queued"))
+            raise
+        
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job with its progress and, once it succeeded, its result"""
+        if not ObjectId.is_valid(job_id):
+            raise ValueError("Invalid job ID")
+        
+        job = guarded("lookup", lambda: self.repository.find(ObjectId(job_id)))
+        
+        if job is not None and job_runner.is_stale(job):
+            fields = self._finished(FAILED, error="The worker running this job stopped")
+            if guarded("write", lambda: self.repository.update(job["_id"], fields, (QUEUED, RUNNING))):
+                job.update(fields)
+        
+        return job
+
+    def list_jobs(self, job_type: Optional[str] = None, status: Optional[str] = None,
+                  limit: int = 20) -> List[Dict[str, Any]]:
+        """List recent jobs without their results, newest first"""
+        return guarded("list", lambda: self.repository.list_recent(job_type, status, limit))
+
+    def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask a running one to stop at its next check"""
+        if not ObjectId.is_valid(job_id):
+            raise ValueError("Invalid job ID")
+        
+        object_id = ObjectId(job_id)
+        
+        def cancel():
+            fields = dict(self._finished(CANCELLED), cancel_requested=True)
+            if not self.repository.update(object_id, fields, (QUEUED,)):
+                self.repository.update(object_id, {"cancel_requested": True}, (RUNNING,))
+            return self.repository.find(object_id)
+        
+        return guarded("write", cancel)
+
+    @staticmethod
+    def _finished(status: str, **fields) -> Dict[str, Any]:
+        finished_at = datetime.utcnow()
+        return dict(fields, status=status, finished_at=finished_at, expires_at=finished_at + job_runner.retention)
@@ -1,23 +1,62 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import groupby
 from bson import ObjectId
-from utils.database import get_db
-from models.quality_log import QualityLogCreate
-from typing import List, Optional, Dict, Any
+from services.storage import get_dataset_repository, get_quality_log_repository
+from utils.cache import dataset_cache, quality_summary_cache, invalidate_dataset, invalidate_quality_logs
+from utils.events import quality_event_broker, build_quality_event
+from utils.resilience import guarded
+from utils.helpers import parse_datetime_param
+from models.quality_log import QualityLogCreate, QualityStatus
+from typing import Callable, List, Optional, Dict, Any, Tuple
+
+TREND_GRANULARITIES = ("hour", "day", "week", "month")
+
+TREND_DEFAULT_WINDOWS = {
+    "hour": timedelta(days=2),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=12),
+    "month": timedelta(days=365)
+}
+
+# Workers stamp logs with their own clocks and ObjectIds from different
+# processes are unordered within a second, so SSE replay restarts this far
+# before the last event seen. Clients de-duplicate by event ID.
+REPLAY_OVERLAP = timedelta(seconds=5)
+REPLAY_MAX_PAGES = 10
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    """Truncate a timestamp to the start of its hourly bucket"""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def next_hour_bucket(timestamp: datetime) -> datetime:
+    """Round a timestamp up to the start of an hourly bucket"""
+    bucket = hour_bucket(timestamp)
+    return bucket if bucket == timestamp else bucket + timedelta(hours=1)
+
+def trend_range(granularity: str, start: Optional[str], end: Optional[str]) -> Tuple[datetime, datetime]:
+    """Parse a trend's start and end params, defaulting to the granularity's window ending now"""
+    if granularity not in TREND_GRANULARITIES:
+        raise ValueError(f"Granularity must be one of: {', '.join(TREND_GRANULARITIES)}")
+    
+    # Logs are stored with millisecond precision, so round the default end up
+    # to include logs written in the current millisecond.
+    now = datetime.utcnow()
+    default_end = now.replace(microsecond=now.microsecond // 1000 * 1000) + timedelta(milliseconds=1)
+    end = parse_datetime_param(end, default_end)
+    start = parse_datetime_param(start, end - TREND_DEFAULT_WINDOWS[granularity])
+    return start, end
 
 class QualityLogService:
     def __init__(self):
-        self.db = get_db()
-        self.collection = self.db.quality_logs
+        self.repository = get_quality_log_repository()
+        self.datasets = get_dataset_repository()
 
     def create_quality_log(self, dataset_id: str, log_data: QualityLogCreate) -> Dict[str, Any]:
         """Create a new quality log for a dataset"""
         if not ObjectId.is_valid(dataset_id):
             raise ValueError("Invalid dataset ID")
         
-        dataset_exists = self.db.datasets.find_one({
-            "_id": ObjectId(dataset_id),
-            "is_deleted": False
-        })
+        dataset_exists = guarded("lookup", lambda: self.datasets.find_active(ObjectId(dataset_id)))
         
         if not dataset_exists:
             raise ValueError("Dataset not found")
@@ -29,28 +68,77 @@ class QualityLogService:
             "timestamp": datetime.utcnow()
         }
         
-        result = self.collection.insert_one(log_doc)
-        log_doc["_id"] = result.inserted_id
+        def write():
+            log_doc["_id"] = self.repository.insert(log_doc)
+            self.repository.increment_bucket(log_doc["dataset_id"], hour_bucket(log_doc["timestamp"]), log_doc["status"])
+            self.repository.extend_run(log_doc["dataset_id"], log_doc["status"], log_doc["timestamp"], log_doc["details"])
+            self.datasets.set_latest_quality(log_doc["dataset_id"], log_doc["status"], log_doc["timestamp"])
+        
+        guarded("write", write)
+        
+        invalidate_quality_logs(dataset_id)
+        invalidate_dataset(dataset_id, affects_stats=False)
+        
+        quality_event_broker.publish(build_quality_event(log_doc, dataset_exists))
         
         return log_doc
 
-    def get_quality_logs(self, dataset_id: str, page: int = 1, limit: int = 20) -> Dict[str, Any]:
-        """Get quality logs for a dataset with pagination"""
+    def create_quality_logs(self, dataset_id: str, logs_data: List[QualityLogCreate]) -> List[Dict[str, Any]]:
+        """Create several quality logs for a dataset in one write"""
         if not ObjectId.is_valid(dataset_id):
             raise ValueError("Invalid dataset ID")
         
-        query = {"dataset_id": ObjectId(dataset_id)}
+        dataset_exists = guarded("lookup", lambda: self.datasets.find_active(ObjectId(dataset_id)))
+        
+        if not dataset_exists:
+            raise ValueError("Dataset not found")
+        
+        # The batch shares one timestamp; its order is kept by the _id values
+        # insert_many assigns in sequence, so readers sort on (timestamp, _id).
+        timestamp = datetime.utcnow()
+        log_docs = [
+            {
+                "dataset_id": ObjectId(dataset_id),
+                "status": log_data.status,
+                "details": log_data.details,
+                "timestamp": timestamp
+            }
+            for log_data in logs_data
+        ]
+        
+        def write():
+            for log_doc, log_id in zip(log_docs, self.repository.insert_many(log_docs)):
+                log_doc["_id"] = log_id
+            for status in QualityStatus:
+                count = sum(1 for log_doc in log_docs if log_doc["status"] == status)
+                if count:
+                    self.repository.increment_bucket(ObjectId(dataset_id), hour_bucket(timestamp), status, count)
+            for status, group in groupby(log_docs, key=lambda log_doc: log_doc["status"]):
+                group = list(group)
+                self.repository.extend_run(ObjectId(dataset_id), status, timestamp, group[-1]["details"], len(group))
+            self.datasets.set_latest_quality(ObjectId(dataset_id), log_docs[-1]["status"], timestamp)
+        
+        guarded("write", write)
+        
+        invalidate_quality_logs(dataset_id)
+        invalidate_dataset(dataset_id, affects_stats=False)
+        
+        for log_doc in log_docs:
+            quality_event_broker.publish(build_quality_event(log_doc, dataset_exists))
+        
+        return log_docs
+
+    def get_quality_logs(self, dataset_id: str, page: int = 1, limit: int = 20,
+                         raw: bool = False) -> Dict[str, Any]:
+        """Get quality logs for a dataset with pagination, as RawBSONDocuments if raw"""
+        if not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
         
         skip = (page - 1) * limit
         
-        total = self.collection.count_documents(query)
+        total = guarded("list", lambda: self.repository.count_for_dataset(ObjectId(dataset_id)))
         
-        logs = list(
-            self.collection.find(query)
-            .sort("timestamp", -1)
-            .skip(skip)
-            .limit(limit)
-        )
+        logs = guarded("list", lambda: self.repository.list_for_dataset(ObjectId(dataset_id), skip, limit, raw))
         
         return {
             "logs": logs,
@@ -60,42 +148,289 @@ class QualityLogService:
             "total_pages": (total + limit - 1) // limit
         }
 
-    def get_quality_summary(self, dataset_id: str) -> Dict[str, Any]:
-        """Get quality summary for a dataset"""
+    def get_quality_runs(self, dataset_id: str, page: int = 1, limit: int = 20) -> Dict[str, Any]:
+        """Get a dataset's status runs, newest first, with pagination"""
         if not ObjectId.is_valid(dataset_id):
             raise ValueError("Invalid dataset ID")
         
-        pipeline = [
-            {"$match": {"dataset_id": ObjectId(dataset_id)}},
-            {"$group": {
-                "_id": "$status",
-                "count": {"$sum": 1}
-            }}
-        ]
+        skip = (page - 1) * limit
         
-        results = list(self.collection.aggregate(pipeline))
+        total = guarded("list", lambda: self.repository.count_runs(ObjectId(dataset_id)))
+        
+        runs = guarded("list", lambda: self.repository.list_runs(ObjectId(dataset_id), skip, limit))
+        
+        return {
+            "runs": runs,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit
+        }
+
+    def get_quality_transitions(self, dataset_id: str, limit: int = 20) -> Dict[str, Any]:
+        """Get a dataset's current status, since when it has held, and its latest status flips"""
+        if not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
         
-        summary = {"PASS": 0, "FAIL": 0}
-        for result in results:
-            summary[result["_id"]] = result["count"]
+        # Each pair of adjacent runs is one flip, so limit flips need one run more
+        runs = guarded("list", lambda: self.repository.list_runs(ObjectId(dataset_id), 0, limit + 1))
         
-        total_logs = sum(summary.values())
+        transitions = [
+            {
+                "from_status": previous["status"],
+                "to_status": run["status"],
+                "at": run["first_ts"],
+                "previous_status_since": previous["first_ts"],
+                "previous_count": previous["count"]
+            }
+            for run, previous in zip(runs, runs[1:])
+        ]
         
+        current = runs[0] if runs else None
         return {
-            "total_logs": total_logs,
-            "pass_count": summary["PASS"],
-            "fail_count": summary["FAIL"],
-            "pass_rate": (summary["PASS"] / total_logs * 100) if total_logs > 0 else 0
+            "status": current["status"] if current else None,
+            "since": current["first_ts"] if current else None,
+            "count": current["count"] if current else 0,
+            "transitions": transitions
         }
 
+    def get_quality_events_since(self, last_event_id: str, dataset_id: Optional[str] = None,
+                                 status: Optional[str] = None, owner: Optional[str] = None,
+                                 tag: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get quality log events written around and after the given event ID, for SSE resume"""
+        if not ObjectId.is_valid(last_event_id):
+            raise ValueError("Invalid Last-Event-ID")
+        
+        if dataset_id and not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
+        
+        last_id = ObjectId(last_event_id)
+        last_log = guarded("lookup", lambda: self.repository.find_by_id(last_id))
+        if last_log is not None:
+            anchor = last_log["timestamp"]
+        else:
+            anchor = last_id.generation_time.replace(tzinfo=None)
+        
+        since, after_id = anchor - REPLAY_OVERLAP, None
+        datasets = {}
+        events = []
+        
+        # Owner and tag live on the dataset, so pages are filtered here until
+        # enough events match or REPLAY_MAX_PAGES pages have been read.
+        for _ in range(REPLAY_MAX_PAGES):
+            logs = guarded("list", lambda: self.repository.find_since(
+                since,
+                after_id,
+                ObjectId(dataset_id) if dataset_id else None,
+                status,
+                limit
+            ))
+            
+            missing = list({log["dataset_id"] for log in logs} - datasets.keys())
+            for key, dataset in dataset_cache.get_many(str(dataset_id) for dataset_id in missing).items():
+                datasets[ObjectId(key)] = dataset
+            missing = [dataset_id for dataset_id in missing if dataset_id not in datasets]
+            if missing:
+                for dataset in guarded("lookup", lambda: self.datasets.find_by_ids(missing, ["owner", "tags"])):
+                    datasets[dataset["_id"]] = dataset
+            
+            for log in logs:
+                if log["_id"] == last_id:
+                    continue
+                event = build_quality_event(log, datasets.get(log["dataset_id"]))
+                if owner and event["owner"] != owner:
+                    continue
+                if tag and tag not in event["tags"]:
+                    continue
+                events.append(event)
+                if len(events) >= limit:
+                    return events
+            
+            if len(logs) < limit:
+                break
+            since, after_id = logs[-1]["timestamp"], logs[-1]["_id"]
+        
+        return events
+
+    def get_quality_summary(self, dataset_id: str) -> Dict[str, Any]:
+        """Get quality summary for a dataset"""
+        if not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
+        
+        def load():
+            summary = {"PASS": 0, "FAIL": 0}
+            summary.update(self.repository.status_counts(ObjectId(dataset_id)))
+            
+            total_logs = sum(summary.values())
+            
+            return {
+                "total_logs": total_logs,
+                "pass_count": summary["PASS"],
+                "fail_count": summary["FAIL"],
+                "pass_rate": (summary["PASS"] / total_logs * 100) if total_logs > 0 else 0
+            }
+        
+        return quality_summary_cache.get_or_load(dataset_id, "aggregate", load)
+
     def get_latest_quality_status(self, dataset_id: str) -> Optional[Dict[str, Any]]:
         """Get the latest quality status for a dataset"""
         if not ObjectId.is_valid(dataset_id):
             return None
         
-        latest_log = self.collection.find_one(
-            {"dataset_id": ObjectId(dataset_id)},
-            sort=[("timestamp", -1)]
-        )
+        return guarded("lookup", lambda: self.repository.latest(ObjectId(dataset_id)))
+
+    def get_quality_trend(self, dataset_ids: List[str], start: datetime, end: datetime,
+                          granularity: str = "day", chunk_size: Optional[int] = None,
+                          progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Get pass/fail counts and pass rate per time bucket for one or many datasets.
+        
+        With chunk_size, the datasets are aggregated that many at a time and
+        progress(done, total) is called after each chunk.
+        """
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"Granularity must be one of: {', '.join(TREND_GRANULARITIES)}")
+        
+        if not dataset_ids:
+            raise ValueError("At least one dataset ID is required")
+        
+        for dataset_id in dataset_ids:
+            if not ObjectId.is_valid(dataset_id):
+                raise ValueError("Invalid dataset ID")
+        
+        if start >= end:
+            raise ValueError("Start must be before end")
+        
+        object_ids = list(dict.fromkeys(ObjectId(dataset_id) for dataset_id in dataset_ids))
+        chunk_size = chunk_size or len(object_ids)
+        
+        counts = {}
+        with_buckets = 0
+        for done in range(0, len(object_ids), chunk_size):
+            chunk = object_ids[done:done + chunk_size]
+            first_buckets = guarded("lookup", lambda: self.repository.first_buckets(chunk))
+            with_buckets += len(first_buckets)
+            results = guarded("aggregate", lambda: self._split_trend(chunk, first_buckets, start, end, granularity))
+            for result in results:
+                entry = counts.setdefault(result["_id"], [0, 0])
+                entry[0] += result["pass_count"]
+                entry[1] += result["fail_count"]
+            if progress is not None:
+                progress(min(done + chunk_size, len(object_ids)), len(object_ids))
+        
+        buckets = []
+        for bucket, (pass_count, fail_count) in sorted(counts.items()):
+            total = pass_count + fail_count
+            buckets.append({
+                "bucket": bucket,
+                "pass_count": pass_count,
+                "fail_count": fail_count,
+                "total": total,
+                "pass_rate": (pass_count / total * 100) if total > 0 else 0
+            })
+        
+        if with_buckets == len(object_ids):
+            source = "buckets"
+        elif not with_buckets:
+            source = "logs"
+        else:
+            source = "mixed"
         
-        return latest_log
+        return {
+            "dataset_ids": dataset_ids,
+            "granularity": granularity,
+            "start": start,
+            "end": end,
+            "source": source,
+            "buckets": buckets
+        }
+
+    def _split_trend(self, dataset_ids: List[ObjectId], first_buckets: Dict[ObjectId, datetime],
+                     start: datetime, end: datetime, granularity: str) -> List[Dict[str, Any]]:
+        """Trend rows counting each dataset from raw logs up to its first bucket and from buckets after it"""
+        # Logs written before the hourly buckets existed have none until
+        # rebuild-quality-buckets runs, so they are only in the raw logs.
+        splits = {}
+        for object_id in dataset_ids:
+            split = min(max(first_buckets.get(object_id, end), start), end)
+            splits.setdefault(split, []).append(object_id)
+        
+        results = []
+        for split, split_ids in splits.items():
+            if start < split:
+                results += self.repository.log_trend(split_ids, start, split, granularity)
+            if split < end:
+                results += self._bucket_trend(split_ids, split, end, granularity)
+        return results
+
+    def _bucket_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                      granularity: str) -> List[Dict[str, Any]]:
+        """Trend rows from hourly buckets, with partial hours at either end of the range from raw logs
+        so both sources count exactly [start, end)"""
+        first_full, last_full = next_hour_bucket(start), hour_bucket(end)
+        if first_full >= last_full:
+            return self.repository.log_trend(dataset_ids, start, end, granularity)
+        
+        results = self.repository.bucket_trend(dataset_ids, first_full, last_full, granularity)
+        for edge_start, edge_end in ((start, first_full), (last_full, end)):
+            if edge_start < edge_end:
+                results += self.repository.log_trend(dataset_ids, edge_start, edge_end, granularity)
+        return results
+
+    def rebuild_quality_buckets(self, dataset_id: Optional[str] = None) -> None:
+        """Rebuild hourly buckets from raw quality logs, e.g. for logs written before buckets existed"""
+        if dataset_id is not None and not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
+        
+        self.repository.rebuild_buckets([ObjectId(dataset_id)] if dataset_id is not None else None)
+
+    def rebuild_quality_runs(self, dataset_id: Optional[str] = None) -> None:
+        """Rebuild status runs from raw quality logs, e.g. for logs written before runs existed"""
+        if dataset_id is not None and not ObjectId.is_valid(dataset_id):
+            raise ValueError("Invalid dataset ID")
+        
+        self.repository.rebuild_runs([ObjectId(dataset_id)] if dataset_id is not None else None)
+
+    def rebuild_latest_status(self) -> None:
+        """Rebuild the latest-status rollup on dataset documents from raw quality logs"""
+        self.repository.rebuild_latest_status()
+
+    def get_quality_overview(self, owner: Optional[str] = None, tag: Optional[str] = None,
+                             limit: int = 10, days: int = 7) -> Dict[str, Any]:
+        """Get fleet-wide quality overview: failing datasets, worst pass rates and global pass rate"""
+        since = hour_bucket(datetime.utcnow() - timedelta(days=days))
+        
+        failing_total, failing_now = guarded("list", lambda: self.datasets.failing_datasets(owner, tag, limit))
+        
+        pass_rates = guarded("aggregate", lambda: self.repository.pass_rates_since(since, owner, tag, limit))
+        totals = pass_rates["totals"]
+        total_logs = totals["pass_count"] + totals["fail_count"]
+        
+        return {
+            "window_days": days,
+            "since": since,
+            "global": {
+                "datasets_reporting": totals["datasets_reporting"],
+                "total_logs": total_logs,
+                "pass_count": totals["pass_count"],
+                "fail_count": totals["fail_count"],
+                "pass_rate": (totals["pass_count"] / total_logs * 100) if total_logs > 0 else 0
+            },
+            "failing_now": {
+                "total": failing_total,
+                "datasets": failing_now
+            },
+            "worst_datasets": pass_rates["worst"]
+        }
+
+def publish_quality_log_change(change: Dict[str, Any]) -> None:
+    """Publish quality logs inserted by other workers, as seen on the change stream"""
+    if change["operationType"] != "insert" or change["ns"]["coll"] != "quality_logs":
+        return
+    
+    log_doc = change["fullDocument"]
+    if quality_event_broker.subscriber_count() == 0 or quality_event_broker.has_published(str(log_doc["_id"])):
+        return
+    
+    datasets = get_dataset_repository().find_by_ids([log_doc["dataset_id"]], ["owner", "tags"])
+    
+    quality_event_broker.publish(build_quality_event(log_doc, datasets[0] if datasets else None))
@@ -0,0 +1,71 @@
+"""
+Storage backends behind the services.
+
+STORAGE_BACKEND selects the implementation: "mongo" (default) uses the pymongo
+collections from utils.database, "memory" keeps everything in this process
+with secondary indexes, for tests and for running the API without MongoDB.
+With CATALOG_SNAPSHOT_ENABLED, the mongo backend answers dataset listings,
+counts and rankings from an in-process snapshot (services.storage.snapshot).
+"""
+from config import Config
+from utils.database import get_db
+from services.storage.base import DatasetRepository, QualityLogRepository, JobRepository, IdempotencyRepository
+from services.storage.mongo import (
+    MongoDatasetRepository, MongoQualityLogRepository, MongoJobRepository, MongoIdempotencyRepository
+)
+from services.storage.memory import (
+    MemoryDatasetRepository, MemoryQualityLogRepository, MemoryJobRepository, MemoryIdempotencyRepository
+)
+from services.storage.snapshot import SnapshotDatasetRepository
+
+_memory_datasets = None
+_memory_quality_logs = None
+_memory_jobs = None
+_memory_idempotency = None
+
+def _memory_repositories():
+    global _memory_datasets, _memory_quality_logs
+    if _memory_datasets is None:
+        _memory_datasets = MemoryDatasetRepository()
+        _memory_quality_logs = MemoryQualityLogRepository(_memory_datasets)
+    return _memory_datasets, _memory_quality_logs
+
+def get_dataset_repository() -> DatasetRepository:
+    """Get the dataset repository for the configured backend"""
+    if Config.STORAGE_BACKEND == 'memory':
+        return _memory_repositories()[0]
+    if Config.CATALOG_SNAPSHOT_ENABLED:
+        return SnapshotDatasetRepository(get_db())
+    return MongoDatasetRepository(get_db())
+
+def get_quality_log_repository() -> QualityLogRepository:
+    """Get the quality log repository for the configured backend"""
+    if Config.STORAGE_BACKEND == 'memory':
+        return _memory_repositories()[1]
+    return MongoQualityLogRepository(get_db())
+
+def get_job_repository() -> JobRepository:
+    """Get the background job repository for the configured backend"""
+    global _memory_jobs
+    if Config.STORAGE_BACKEND == 'memory':
+        if _memory_jobs is None:
+            _memory_jobs = MemoryJobRepository()
+        return _memory_jobs
+    return MongoJobRepository(get_db())
+
+def get_idempotency_repository() -> IdempotencyRepository:
+    """Get the Idempotency-Key record repository for the configured backend"""
+    global _memory_idempotency
+    if Config.STORAGE_BACKEND == 'memory':
+        if _memory_idempotency is None:
+            _memory_idempotency = MemoryIdempotencyRepository()
+        return _memory_idempotency
+    return MongoIdempotencyRepository(get_db())
+
+def reset_memory_storage():
+    """Discard everything held by the in-memory backend"""
+    global _memory_datasets, _memory_quality_logs, _memory_jobs, _memory_idempotency
+    _memory_datasets = None
+    _memory_quality_logs = None
+    _memory_jobs = None
+    _memory_idempotency = None
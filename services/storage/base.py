@@ -0,0 +1,231 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from bson import ObjectId
+from typing import List, Optional, Dict, Any, Tuple
+
+class DatasetRepository(ABC):
+    """Storage operations on dataset documents used by the services"""
+
+    @abstractmethod
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        """Insert a dataset document and return its ID"""
+
+    @abstractmethod
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        """Insert dataset documents unordered, skipping IDs that already exist, and return how many were inserted;
+        facet counts are left to rebuild_facets"""
+
+    @abstractmethod
+    def find_active(self, dataset_id: ObjectId, raw: bool = False) -> Optional[Dict[str, Any]]:
+        """Get a non-deleted dataset by ID, as a RawBSONDocument if raw"""
+
+    @abstractmethod
+    def find_active_by_name(self, name: str, owner: str,
+                            exclude_id: Optional[ObjectId] = None) -> Optional[Dict[str, Any]]:
+        """Get a non-deleted dataset by name and owner, optionally ignoring one ID"""
+
+    @abstractmethod
+    def find_active_ids_by_names(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], ObjectId]:
+        """IDs of non-deleted datasets keyed by (name, owner), for the keys that have one"""
+
+    @abstractmethod
+    def find_by_ids(self, dataset_ids: List[ObjectId],
+                    fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get datasets by ID, including deleted ones, optionally with only the given fields"""
+
+    @abstractmethod
+    def list_active(self, owner: Optional[str], tag: Optional[str],
+                    skip: int, limit: int, raw: bool = False) -> List[Dict[str, Any]]:
+        """List non-deleted datasets, newest first, filtered by owner and tag, as RawBSONDocuments if raw"""
+
+    @abstractmethod
+    def count_active(self, owner: Optional[str] = None, tag: Optional[str] = None) -> int:
+        """Count non-deleted datasets filtered by owner and tag"""
+
+    @abstractmethod
+    def update_active(self, dataset_id: ObjectId, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Set fields on a non-deleted dataset and return the updated document"""
+
+    @abstractmethod
+    def soft_delete(self, dataset_id: ObjectId, deleted_at: datetime) -> bool:
+        """Mark a dataset deleted; False if it was missing or already deleted"""
+
+    @abstractmethod
+    def changed_since(self, after: Optional[Tuple[datetime, ObjectId]], until: datetime,
+                      limit: int) -> List[Dict[str, Any]]:
+        """Datasets, including deleted ones, in (updated_at, _id) order after the given position and before until"""
+
+    @abstractmethod
+    def deleted_before(self, before: datetime, limit: int) -> List[ObjectId]:
+        """IDs of datasets soft-deleted before a time, oldest deletion first"""
+
+    @abstractmethod
+    def archive(self, dataset_ids: List[ObjectId], archived_at: datetime) -> int:
+        """Move soft-deleted datasets among dataset_ids to the archive and return how many moved"""
+
+    @abstractmethod
+    def top_owners(self, limit: int) -> List[Dict[str, Any]]:
+        """Owners with the most non-deleted datasets, as {"_id", "count"}"""
+
+    @abstractmethod
+    def top_tags(self, limit: int) -> List[Dict[str, Any]]:
+        """Tags on the most non-deleted datasets, as {"_id", "count"}"""
+
+    @abstractmethod
+    def facet(self, field: str, prefix: Optional[str], sort: str,
+              skip: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        """Count and page the distinct owners or tags ("owner" or "tag") of non-deleted datasets,
+        as {"value", "count"}, sorted by "value" or by "count" descending"""
+
+    @abstractmethod
+    def rebuild_facets(self) -> None:
+        """Recompute the owner and tag counts behind facet from the dataset documents"""
+
+    @abstractmethod
+    def set_latest_quality(self, dataset_id: ObjectId, status: str, timestamp: datetime) -> None:
+        """Roll up a quality status onto the dataset unless a newer one is already there"""
+
+    @abstractmethod
+    def failing_datasets(self, owner: Optional[str], tag: Optional[str],
+                         limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        """Count and list non-deleted datasets whose latest quality status is FAIL"""
+
+class QualityLogRepository(ABC):
+    """Storage operations on quality logs, their hourly buckets and status runs used by the services"""
+
+    @abstractmethod
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        """Insert a quality log document and return its ID"""
+
+    @abstractmethod
+    def insert_many(self, docs: List[Dict[str, Any]]) -> List[ObjectId]:
+        """Insert quality log documents in order and return their IDs"""
+
+    @abstractmethod
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        """Insert quality log documents unordered, skipping IDs that already exist, and return how many were
+        inserted; buckets, runs and the latest status are left to the rebuild methods"""
+
+    @abstractmethod
+    def list_for_dataset(self, dataset_id: ObjectId, skip: int, limit: int,
+                         raw: bool = False) -> List[Dict[str, Any]]:
+        """List a dataset's quality logs, newest first, as RawBSONDocuments if raw"""
+
+    @abstractmethod
+    def count_for_dataset(self, dataset_id: ObjectId) -> int:
+        """Count a dataset's quality logs"""
+
+    @abstractmethod
+    def status_counts(self, dataset_id: ObjectId) -> Dict[str, int]:
+        """Count a dataset's quality logs per status"""
+
+    @abstractmethod
+    def latest(self, dataset_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """Get a dataset's most recent quality log"""
+
+    @abstractmethod
+    def find_by_id(self, log_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """Get a quality log by ID"""
+
+    @abstractmethod
+    def find_since(self, since: datetime, after_id: Optional[ObjectId], dataset_id: Optional[ObjectId],
+                   status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """List quality logs in (timestamp, _id) order from since, or after (since, after_id) if given"""
+
+    @abstractmethod
+    def increment_bucket(self, dataset_id: ObjectId, bucket: datetime, status: str, count: int = 1) -> None:
+        """Count quality logs with the same status in their hourly bucket"""
+
+    @abstractmethod
+    def first_buckets(self, dataset_ids: List[ObjectId]) -> Dict[ObjectId, datetime]:
+        """The earliest hourly bucket of each of dataset_ids that has one"""
+
+    @abstractmethod
+    def bucket_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                     granularity: str) -> List[Dict[str, Any]]:
+        """Pass/fail counts per time bucket from hourly buckets, as {"_id", "pass_count", "fail_count"}"""
+
+    @abstractmethod
+    def log_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                  granularity: str) -> List[Dict[str, Any]]:
+        """Pass/fail counts per time bucket from raw logs, as {"_id", "pass_count", "fail_count"}"""
+
+    @abstractmethod
+    def extend_run(self, dataset_id: ObjectId, status: str, timestamp: datetime, details: Optional[str],
+                   count: int = 1) -> None:
+        """Add logs with one status to the dataset's open run, or close it and open a new run if the status changed"""
+
+    @abstractmethod
+    def list_runs(self, dataset_id: ObjectId, skip: int, limit: int) -> List[Dict[str, Any]]:
+        """List a dataset's status runs, newest first"""
+
+    @abstractmethod
+    def count_runs(self, dataset_id: ObjectId) -> int:
+        """Count a dataset's status runs"""
+
+    @abstractmethod
+    def pass_rates_since(self, since: datetime, owner: Optional[str], tag: Optional[str],
+                         limit: int) -> Dict[str, Any]:
+        """Lowest pass rates and overall totals for non-deleted datasets since a time"""
+
+    @abstractmethod
+    def archive_for_datasets(self, dataset_ids: List[ObjectId], archived_at: datetime) -> int:
+        """Move the datasets' quality logs to the archive, drop their buckets and runs and return how many logs moved"""
+
+    @abstractmethod
+    def rebuild_buckets(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        """Recompute hourly buckets from raw logs, optionally for some datasets only"""
+
+    @abstractmethod
+    def rebuild_runs(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        """Recompute status runs from raw logs, optionally for some datasets only"""
+
+    @abstractmethod
+    def rebuild_latest_status(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        """Recompute the latest-status rollup on datasets from raw logs, optionally for some datasets only"""
+
+class JobRepository(ABC):
+    """Storage operations on background job documents used by the job service and runner"""
+
+    @abstractmethod
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        """Insert a job document and return its ID"""
+
+    @abstractmethod
+    def find(self, job_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """Get a job by ID"""
+
+    @abstractmethod
+    def list_recent(self, job_type: Optional[str], status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """List jobs newest first without their results, optionally of one type or status"""
+
+    @abstractmethod
+    def update(self, job_id: ObjectId, fields: Dict[str, Any], statuses: Optional[Tuple[str, ...]] = None) -> bool:
+        """Set fields on a job, only if its status is one of statuses when given; returns whether it was updated"""
+
+    @abstractmethod
+    def heartbeat(self, job_ids: List[ObjectId], at: datetime) -> None:
+        """Record that the worker holding these jobs is alive"""
+
+class IdempotencyRepository(ABC):
+    """Storage for Idempotency-Key records: who holds a key and, once the request finished, its response"""
+
+    @abstractmethod
+    def claim(self, record: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        """Insert a pending record and return None, or return the record already held under its _id
+
+        Records past expires_at and pending records past locked_until are
+        replaced, so a key held by a worker that died can be claimed again.
+        """
+
+    @abstractmethod
+    def find(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Get a record by ID"""
+
+    @abstractmethod
+    def complete(self, record_id: str, response: Dict[str, Any], expires_at: datetime) -> None:
+        """Store the response of a pending record, keeping it until expires_at"""
+
+    @abstractmethod
+    def release(self, record_id: str) -> None:
+        """Delete a pending record so its key can be claimed again"""
@@ -0,0 +1,684 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from models.quality_log import QualityStatus
+from services.storage.base import DatasetRepository, QualityLogRepository, JobRepository, IdempotencyRepository
+from typing import List, Optional, Dict, Any, Tuple
+
+# Below this fraction of the catalog, filtered listings sort the matching IDs
+# directly instead of walking the created_at ordering.
+SORT_CANDIDATES_RATIO = 0.125
+
+def clone(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a document through BSON so stored values match what MongoDB would return"""
+    return bson.decode(bson.encode(doc))
+
+def raw_clone(doc: Dict[str, Any]) -> RawBSONDocument:
+    """Encode a document as MongoDB would return it to a raw BSON read"""
+    return RawBSONDocument(bson.encode(doc))
+
+def to_bson_datetime(value: datetime) -> datetime:
+    """Truncate a datetime to BSON's millisecond precision"""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def truncate_datetime(value: datetime, unit: str) -> datetime:
+    """Truncate a datetime like $dateTrunc, with weeks starting on Sunday"""
+    if unit == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "day":
+        return day
+    if unit == "week":
+        return day - timedelta(days=(day.weekday() + 1) % 7)
+    if unit == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unsupported unit: {unit}")
+
+def facet_page(counts: Dict[str, int], prefix: Optional[str], sort: str,
+               skip: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+    """Filter value counts by prefix, sort them like the dataset_facets queries and page them"""
+    rows = [(value, count) for value, count in counts.items() if not prefix or value.startswith(prefix)]
+    if sort == "value":
+        rows.sort()
+    else:
+        rows.sort(key=lambda row: (-row[1], row[0]))
+    return len(rows), [{"value": value, "count": count} for value, count in rows[skip:skip + limit]]
+
+class MemoryDatasetRepository(DatasetRepository):
+    """Dataset store with secondary indexes on owner, tag, name and created_at.
+
+    Only non-deleted datasets are indexed, so every listing and count is
+    answered from the indexes without filtering on is_deleted. The
+    updated_at ordering for the changes feed covers deleted ones too.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}
+        self._by_owner = defaultdict(set)
+        self._by_tag = defaultdict(set)
+        self._by_name = defaultdict(set)
+        self._by_status = defaultdict(set)
+        self._by_created = []
+        self._by_updated = []
+        self._archive = {}
+
+    def _index(self, doc):
+        dataset_id = doc["_id"]
+        self._by_owner[doc["owner"]].add(dataset_id)
+        for tag in set(doc.get("tags") or []):
+            self._by_tag[tag].add(dataset_id)
+        self._by_name[(doc["name"], doc["owner"])].add(dataset_id)
+        if doc.get("last_quality_status"):
+            self._by_status[doc["last_quality_status"]].add(dataset_id)
+        insort(self._by_created, (doc["created_at"], dataset_id))
+
+    def _unindex(self, doc):
+        dataset_id = doc["_id"]
+        self._discard(self._by_owner, doc["owner"], dataset_id)
+        for tag in set(doc.get("tags") or []):
+            self._discard(self._by_tag, tag, dataset_id)
+        self._discard(self._by_name, (doc["name"], doc["owner"]), dataset_id)
+        if doc.get("last_quality_status"):
+            self._discard(self._by_status, doc["last_quality_status"], dataset_id)
+        entry = (doc["created_at"], dataset_id)
+        index = bisect_left(self._by_created, entry)
+        if index < len(self._by_created) and self._by_created[index] == entry:
+            del self._by_created[index]
+
+    def _unindex_updated(self, doc):
+        entry = (doc.get("updated_at"), doc["_id"])
+        if entry[0] is not None:
+            index = bisect_left(self._by_updated, entry)
+            if index < len(self._by_updated) and self._by_updated[index] == entry:
+                del self._by_updated[index]
+
+    def _set_updated(self, doc, updated_at):
+        """Move a document to its new place in the (updated_at, _id) ordering of all datasets"""
+        self._unindex_updated(doc)
+        doc["updated_at"] = updated_at
+        if updated_at is not None:
+            insort(self._by_updated, (updated_at, doc["_id"]))
+
+    @staticmethod
+    def _discard(index, key, dataset_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(dataset_id)
+            if not ids:
+                del index[key]
+
+    def _candidates(self, owner: Optional[str], tag: Optional[str]) -> Optional[set]:
+        """IDs of active datasets matching the filters, or None for all of them"""
+        sets = []
+        if owner:
+            sets.append(self._by_owner.get(owner, set()))
+        if tag:
+            sets.append(self._by_tag.get(tag, set()))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return set.intersection(*sets) if len(sets) > 1 else set(sets[0])
+
+    def active_ids(self, owner: Optional[str], tag: Optional[str]) -> set:
+        """IDs of active datasets matching the filters"""
+        with self._lock:
+            candidates = self._candidates(owner, tag)
+            if candidates is None:
+                return {dataset_id for _, dataset_id in self._by_created}
+            return candidates
+
+    def scoped(self, dataset_ids, owner: Optional[str], tag: Optional[str]) -> Dict[ObjectId, Dict[str, Any]]:
+        """Active datasets among dataset_ids that match the filters, keyed by ID"""
+        with self._lock:
+            candidates = self._candidates(owner, tag)
+            result = {}
+            for dataset_id in dataset_ids:
+                doc = self._docs.get(dataset_id)
+                if doc is None or doc["is_deleted"]:
+                    continue
+                if candidates is not None and dataset_id not in candidates:
+                    continue
+                result[dataset_id] = doc
+            return result
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        stored = clone(doc)
+        with self._lock:
+            if stored["_id"] in self._docs:
+                raise ValueError("Duplicate dataset ID")
+            self._docs[stored["_id"]] = stored
+            if stored.get("updated_at") is not None:
+                insort(self._by_updated, (stored["updated_at"], stored["_id"]))
+            if not stored.get("is_deleted"):
+                self._index(stored)
+        return stored["_id"]
+
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            fresh = [doc for doc in docs if doc["_id"] not in self._docs]
+            for doc in fresh:
+                self.insert(doc)
+        return len(fresh)
+
+    def find_active(self, dataset_id: ObjectId, raw: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            doc = self._docs.get(dataset_id)
+            if doc is None or doc["is_deleted"]:
+                return None
+            return raw_clone(doc) if raw else clone(doc)
+
+    def find_active_by_name(self, name: str, owner: str,
+                            exclude_id: Optional[ObjectId] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for dataset_id in self._by_name.get((name, owner), ()):
+                if dataset_id != exclude_id:
+                    return clone(self._docs[dataset_id])
+            return None
+
+    def find_active_ids_by_names(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], ObjectId]:
+        with self._lock:
+            return {key: next(iter(self._by_name[key])) for key in keys if self._by_name.get(key)}
+
+    def find_by_ids(self, dataset_ids: List[ObjectId],
+                    fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        keep = ("_id", *fields) if fields else None
+        with self._lock:
+            docs = [self._docs[i] for i in dataset_ids if i in self._docs]
+            if keep is None:
+                return [clone(doc) for doc in docs]
+            return [clone({key: doc[key] for key in keep if key in doc}) for doc in docs]
+
+    def list_active(self, owner: Optional[str], tag: Optional[str],
+                    skip: int, limit: int, raw: bool = False) -> List[Dict[str, Any]]:
+        copy = raw_clone if raw else clone
+        with self._lock:
+            candidates = self._candidates(owner, tag)
+            if candidates is None:
+                ordered = (dataset_id for _, dataset_id in reversed(self._by_created))
+            elif len(candidates) < len(self._by_created) * SORT_CANDIDATES_RATIO:
+                ordered = (
+                    dataset_id for _, dataset_id in sorted(
+                        ((self._docs[i]["created_at"], i) for i in candidates),
+                        reverse=True
+                    )
+                )
+            else:
+                ordered = (
+                    dataset_id for _, dataset_id in reversed(self._by_created)
+                    if dataset_id in candidates
+                )
+            return [copy(self._docs[i]) for i in islice(ordered, skip, skip + limit)]
+
+    def count_active(self, owner: Optional[str] = None, tag: Optional[str] = None) -> int:
+        with self._lock:
+            candidates = self._candidates(owner, tag)
+            return len(self._by_created) if candidates is None else len(candidates)
+
+    def update_active(self, dataset_id: ObjectId, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = clone(fields)
+        with self._lock:
+            doc = self._docs.get(dataset_id)
+            if doc is None or doc["is_deleted"]:
+                return None
+            self._unindex(doc)
+            if "updated_at" in fields:
+                self._set_updated(doc, fields.pop("updated_at"))
+            doc.update(fields)
+            self._index(doc)
+            return clone(doc)
+
+    def soft_delete(self, dataset_id: ObjectId, deleted_at: datetime) -> bool:
+        with self._lock:
+            doc = self._docs.get(dataset_id)
+            if doc is None or doc["is_deleted"]:
+                return False
+            self._unindex(doc)
+            doc["is_deleted"] = True
+            self._set_updated(doc, to_bson_datetime(deleted_at))
+            return True
+
+    def changed_since(self, after: Optional[Tuple[datetime, ObjectId]], until: datetime,
+                      limit: int) -> List[Dict[str, Any]]:
+        until = to_bson_datetime(until)
+        with self._lock:
+            start = 0 if after is None else bisect_right(self._by_updated, after)
+            end = min(bisect_left(self._by_updated, (until,)), start + limit)
+            return [clone(self._docs[dataset_id]) for _, dataset_id in self._by_updated[start:end]]
+
+    def deleted_before(self, before: datetime, limit: int) -> List[ObjectId]:
+        before = to_bson_datetime(before)
+        with self._lock:
+            deleted = sorted(
+                (doc["updated_at"], dataset_id) for dataset_id, doc in self._docs.items()
+                if doc["is_deleted"] and doc["updated_at"] < before
+            )
+        return [dataset_id for _, dataset_id in deleted[:limit]]
+
+    def archive(self, dataset_ids: List[ObjectId], archived_at: datetime) -> int:
+        archived_at = to_bson_datetime(archived_at)
+        moved = 0
+        with self._lock:
+            for dataset_id in dataset_ids:
+                doc = self._docs.get(dataset_id)
+                if doc is None or not doc["is_deleted"]:
+                    continue
+                del self._docs[dataset_id]
+                self._unindex_updated(doc)
+                self._archive[dataset_id] = dict(doc, archived_at=archived_at)
+                moved += 1
+        return moved
+
+    def _top(self, index, limit: int) -> List[Dict[str, Any]]:
+        counts = sorted(((len(ids), key) for key, ids in index.items()), key=lambda c: -c[0])
+        return [{"_id": key, "count": count} for count, key in counts[:limit]]
+
+    def top_owners(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._top(self._by_owner, limit)
+
+    def top_tags(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._top(self._by_tag, limit)
+
+    def facet(self, field: str, prefix: Optional[str], sort: str,
+              skip: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        with self._lock:
+            index = self._by_owner if field == "owner" else self._by_tag
+            counts = {value: len(ids) for value, ids in index.items()}
+        return facet_page(counts, prefix, sort, skip, limit)
+
+    def rebuild_facets(self) -> None:
+        # Facets are read straight from the owner and tag indexes.
+        pass
+
+    def set_latest_quality(self, dataset_id: ObjectId, status: str, timestamp: datetime) -> None:
+        status = getattr(status, "value", status)
+        timestamp = to_bson_datetime(timestamp)
+        with self._lock:
+            doc = self._docs.get(dataset_id)
+            if doc is None:
+                return
+            if doc.get("last_quality_at") is not None and doc["last_quality_at"] > timestamp:
+                return
+            if not doc["is_deleted"]:
+                self._unindex(doc)
+            doc["last_quality_status"] = status
+            doc["last_quality_at"] = timestamp
+            if not doc["is_deleted"]:
+                self._index(doc)
+
+    def failing_datasets(self, owner: Optional[str], tag: Optional[str],
+                         limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        with self._lock:
+            failing = self._by_status.get(QualityStatus.FAIL.value, set())
+            candidates = self._candidates(owner, tag)
+            if candidates is not None:
+                failing = failing & candidates
+            docs = sorted(
+                (self._docs[i] for i in failing),
+                key=lambda doc: doc["last_quality_at"],
+                reverse=True
+            )[:limit]
+            fields = ("_id", "name", "owner", "tags", "last_quality_at")
+            return len(failing), [clone({key: doc[key] for key in fields if key in doc}) for doc in docs]
+
+class MemoryQualityLogRepository(QualityLogRepository):
+    """Quality log store indexed by (dataset_id, timestamp) and _id, with hourly buckets and status runs"""
+
+    def __init__(self, datasets: MemoryDatasetRepository):
+        self.datasets = datasets
+        self._lock = threading.RLock()
+        self._logs = {}
+        self._by_time = []
+        self._by_dataset = defaultdict(list)
+        self._buckets = {}
+        self._buckets_by_dataset = defaultdict(set)
+        self._buckets_by_time = []
+        self._runs = defaultdict(list)
+        self._archive = {}
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        stored = clone(doc)
+        with self._lock:
+            if stored["_id"] in self._logs:
+                raise ValueError("Duplicate quality log ID")
+            self._logs[stored["_id"]] = stored
+            insort(self._by_time, (stored["timestamp"], stored["_id"]))
+            insort(self._by_dataset[stored["dataset_id"]], (stored["timestamp"], stored["_id"]))
+        return stored["_id"]
+
+    def insert_many(self, docs: List[Dict[str, Any]]) -> List[ObjectId]:
+        return [self.insert(doc) for doc in docs]
+
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            fresh = [doc for doc in docs if doc["_id"] not in self._logs]
+            for doc in fresh:
+                self.insert(doc)
+        return len(fresh)
+
+    def list_for_dataset(self, dataset_id: ObjectId, skip: int, limit: int,
+                         raw: bool = False) -> List[Dict[str, Any]]:
+        copy = raw_clone if raw else clone
+        with self._lock:
+            entries = self._by_dataset.get(dataset_id, [])
+            newest_first = islice(reversed(entries), skip, skip + limit)
+            return [copy(self._logs[log_id]) for _, log_id in newest_first]
+
+    def count_for_dataset(self, dataset_id: ObjectId) -> int:
+        with self._lock:
+            return len(self._by_dataset.get(dataset_id, []))
+
+    def status_counts(self, dataset_id: ObjectId) -> Dict[str, int]:
+        counts = defaultdict(int)
+        with self._lock:
+            for _, log_id in self._by_dataset.get(dataset_id, []):
+                counts[self._logs[log_id]["status"]] += 1
+        return dict(counts)
+
+    def latest(self, dataset_id: ObjectId) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._by_dataset.get(dataset_id)
+            if not entries:
+                return None
+            return clone(self._logs[entries[-1][1]])
+
+    def find_by_id(self, log_id: ObjectId) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            log = self._logs.get(log_id)
+            return clone(log) if log is not None else None
+
+    def find_since(self, since: datetime, after_id: Optional[ObjectId], dataset_id: Optional[ObjectId],
+                   status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        since = to_bson_datetime(since)
+        results = []
+        with self._lock:
+            if after_id is None:
+                start = bisect_left(self._by_time, (since,))
+            else:
+                start = bisect_right(self._by_time, (since, after_id))
+            for index in range(start, len(self._by_time)):
+                log = self._logs[self._by_time[index][1]]
+                if dataset_id is not None and log["dataset_id"] != dataset_id:
+                    continue
+                if status and log["status"] != status:
+                    continue
+                results.append(clone(log))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _bucket(self, dataset_id: ObjectId, bucket: datetime) -> List[int]:
+        counts = self._buckets.get((dataset_id, bucket))
+        if counts is None:
+            counts = self._buckets[(dataset_id, bucket)] = [0, 0]
+            self._buckets_by_dataset[dataset_id].add(bucket)
+            insort(self._buckets_by_time, (bucket, dataset_id))
+        return counts
+
+    def increment_bucket(self, dataset_id: ObjectId, bucket: datetime, status: str, count: int = 1) -> None:
+        is_pass = status == QualityStatus.PASS
+        with self._lock:
+            self._bucket(dataset_id, bucket)[0 if is_pass else 1] += count
+
+    def first_buckets(self, dataset_ids: List[ObjectId]) -> Dict[ObjectId, datetime]:
+        with self._lock:
+            return {i: min(self._buckets_by_dataset[i]) for i in dataset_ids if self._buckets_by_dataset.get(i)}
+
+    @staticmethod
+    def _trend_rows(counts) -> List[Dict[str, Any]]:
+        return [
+            {"_id": key, "pass_count": value[0], "fail_count": value[1]}
+            for key, value in sorted(counts.items())
+        ]
+
+    def bucket_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                     granularity: str) -> List[Dict[str, Any]]:
+        start, end = to_bson_datetime(start), to_bson_datetime(end)
+        counts = defaultdict(lambda: [0, 0])
+        with self._lock:
+            for dataset_id in set(dataset_ids):
+                for bucket in self._buckets_by_dataset.get(dataset_id, ()):
+                    if start <= bucket < end:
+                        pass_count, fail_count = self._buckets[(dataset_id, bucket)]
+                        row = counts[truncate_datetime(bucket, granularity)]
+                        row[0] += pass_count
+                        row[1] += fail_count
+        return self._trend_rows(counts)
+
+    def log_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                  granularity: str) -> List[Dict[str, Any]]:
+        start, end = to_bson_datetime(start), to_bson_datetime(end)
+        counts = defaultdict(lambda: [0, 0])
+        with self._lock:
+            for dataset_id in set(dataset_ids):
+                entries = self._by_dataset.get(dataset_id, [])
+                lo = bisect_left(entries, (start,))
+                hi = bisect_left(entries, (end,))
+                for timestamp, log_id in entries[lo:hi]:
+                    status = self._logs[log_id]["status"]
+                    row = counts[truncate_datetime(timestamp, granularity)]
+                    if status == QualityStatus.PASS.value:
+                        row[0] += 1
+                    elif status == QualityStatus.FAIL.value:
+                        row[1] += 1
+        return self._trend_rows(counts)
+
+    def extend_run(self, dataset_id: ObjectId, status: str, timestamp: datetime, details: Optional[str],
+                   count: int = 1) -> None:
+        timestamp = to_bson_datetime(timestamp)
+        with self._lock:
+            runs = self._runs[dataset_id]
+            if runs and runs[-1]["status"] == status:
+                run = runs[-1]
+                run["count"] += count
+                run["last_ts"] = max(run["last_ts"], timestamp)
+                run["last_details"] = details
+                return
+            if runs:
+                runs[-1]["open"] = False
+            runs.append({
+                "_id": ObjectId(),
+                "dataset_id": dataset_id,
+                "status": status,
+                "first_ts": timestamp,
+                "last_ts": timestamp,
+                "count": count,
+                "last_details": details,
+                "open": True
+            })
+
+    def list_runs(self, dataset_id: ObjectId, skip: int, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            runs = sorted(self._runs.get(dataset_id, []), key=lambda run: (run["first_ts"], run["_id"]), reverse=True)
+            return [dict(run) for run in runs[skip:skip + limit]]
+
+    def count_runs(self, dataset_id: ObjectId) -> int:
+        with self._lock:
+            return len(self._runs.get(dataset_id, []))
+
+    def pass_rates_since(self, since: datetime, owner: Optional[str], tag: Optional[str],
+                         limit: int) -> Dict[str, Any]:
+        since = to_bson_datetime(since)
+        sums = defaultdict(lambda: [0, 0])
+        scoped_ids = self.datasets.active_ids(owner, tag) if owner or tag else None
+        with self._lock:
+            if scoped_ids is not None:
+                entries = (
+                    (bucket, dataset_id)
+                    for dataset_id in scoped_ids
+                    for bucket in self._buckets_by_dataset.get(dataset_id, ())
+                    if bucket >= since
+                )
+            else:
+                entries = (
+                    self._buckets_by_time[index]
+                    for index in range(bisect_left(self._buckets_by_time, (since,)), len(self._buckets_by_time))
+                )
+            for bucket, dataset_id in entries:
+                pass_count, fail_count = self._buckets[(dataset_id, bucket)]
+                row = sums[dataset_id]
+                row[0] += pass_count
+                row[1] += fail_count
+
+        datasets = self.datasets.scoped(list(sums), owner, tag)
+        rows = []
+        for dataset_id, dataset in datasets.items():
+            pass_count, fail_count = sums[dataset_id]
+            total = pass_count + fail_count
+            rows.append({
+                "dataset_id": dataset_id,
+                "name": dataset["name"],
+                "owner": dataset["owner"],
+                "pass_count": pass_count,
+                "fail_count": fail_count,
+                "total": total,
+                "pass_rate": pass_count / total * 100
+            })
+
+        rows.sort(key=lambda row: (row["pass_rate"], -row["total"]))
+        return {
+            "worst": rows[:limit],
+            "totals": {
+                "datasets_reporting": len(rows),
+                "pass_count": sum(row["pass_count"] for row in rows),
+                "fail_count": sum(row["fail_count"] for row in rows)
+            }
+        }
+
+    def archive_for_datasets(self, dataset_ids: List[ObjectId], archived_at: datetime) -> int:
+        archived_at = to_bson_datetime(archived_at)
+        moved = 0
+        with self._lock:
+            for dataset_id in set(dataset_ids):
+                for timestamp, log_id in self._by_dataset.pop(dataset_id, []):
+                    self._archive[log_id] = dict(self._logs.pop(log_id), archived_at=archived_at)
+                    del self._by_time[bisect_left(self._by_time, (timestamp, log_id))]
+                    moved += 1
+                for bucket in self._buckets_by_dataset.pop(dataset_id, ()):
+                    del self._buckets[(dataset_id, bucket)]
+                    del self._buckets_by_time[bisect_left(self._buckets_by_time, (bucket, dataset_id))]
+                self._runs.pop(dataset_id, None)
+        return moved
+
+    def rebuild_buckets(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        with self._lock:
+            if dataset_ids is None:
+                dataset_ids = list(self._by_dataset)
+            for current in dataset_ids:
+                counts = defaultdict(lambda: [0, 0])
+                for timestamp, log_id in self._by_dataset.get(current, []):
+                    is_pass = self._logs[log_id]["status"] == QualityStatus.PASS.value
+                    counts[truncate_datetime(timestamp, "hour")][0 if is_pass else 1] += 1
+                for bucket, value in counts.items():
+                    self._bucket(current, bucket)[:] = value
+
+    def rebuild_runs(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        with self._lock:
+            if dataset_ids is None:
+                dataset_ids = list(self._by_dataset)
+            for dataset_id in dataset_ids:
+                self._runs.pop(dataset_id, None)
+                for timestamp, log_id in self._by_dataset.get(dataset_id, []):
+                    log = self._logs[log_id]
+                    self.extend_run(dataset_id, log["status"], timestamp, log["details"])
+
+    def rebuild_latest_status(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        with self._lock:
+            if dataset_ids is None:
+                dataset_ids = list(self._by_dataset)
+            latest = [
+                self._logs[self._by_dataset[dataset_id][-1][1]]
+                for dataset_id in dataset_ids if self._by_dataset.get(dataset_id)
+            ]
+        for log in latest:
+            self.datasets.set_latest_quality(log["dataset_id"], log["status"], log["timestamp"])
+
+class MemoryJobRepository(JobRepository):
+    """Job documents in a dict, listed newest first by _id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        with self._lock:
+            self._jobs[doc["_id"]] = clone(doc)
+        return doc["_id"]
+
+    def find(self, job_id: ObjectId) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return clone(job) if job is not None else None
+
+    def list_recent(self, job_type: Optional[str], status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [
+                job for job in self._jobs.values()
+                if (not job_type or job["type"] == job_type) and (not status or job["status"] == status)
+            ]
+            jobs.sort(key=lambda job: job["_id"], reverse=True)
+            return [{key: value for key, value in clone(job).items() if key != "result"} for job in jobs[:limit]]
+
+    def update(self, job_id: ObjectId, fields: Dict[str, Any], statuses: Optional[Tuple[str, ...]] = None) -> bool:
+        fields = clone(fields)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (statuses is not None and job["status"] not in statuses):
+                return False
+            job.update(fields)
+            return True
+
+    def heartbeat(self, job_ids: List[ObjectId], at: datetime) -> None:
+        at = to_bson_datetime(at)
+        with self._lock:
+            for job_id in job_ids:
+                if job_id in self._jobs:
+                    self._jobs[job_id]["heartbeat_at"] = at
+
+class MemoryIdempotencyRepository(IdempotencyRepository):
+    """Idempotency records in a dict; expired records are dropped when their key is claimed again"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def claim(self, record: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            held = self._records.get(record["_id"])
+            if held is not None and held["expires_at"] > now and (
+                held["status"] != "pending" or held["locked_until"] > now
+            ):
+                return clone(held)
+            self._records[record["_id"]] = clone(record)
+            return None
+
+    def find(self, record_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(record_id)
+            return clone(record) if record is not None else None
+
+    def complete(self, record_id: str, response: Dict[str, Any], expires_at: datetime) -> None:
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None and record["status"] == "pending":
+                record.update(clone({"status": "done", "response": response, "expires_at": expires_at}))
+                record.pop("locked_until", None)
+
+    def release(self, record_id: str) -> None:
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None and record["status"] == "pending":
+                del self._records[record_id]
@@ -0,0 +1,662 @@
+import re
+from datetime import datetime
+from bson import ObjectId, decode, encode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from models.quality_log import QualityStatus
+from services.storage.base import DatasetRepository, QualityLogRepository, JobRepository, IdempotencyRepository
+from utils.database import routed
+from typing import List, Optional, Dict, Any, Tuple
+
+PASS_COUNT = {"$sum": {"$cond": [{"$eq": ["$status", QualityStatus.PASS.value]}, 1, 0]}}
+FAIL_COUNT = {"$sum": {"$cond": [{"$eq": ["$status", QualityStatus.FAIL.value]}, 1, 0]}}
+
+FACET_SOURCES = {"owner": "$owner", "tag": "$tags"}
+
+DUPLICATE_KEY = 11000
+
+# Reads for clients that take BSON leave documents undecoded
+RAW_DOCUMENTS = CodecOptions(document_class=RawBSONDocument)
+
+def raw_reads(collection, raw: bool):
+    return collection.with_options(codec_options=RAW_DOCUMENTS) if raw else collection
+
+def active_query(owner: Optional[str] = None, tag: Optional[str] = None) -> Dict[str, Any]:
+    """Query for non-deleted datasets filtered by owner and tag"""
+    query = {"is_deleted": False}
+    if owner:
+        query["owner"] = owner
+    if tag:
+        query["tags"] = tag
+    return query
+
+def insert_unordered(collection, docs: List[Dict[str, Any]]) -> int:
+    """insert_many without stopping at, or failing on, documents whose _id is already there"""
+    if not docs:
+        return 0
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+def facet_values(doc: Optional[Dict[str, Any]]) -> Dict[str, set]:
+    """Owner and distinct tags a dataset document contributes to the facets, none if it is deleted"""
+    if doc is None or doc.get("is_deleted"):
+        return {"owner": set(), "tag": set()}
+    return {"owner": {doc["owner"]}, "tag": set(doc.get("tags") or [])}
+
+class MongoDatasetRepository(DatasetRepository):
+    """Datasets collection, with owner and tag counts kept in dataset_facets by every write"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return routed(self.db.datasets)
+
+    @property
+    def facets(self):
+        return routed(self.db.dataset_facets)
+
+    def _update_facets(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        old, new = facet_values(before), facet_values(after)
+        updates, emptied = [], []
+        for field in ("owner", "tag"):
+            for value in new[field] - old[field]:
+                updates.append(UpdateOne({"field": field, "value": value}, {"$inc": {"count": 1}}, upsert=True))
+            for value in old[field] - new[field]:
+                updates.append(UpdateOne({"field": field, "value": value}, {"$inc": {"count": -1}}))
+                emptied.append({"field": field, "value": value, "count": {"$lte": 0}})
+        if updates:
+            self.facets.bulk_write(updates, ordered=False)
+        if emptied:
+            self.facets.delete_many({"$or": emptied})
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        dataset_id = self.collection.insert_one(doc).inserted_id
+        self._update_facets(None, doc)
+        return dataset_id
+
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        return insert_unordered(self.collection, docs)
+
+    def find_active(self, dataset_id: ObjectId, raw: bool = False) -> Optional[Dict[str, Any]]:
+        return raw_reads(self.collection, raw).find_one({"_id": dataset_id, "is_deleted": False})
+
+    def find_active_by_name(self, name: str, owner: str,
+                            exclude_id: Optional[ObjectId] = None) -> Optional[Dict[str, Any]]:
+        query = {"name": name, "owner": owner, "is_deleted": False}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        return self.collection.find_one(query)
+
+    def find_active_ids_by_names(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], ObjectId]:
+        if not keys:
+            return {}
+        # is_deleted goes in every branch so each one can use active_name_owner
+        query = {"$or": [{"name": name, "owner": owner, "is_deleted": False} for name, owner in keys]}
+        return {
+            (doc["name"], doc["owner"]): doc["_id"]
+            for doc in self.collection.find(query, {"name": 1, "owner": 1})
+        }
+
+    def find_by_ids(self, dataset_ids: List[ObjectId],
+                    fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        projection = {field: 1 for field in fields} if fields else None
+        return list(self.collection.find({"_id": {"$in": dataset_ids}}, projection))
+
+    def list_active(self, owner: Optional[str], tag: Optional[str],
+                    skip: int, limit: int, raw: bool = False) -> List[Dict[str, Any]]:
+        return list(
+            raw_reads(self.collection, raw).find(active_query(owner, tag))
+            .sort("created_at", -1)
+            .skip(skip)
+            .limit(limit)
+        )
+
+    def count_active(self, owner: Optional[str] = None, tag: Optional[str] = None) -> int:
+        return self.collection.count_documents(active_query(owner, tag))
+
+    def update_active(self, dataset_id: ObjectId, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # The previous document tells which facet counts change; the update is
+        # a plain $set, so the new one follows from it. Fields go through BSON
+        # so datetimes match what the server stored.
+        before = self.collection.find_one_and_update(
+            {"_id": dataset_id, "is_deleted": False},
+            {"$set": fields},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return None
+        after = dict(before, **decode(encode(fields)))
+        self._update_facets(before, after)
+        return after
+
+    def soft_delete(self, dataset_id: ObjectId, deleted_at: datetime) -> bool:
+        before = self.collection.find_one_and_update(
+            {"_id": dataset_id, "is_deleted": False},
+            {"$set": {"is_deleted": True, "updated_at": deleted_at}},
+            projection={"owner": 1, "tags": 1}
+        )
+        if before is None:
+            return False
+        self._update_facets(before, None)
+        return True
+
+    def changed_since(self, after: Optional[Tuple[datetime, ObjectId]], until: datetime,
+                      limit: int) -> List[Dict[str, Any]]:
+        if after is None:
+            query = {"updated_at": {"$lt": until}}
+        else:
+            since, after_id = after
+            query = {"$or": [
+                {"updated_at": {"$gt": since, "$lt": until}},
+                {"updated_at": since, "_id": {"$gt": after_id}}
+            ]}
+        return list(self.collection.find(query).sort([("updated_at", 1), ("_id", 1)]).limit(limit))
+
+    def deleted_before(self, before: datetime, limit: int) -> List[ObjectId]:
+        deleted = {"is_deleted": True, "updated_at": {"$lt": before}}
+        return [doc["_id"] for doc in self.collection.find(deleted, {"_id": 1}).sort("updated_at", 1).limit(limit)]
+
+    def archive(self, dataset_ids: List[ObjectId], archived_at: datetime) -> int:
+        # Copy, then delete: a run interrupted in between copies the same
+        # documents again next time, and $merge replaces them.
+        deleted = {"_id": {"$in": dataset_ids}, "is_deleted": True}
+        self.collection.aggregate([
+            {"$match": deleted},
+            {"$addFields": {"archived_at": archived_at}},
+            {"$merge": {"into": "datasets_archive", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ])
+        return self.collection.delete_many(deleted).deleted_count
+
+    def top_owners(self, limit: int) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {"is_deleted": False}},
+            {"$group": {"_id": "$owner", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def top_tags(self, limit: int) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {"is_deleted": False}},
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def facet(self, field: str, prefix: Optional[str], sort: str,
+              skip: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        query = {"field": field, "count": {"$gt": 0}}
+        if prefix:
+            query["value"] = {"$regex": f"^{re.escape(prefix)}"}
+        order = [("value", 1)] if sort == "value" else [("count", -1), ("value", 1)]
+        total = self.facets.count_documents(query)
+        values = list(
+            self.facets.find(query, {"_id": 0, "value": 1, "count": 1})
+            .sort(order)
+            .skip(skip)
+            .limit(limit)
+        )
+        return total, values
+
+    def rebuild_facets(self) -> None:
+        # Zero every count, overwrite the ones that still exist, then drop the
+        # rest, so facet readers never see an empty collection.
+        self.facets.update_many({}, {"$set": {"count": 0}})
+        for field, source in FACET_SOURCES.items():
+            values = {"$setUnion": [source, []]} if field == "tag" else source
+            pipeline = [
+                {"$match": {"is_deleted": False}},
+                {"$project": {"value": values}},
+                *([{"$unwind": "$value"}] if field == "tag" else []),
+                {"$group": {"_id": "$value", "count": {"$sum": 1}}},
+                {"$project": {"_id": 0, "field": field, "value": "$_id", "count": 1}},
+                {"$merge": {
+                    "into": "dataset_facets",
+                    "on": ["field", "value"],
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert"
+                }}
+            ]
+            self.collection.aggregate(pipeline)
+        self.facets.delete_many({"count": {"$lte": 0}})
+
+    def set_latest_quality(self, dataset_id: ObjectId, status: str, timestamp: datetime) -> None:
+        self.collection.update_one(
+            {
+                "_id": dataset_id,
+                "$or": [
+                    {"last_quality_at": {"$exists": False}},
+                    {"last_quality_at": {"$lte": timestamp}}
+                ]
+            },
+            {"$set": {"last_quality_status": status, "last_quality_at": timestamp}}
+        )
+
+    def failing_datasets(self, owner: Optional[str], tag: Optional[str],
+                         limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        query = dict(active_query(owner, tag), last_quality_status=QualityStatus.FAIL.value)
+        total = self.collection.count_documents(query)
+        datasets = list(
+            self.collection.find(
+                query,
+                projection={"name": 1, "owner": 1, "tags": 1, "last_quality_at": 1}
+            )
+            .sort("last_quality_at", -1)
+            .limit(limit)
+        )
+        return total, datasets
+
+class MongoQualityLogRepository(QualityLogRepository):
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return routed(self.db.quality_logs)
+
+    @property
+    def buckets(self):
+        return routed(self.db.quality_log_buckets)
+
+    @property
+    def runs(self):
+        return routed(self.db.quality_status_runs)
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        return self.collection.insert_one(doc).inserted_id
+
+    def insert_many(self, docs: List[Dict[str, Any]]) -> List[ObjectId]:
+        return self.collection.insert_many(docs).inserted_ids
+
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        return insert_unordered(self.collection, docs)
+
+    def list_for_dataset(self, dataset_id: ObjectId, skip: int, limit: int,
+                         raw: bool = False) -> List[Dict[str, Any]]:
+        return list(
+            raw_reads(self.collection, raw).find({"dataset_id": dataset_id})
+            .sort([("timestamp", -1), ("_id", -1)])
+            .skip(skip)
+            .limit(limit)
+        )
+
+    def count_for_dataset(self, dataset_id: ObjectId) -> int:
+        return self.collection.count_documents({"dataset_id": dataset_id})
+
+    def status_counts(self, dataset_id: ObjectId) -> Dict[str, int]:
+        pipeline = [
+            {"$match": {"dataset_id": dataset_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]
+        return {result["_id"]: result["count"] for result in self.collection.aggregate(pipeline)}
+
+    def latest(self, dataset_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"dataset_id": dataset_id}, sort=[("timestamp", -1), ("_id", -1)])
+
+    def find_by_id(self, log_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": log_id})
+
+    def find_since(self, since: datetime, after_id: Optional[ObjectId], dataset_id: Optional[ObjectId],
+                   status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        if after_id is None:
+            query = {"timestamp": {"$gte": since}}
+        else:
+            query = {"$or": [
+                {"timestamp": {"$gt": since}},
+                {"timestamp": since, "_id": {"$gt": after_id}}
+            ]}
+        if dataset_id is not None:
+            query["dataset_id"] = dataset_id
+        if status:
+            query["status"] = status
+        return list(self.collection.find(query).sort([("timestamp", 1), ("_id", 1)]).limit(limit))
+
+    def increment_bucket(self, dataset_id: ObjectId, bucket: datetime, status: str, count: int = 1) -> None:
+        is_pass = status == QualityStatus.PASS
+        self.buckets.update_one(
+            {"dataset_id": dataset_id, "bucket": bucket},
+            {"$inc": {
+                "pass_count": count if is_pass else 0,
+                "fail_count": 0 if is_pass else count
+            }},
+            upsert=True
+        )
+
+    def first_buckets(self, dataset_ids: List[ObjectId]) -> Dict[ObjectId, datetime]:
+        pipeline = [
+            {"$match": {"dataset_id": {"$in": dataset_ids}}},
+            {"$group": {"_id": "$dataset_id", "first": {"$min": "$bucket"}}}
+        ]
+        return {row["_id"]: row["first"] for row in self.buckets.aggregate(pipeline)}
+
+    def bucket_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                     granularity: str) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {
+                "dataset_id": {"$in": dataset_ids},
+                "bucket": {"$gte": start, "$lt": end}
+            }},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$bucket", "unit": granularity}},
+                "pass_count": {"$sum": "$pass_count"},
+                "fail_count": {"$sum": "$fail_count"}
+            }},
+            {"$sort": {"_id": 1}}
+        ]
+        return list(self.buckets.aggregate(pipeline))
+
+    def log_trend(self, dataset_ids: List[ObjectId], start: datetime, end: datetime,
+                  granularity: str) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {
+                "dataset_id": {"$in": dataset_ids},
+                "timestamp": {"$gte": start, "$lt": end}
+            }},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$timestamp", "unit": granularity}},
+                "pass_count": PASS_COUNT,
+                "fail_count": FAIL_COUNT
+            }},
+            {"$sort": {"_id": 1}}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def extend_run(self, dataset_id: ObjectId, status: str, timestamp: datetime, details: Optional[str],
+                   count: int = 1) -> None:
+        extend = {
+            "$inc": {"count": count},
+            "$max": {"last_ts": timestamp},
+            "$set": {"last_details": details}
+        }
+        # At most one run per dataset is open (unique open_run index), so two
+        # writers that both flip the status retry until one of them extends
+        # the run the other opened. Only a run with another status is closed,
+        # so a retry never closes the run it is about to extend.
+        while not self.runs.update_one({"dataset_id": dataset_id, "open": True, "status": status}, extend).matched_count:
+            self.runs.update_many({"dataset_id": dataset_id, "open": True, "status": {"$ne": status}},
+                                  {"$set": {"open": False}})
+            try:
+                self.runs.insert_one({
+                    "dataset_id": dataset_id,
+                    "status": status,
+                    "first_ts": timestamp,
+                    "last_ts": timestamp,
+                    "count": count,
+                    "last_details": details,
+                    "open": True
+                })
+                return
+            except DuplicateKeyError:
+                continue
+
+    def list_runs(self, dataset_id: ObjectId, skip: int, limit: int) -> List[Dict[str, Any]]:
+        return list(
+            self.runs.find({"dataset_id": dataset_id})
+            .sort([("first_ts", -1), ("_id", -1)])
+            .skip(skip)
+            .limit(limit)
+        )
+
+    def count_runs(self, dataset_id: ObjectId) -> int:
+        return self.runs.count_documents({"dataset_id": dataset_id})
+
+    def pass_rates_since(self, since: datetime, owner: Optional[str], tag: Optional[str],
+                         limit: int) -> Dict[str, Any]:
+        match = {"bucket": {"$gte": since}}
+        lookup = [
+            {"$lookup": {
+                "from": "datasets",
+                "localField": "_id",
+                "foreignField": "_id",
+                "pipeline": [
+                    {"$match": {"is_deleted": False}},
+                    {"$project": {"name": 1, "owner": 1}}
+                ],
+                "as": "dataset"
+            }},
+            {"$unwind": "$dataset"}
+        ]
+        
+        # A scoped overview only reads the buckets of the matching datasets, and
+        # those are already known to be active, so only the worst rows need
+        # their names looked up. The global overview has to drop deleted
+        # datasets before totalling.
+        if owner or tag:
+            match["dataset_id"] = {"$in": routed(self.db.datasets).distinct("_id", active_query(owner, tag))}
+            scoped_lookup, worst_lookup = [], lookup
+        else:
+            scoped_lookup, worst_lookup = lookup, []
+        
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$dataset_id",
+                "pass_count": {"$sum": "$pass_count"},
+                "fail_count": {"$sum": "$fail_count"}
+            }},
+            *scoped_lookup,
+            {"$addFields": {
+                "total": {"$add": ["$pass_count", "$fail_count"]},
+                "pass_rate": {"$multiply": [
+                    {"$divide": ["$pass_count", {"$add": ["$pass_count", "$fail_count"]}]},
+                    100
+                ]}
+            }},
+            {"$facet": {
+                "worst": [
+                    {"$sort": {"pass_rate": 1, "total": -1}},
+                    {"$limit": limit},
+                    *worst_lookup,
+                    {"$project": {
+                        "_id": 0,
+                        "dataset_id": "$_id",
+                        "name": "$dataset.name",
+                        "owner": "$dataset.owner",
+                        "pass_count": 1,
+                        "fail_count": 1,
+                        "total": 1,
+                        "pass_rate": 1
+                    }}
+                ],
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "datasets_reporting": {"$sum": 1},
+                        "pass_count": {"$sum": "$pass_count"},
+                        "fail_count": {"$sum": "$fail_count"}
+                    }}
+                ]
+            }}
+        ]
+
+        result = next(self.buckets.aggregate(pipeline), {"worst": [], "totals": []})
+        totals = result["totals"][0] if result["totals"] else {
+            "datasets_reporting": 0, "pass_count": 0, "fail_count": 0
+        }
+        totals.pop("_id", None)
+        return {"worst": result["worst"], "totals": totals}
+
+    def archive_for_datasets(self, dataset_ids: List[ObjectId], archived_at: datetime) -> int:
+        logs = {"dataset_id": {"$in": dataset_ids}}
+        self.collection.aggregate([
+            {"$match": logs},
+            {"$addFields": {"archived_at": archived_at}},
+            {"$merge": {"into": "quality_logs_archive", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ])
+        moved = self.collection.delete_many(logs).deleted_count
+        self.buckets.delete_many(logs)
+        self.runs.delete_many(logs)
+        return moved
+
+    def rebuild_buckets(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        match = {} if dataset_ids is None else {"dataset_id": {"$in": dataset_ids}}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "dataset_id": "$dataset_id",
+                    "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}
+                },
+                "pass_count": PASS_COUNT,
+                "fail_count": FAIL_COUNT
+            }},
+            {"$project": {
+                "_id": 0,
+                "dataset_id": "$_id.dataset_id",
+                "bucket": "$_id.bucket",
+                "pass_count": 1,
+                "fail_count": 1
+            }},
+            {"$merge": {
+                "into": "quality_log_buckets",
+                "on": ["dataset_id", "bucket"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ]
+        self.collection.aggregate(pipeline)
+
+    def rebuild_runs(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        match = {} if dataset_ids is None else {"dataset_id": {"$in": dataset_ids}}
+        order = {"timestamp": 1, "_id": 1}
+        changed = {"$cond": [{"$eq": ["$status", "$previous_status"]}, 0, 1]}
+        pipeline = [
+            {"$match": match},
+            {"$setWindowFields": {
+                "partitionBy": "$dataset_id",
+                "sortBy": order,
+                "output": {"previous_status": {"$shift": {"output": "$status", "by": -1}}}
+            }},
+            # Each status change starts a run; the run number is the count of
+            # changes so far, and the dataset's last run stays open.
+            {"$setWindowFields": {
+                "partitionBy": "$dataset_id",
+                "sortBy": order,
+                "output": {
+                    "run": {"$sum": changed, "window": {"documents": ["unbounded", "current"]}},
+                    "runs": {"$sum": changed, "window": {"documents": ["unbounded", "unbounded"]}}
+                }
+            }},
+            {"$sort": {"dataset_id": 1, **order}},
+            {"$group": {
+                "_id": {"dataset_id": "$dataset_id", "run": "$run"},
+                "status": {"$first": "$status"},
+                "first_ts": {"$first": "$timestamp"},
+                "last_ts": {"$last": "$timestamp"},
+                "count": {"$sum": 1},
+                "last_details": {"$last": "$details"},
+                "open": {"$first": {"$eq": ["$run", "$runs"]}}
+            }},
+            {"$project": {
+                "_id": 0,
+                "dataset_id": "$_id.dataset_id",
+                "status": 1,
+                "first_ts": 1,
+                "last_ts": 1,
+                "count": 1,
+                "last_details": 1,
+                "open": 1
+            }},
+            {"$merge": {"into": "quality_status_runs", "whenNotMatched": "insert"}}
+        ]
+        self.runs.delete_many(match)
+        self.collection.aggregate(pipeline, allowDiskUse=True)
+
+    def rebuild_latest_status(self, dataset_ids: Optional[List[ObjectId]] = None) -> None:
+        match = {} if dataset_ids is None else {"dataset_id": {"$in": dataset_ids}}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"dataset_id": 1, "timestamp": -1, "_id": -1}},
+            {"$group": {
+                "_id": "$dataset_id",
+                "last_quality_status": {"$first": "$status"},
+                "last_quality_at": {"$first": "$timestamp"}
+            }},
+            {"$merge": {
+                "into": "datasets",
+                "on": "_id",
+                "whenMatched": "merge",
+                "whenNotMatched": "discard"
+            }}
+        ]
+        self.collection.aggregate(pipeline, allowDiskUse=True)
+
+class MongoJobRepository(JobRepository):
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return routed(self.db.jobs)
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        return self.collection.insert_one(doc).inserted_id
+
+    def find(self, job_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": job_id})
+
+    def list_recent(self, job_type: Optional[str], status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        query = {}
+        if job_type:
+            query["type"] = job_type
+        if status:
+            query["status"] = status
+        return list(self.collection.find(query, {"result": 0}).sort("_id", -1).limit(limit))
+
+    def update(self, job_id: ObjectId, fields: Dict[str, Any], statuses: Optional[Tuple[str, ...]] = None) -> bool:
+        query = {"_id": job_id}
+        if statuses is not None:
+            query["status"] = {"$in": list(statuses)}
+        return self.collection.update_one(query, {"$set": fields}).matched_count > 0
+
+    def heartbeat(self, job_ids: List[ObjectId], at: datetime) -> None:
+        self.collection.update_many({"_id": {"$in": job_ids}}, {"$set": {"heartbeat_at": at}})
+
+class MongoIdempotencyRepository(IdempotencyRepository):
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return routed(self.db.idempotency_keys)
+
+    def claim(self, record: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        lapsed = {
+            "_id": record["_id"],
+            "$or": [{"expires_at": {"$lte": now}}, {"status": "pending", "locked_until": {"$lte": now}}]
+        }
+        while True:
+            try:
+                self.collection.insert_one(record)
+                return None
+            except DuplicateKeyError:
+                pass
+            if self.collection.find_one_and_replace(lapsed, record) is not None:
+                return None
+            # The holder may release the key between the two calls; then try again.
+            held = self.collection.find_one({"_id": record["_id"]})
+            if held is not None:
+                return held
+
+    def find(self, record_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": record_id})
+
+    def complete(self, record_id: str, response: Dict[str, Any], expires_at: datetime) -> None:
+        self.collection.update_one(
+            {"_id": record_id, "status": "pending"},
+            {"$set": {"status": "done", "response": response, "expires_at": expires_at}, "$unset": {"locked_until": ""}}
+        )
+
+    def release(self, record_id: str) -> None:
+        self.collection.delete_one({"_id": record_id, "status": "pending"})
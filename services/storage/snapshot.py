@@ -0,0 +1,420 @@
+"""
+In-process snapshot of the non-deleted datasets for the mongo backend.
+
+With CATALOG_SNAPSHOT_ENABLED, dataset listings, counts, the owner and tag
+rankings and the facets are answered from memory instead of MongoDB. Each dataset is one
+row across parallel columns: owners and tags are interned to integer codes,
+timestamps are stored as epoch milliseconds, and the owner, tag and full
+inverted indexes are lists of row numbers sorted by created_at.
+
+The snapshot is loaded from MongoDB on first use and kept current by this
+worker's writes and, with CHANGE_STREAMS_ENABLED, by other workers' writes
+seen on the change stream. It is also reloaded in the background every
+CATALOG_SNAPSHOT_REFRESH_SECONDS.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from itertools import islice
+from bson import ObjectId
+from config import Config
+from services.storage.mongo import MongoDatasetRepository, active_query
+from services.storage.memory import to_bson_datetime, facet_page, raw_clone
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+EPOCH = datetime(1970, 1, 1)
+NO_TIME = -2 ** 63
+
+# Fields stored in columns; anything else on a dataset document is kept in a
+# per-row dict.
+COLUMNS = {
+    "_id", "name", "owner", "description", "tags", "created_at", "updated_at",
+    "is_deleted", "last_quality_status", "last_quality_at"
+}
+
+def to_millis(value: Optional[datetime]) -> int:
+    return NO_TIME if value is None else (value - EPOCH) // timedelta(milliseconds=1)
+
+def from_millis(value: int) -> Optional[datetime]:
+    return None if value == NO_TIME else EPOCH + timedelta(milliseconds=value)
+
+class Interner:
+    """Two-way mapping between strings and dense integer codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class CatalogSnapshot:
+    """Column-oriented copy of the active datasets with owner, tag and created_at indexes"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded_at = None
+        self._reloading = False
+        self._pending = []
+
+    def _reset(self):
+        self._rows = {}
+        self._ids = []
+        self._names = []
+        self._descriptions = []
+        self._owners = array('i')
+        self._tags = []
+        self._created = array('q')
+        self._updated = array('q')
+        self._quality_status = []
+        self._quality_at = array('q')
+        self._extra = {}
+        self._free = []
+        self._owner_codes = Interner()
+        self._tag_codes = Interner()
+        self._all = []
+        self._by_owner = {}
+        self._by_tag = {}
+
+    def _created_key(self, row: int) -> int:
+        return self._created[row]
+
+    def _insert_sorted(self, rows: list, row: int):
+        insort(rows, row, key=self._created_key)
+
+    def _remove_sorted(self, rows: list, row: int):
+        index = bisect_left(rows, self._created[row], key=self._created_key)
+        while rows[index] != row:
+            index += 1
+        del rows[index]
+
+    def _add(self, doc: Dict[str, Any], indexed: bool = True) -> int:
+        row = self._free.pop() if self._free else len(self._ids)
+        values = (
+            doc["_id"], doc["name"], doc.get("description"),
+            tuple(self._tag_codes.code(tag) for tag in doc.get("tags") or []),
+            doc.get("last_quality_status")
+        )
+        owner = self._owner_codes.code(doc["owner"])
+        times = (to_millis(doc["created_at"]), to_millis(doc.get("updated_at")), to_millis(doc.get("last_quality_at")))
+        if row == len(self._ids):
+            for column, value in zip((self._ids, self._names, self._descriptions, self._tags, self._quality_status),
+                                     values):
+                column.append(value)
+            self._owners.append(owner)
+            for column, value in zip((self._created, self._updated, self._quality_at), times):
+                column.append(value)
+        else:
+            (self._ids[row], self._names[row], self._descriptions[row],
+             self._tags[row], self._quality_status[row]) = values
+            self._owners[row] = owner
+            self._created[row], self._updated[row], self._quality_at[row] = times
+
+        extra = {key: value for key, value in doc.items() if key not in COLUMNS}
+        if extra:
+            self._extra[row] = extra
+        self._rows[doc["_id"]] = row
+
+        if indexed:
+            self._insert_sorted(self._all, row)
+            self._insert_sorted(self._by_owner.setdefault(owner, []), row)
+            for tag in set(self._tags[row]):
+                self._insert_sorted(self._by_tag.setdefault(tag, []), row)
+        return row
+
+    def _remove(self, dataset_id: ObjectId) -> bool:
+        row = self._rows.pop(dataset_id, None)
+        if row is None:
+            return False
+        self._remove_sorted(self._all, row)
+        self._remove_from(self._by_owner, self._owners[row], row)
+        for tag in set(self._tags[row]):
+            self._remove_from(self._by_tag, tag, row)
+        self._ids[row] = None
+        self._names[row] = self._descriptions[row] = self._quality_status[row] = None
+        self._tags[row] = ()
+        self._extra.pop(row, None)
+        self._free.append(row)
+        return True
+
+    def _remove_from(self, index: dict, code: int, row: int):
+        rows = index[code]
+        self._remove_sorted(rows, row)
+        if not rows:
+            del index[code]
+
+    def _doc(self, row: int) -> Dict[str, Any]:
+        doc = {
+            "_id": self._ids[row],
+            "name": self._names[row],
+            "owner": self._owner_codes.values[self._owners[row]],
+            "description": self._descriptions[row],
+            "tags": [self._tag_codes.values[tag] for tag in self._tags[row]],
+            "created_at": from_millis(self._created[row]),
+            "updated_at": from_millis(self._updated[row]),
+            "is_deleted": False
+        }
+        if self._quality_status[row] is not None:
+            doc["last_quality_status"] = self._quality_status[row]
+        if self._quality_at[row] != NO_TIME:
+            doc["last_quality_at"] = from_millis(self._quality_at[row])
+        doc.update(self._extra.get(row, {}))
+        return doc
+
+    def _postings(self, owner: Optional[str], tag: Optional[str]) -> List[list]:
+        """Index lists for the filters; an empty list means nothing can match"""
+        postings = []
+        if owner:
+            postings.append(self._by_owner.get(self._owner_codes.codes.get(owner), []))
+        if tag:
+            postings.append(self._by_tag.get(self._tag_codes.codes.get(tag), []))
+        return postings
+
+    def _matching(self, owner: Optional[str], tag: Optional[str]) -> Iterable[int]:
+        """Rows matching the filters, newest first"""
+        postings = self._postings(owner, tag)
+        if not postings:
+            return reversed(self._all)
+        if len(postings) == 1:
+            return reversed(postings[0])
+        by_owner, by_tag = postings
+        # Walk the shorter list and check the other filter on each row.
+        if len(by_owner) <= len(by_tag):
+            tag_code, tags = self._tag_codes.codes.get(tag), self._tags
+            return (row for row in reversed(by_owner) if tag_code in tags[row])
+        owner_code, owners = self._owner_codes.codes.get(owner), self._owners
+        return (row for row in reversed(by_tag) if owners[row] == owner_code)
+
+    def load(self, docs: Iterable[Dict[str, Any]]):
+        """Replace the snapshot with the given active dataset documents
+
+        Changes applied while the documents are read are replayed on the new
+        snapshot, since the read may or may not have seen them.
+        """
+        with self._lock:
+            self._reloading = True
+            self._pending = []
+
+        fresh = CatalogSnapshot()
+        try:
+            rows = [fresh._add(doc, indexed=False) for doc in docs if not doc.get("is_deleted")]
+        except BaseException:
+            with self._lock:
+                self._reloading = False
+                self._pending = []
+            raise
+        fresh._all = sorted(rows, key=fresh._created_key)
+        for row in fresh._all:
+            fresh._by_owner.setdefault(fresh._owners[row], []).append(row)
+            for tag in set(fresh._tags[row]):
+                fresh._by_tag.setdefault(tag, []).append(row)
+
+        with self._lock:
+            pending, self._pending, self._reloading = self._pending, [], False
+            self.__dict__.update({key: value for key, value in fresh.__dict__.items()
+                                  if key not in ("_lock", "loaded_at", "_reloading", "_pending")})
+            for method, args in pending:
+                method(*args)
+            self.loaded_at = time.monotonic()
+
+    def _record(self, method, *args):
+        if self._reloading:
+            self._pending.append((method, args))
+
+    def upsert(self, doc: Dict[str, Any]):
+        """Add or replace a dataset, or drop it if it is deleted"""
+        with self._lock:
+            self._record(self.upsert, doc)
+            self._remove(doc["_id"])
+            if not doc.get("is_deleted"):
+                self._add(doc)
+
+    def remove(self, dataset_id: ObjectId):
+        """Drop a dataset"""
+        with self._lock:
+            self._record(self.remove, dataset_id)
+            self._remove(dataset_id)
+
+    def update_fields(self, dataset_id: ObjectId, fields: Dict[str, Any]) -> bool:
+        """Apply top-level field changes to a dataset; False if it is unknown or the change needs the full document"""
+        with self._lock:
+            row = self._rows.get(dataset_id)
+            if row is None or any("." in key for key in fields):
+                return False
+            doc = self._doc(row)
+            doc.update(fields)
+            self.upsert(doc)
+            return True
+
+    def set_latest_quality(self, dataset_id: ObjectId, status: str, timestamp: datetime):
+        """Roll up a quality status unless a newer one is already there, like the repositories do"""
+        with self._lock:
+            self._record(self.set_latest_quality, dataset_id, status, timestamp)
+            row = self._rows.get(dataset_id)
+            millis = to_millis(to_bson_datetime(timestamp))
+            if row is None or self._quality_at[row] > millis:
+                return
+            self._quality_status[row] = getattr(status, "value", status)
+            self._quality_at[row] = millis
+
+    def list(self, owner: Optional[str], tag: Optional[str], skip: int, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._doc(row) for row in islice(self._matching(owner, tag), skip, skip + limit)]
+
+    def count(self, owner: Optional[str] = None, tag: Optional[str] = None) -> int:
+        with self._lock:
+            postings = self._postings(owner, tag)
+            if len(postings) < 2:
+                return len(postings[0]) if postings else len(self._all)
+            return sum(1 for _ in self._matching(owner, tag))
+
+    def _top(self, index: dict, values: list, limit: int) -> List[Dict[str, Any]]:
+        counts = sorted(((len(rows), code) for code, rows in index.items()), key=lambda c: -c[0])
+        return [{"_id": values[code], "count": count} for count, code in counts[:limit]]
+
+    def top_owners(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._top(self._by_owner, self._owner_codes.values, limit)
+
+    def top_tags(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._top(self._by_tag, self._tag_codes.values, limit)
+
+    def facet(self, field: str, prefix: Optional[str], sort: str,
+              skip: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        with self._lock:
+            if field == "owner":
+                index, values = self._by_owner, self._owner_codes.values
+            else:
+                index, values = self._by_tag, self._tag_codes.values
+            counts = {values[code]: len(rows) for code, rows in index.items()}
+        return facet_page(counts, prefix, sort, skip, limit)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._all)
+
+catalog_snapshot = CatalogSnapshot()
+_reload_lock = threading.Lock()
+
+def reload_catalog_snapshot(db, snapshot: CatalogSnapshot = catalog_snapshot):
+    """Load every active dataset from MongoDB into the snapshot"""
+    snapshot.load(db.datasets.find(active_query()))
+    logging.info(f"Catalog snapshot loaded with {len(snapshot)} datasets")
+
+def _reload_in_background(db, snapshot: CatalogSnapshot):
+    if not _reload_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            reload_catalog_snapshot(db, snapshot)
+        except Exception as e:
+            logging.error(f"Catalog snapshot reload failed: {e}")
+        finally:
+            _reload_lock.release()
+
+    threading.Thread(target=run, name="catalog-snapshot-reload", daemon=True).start()
+
+class SnapshotDatasetRepository(MongoDatasetRepository):
+    """MongoDB dataset repository whose listings, counts and rankings come from a CatalogSnapshot"""
+
+    def __init__(self, db, snapshot: CatalogSnapshot = catalog_snapshot):
+        super().__init__(db)
+        self.snapshot = snapshot
+
+    def _ready(self) -> CatalogSnapshot:
+        if self.snapshot.loaded_at is None:
+            with _reload_lock:
+                if self.snapshot.loaded_at is None:
+                    reload_catalog_snapshot(self.db, self.snapshot)
+        elif time.monotonic() - self.snapshot.loaded_at > Config.CATALOG_SNAPSHOT_REFRESH_SECONDS:
+            _reload_in_background(self.db, self.snapshot)
+        return self.snapshot
+
+    def insert(self, doc: Dict[str, Any]) -> ObjectId:
+        dataset_id = super().insert(doc)
+        self.snapshot.upsert(dict(doc, _id=dataset_id))
+        return dataset_id
+
+    def import_many(self, docs: List[Dict[str, Any]]) -> int:
+        inserted = super().import_many(docs)
+        if inserted == len(docs):
+            for doc in docs:
+                self.snapshot.upsert(dict(doc))
+        elif inserted:
+            # Some IDs already existed and kept their stored documents, so
+            # reload rather than guess which of docs were written.
+            self.snapshot.loaded_at = None
+        return inserted
+
+    def list_active(self, owner: Optional[str], tag: Optional[str],
+                    skip: int, limit: int, raw: bool = False) -> List[Dict[str, Any]]:
+        docs = self._ready().list(owner, tag, skip, limit)
+        # Rows are columns, not BSON, so raw listings are encoded here
+        return [raw_clone(doc) for doc in docs] if raw else docs
+
+    def count_active(self, owner: Optional[str] = None, tag: Optional[str] = None) -> int:
+        return self._ready().count(owner, tag)
+
+    def update_active(self, dataset_id: ObjectId, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        doc = super().update_active(dataset_id, fields)
+        if doc is not None:
+            self.snapshot.upsert(doc)
+        return doc
+
+    def soft_delete(self, dataset_id: ObjectId, deleted_at: datetime) -> bool:
+        deleted = super().soft_delete(dataset_id, deleted_at)
+        self.snapshot.remove(dataset_id)
+        return deleted
+
+    def top_owners(self, limit: int) -> List[Dict[str, Any]]:
+        return self._ready().top_owners(limit)
+
+    def top_tags(self, limit: int) -> List[Dict[str, Any]]:
+        return self._ready().top_tags(limit)
+
+    def facet(self, field: str, prefix: Optional[str], sort: str,
+              skip: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        return self._ready().facet(field, prefix, sort, skip, limit)
+
+    def set_latest_quality(self, dataset_id: ObjectId, status: str, timestamp: datetime) -> None:
+        super().set_latest_quality(dataset_id, status, timestamp)
+        self.snapshot.set_latest_quality(dataset_id, status, timestamp)
+
+def apply_catalog_change(change: Dict[str, Any]) -> None:
+    """Apply a dataset change seen on the change stream to the catalog snapshot"""
+    from utils.database import get_db
+
+    operation = change["operationType"]
+    if operation in ("drop", "dropDatabase", "rename", "invalidate"):
+        catalog_snapshot.loaded_at = 0.0
+        return
+    if change["ns"]["coll"] != "datasets" or catalog_snapshot.loaded_at is None:
+        return
+
+    dataset_id = change["documentKey"]["_id"]
+    if operation == "delete":
+        catalog_snapshot.remove(dataset_id)
+        return
+
+    if operation == "update":
+        updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+        if catalog_snapshot.update_fields(dataset_id, updated_fields):
+            return
+        doc = get_db().datasets.find_one({"_id": dataset_id})
+    else:
+        doc = change.get("fullDocument")
+
+    if doc is None:
+        catalog_snapshot.remove(dataset_id)
+    else:
+        catalog_snapshot.upsert(doc)
@@ -0,0 +1,130 @@
+import pytest
+import socketserver
+import threading
+import time
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from config import Config
+from utils.database import get_db
+from utils.cache import clear_caches
+from utils.resilience import mongo_breaker
+from services.storage import reset_memory_storage
+from utils.resp import read_reply
+
+STORAGE_BACKENDS = os.getenv('TEST_STORAGE_BACKENDS', 'mongo,memory').split(',')
+
+MONGO_COLLECTIONS = ("datasets", "dataset_facets", "quality_logs", "quality_log_buckets", "quality_status_runs", "jobs",
+                     "idempotency_keys", "datasets_archive", "quality_logs_archive")
+
+@pytest.fixture(params=STORAGE_BACKENDS)
+def app(request, monkeypatch):
+    """Create and configure a test app for each storage backend"""
+    monkeypatch.setattr(Config, 'STORAGE_BACKEND', request.param)
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def client(app):
+    """Create a test client"""
+    return app.test_client()
+
+def drop_collections(app):
+    with app.app_context():
+        db = get_db()
+        if db is not None and Config.STORAGE_BACKEND == 'mongo':
+            for name in MONGO_COLLECTIONS:
+                db[name].drop()
+
+@pytest.fixture(autouse=True)
+def clean_database(app):
+    """Clean up database before each test"""
+    clear_caches()
+    mongo_breaker.reset()
+    reset_memory_storage()
+    drop_collections(app)
+    yield
+    drop_collections(app)
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """Stand-in Redis server with the commands the shared cache and admission control use"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.data = {}
+        self.commands = []
+        self.lock = threading.Lock()
+
+    def run(self, name, *args):
+        self.commands.append(name)
+        now = time.monotonic()
+        live = lambda key: key in self.data and (self.data[key][1] is None or self.data[key][1] > now)
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name == "GET":
+            return bulk(self.data[args[0]][0] if live(args[0]) else None)
+        if name == "MGET":
+            return b"*%d\r\n" % len(args) + b"".join(bulk(self.data[key][0] if live(key) else None) for key in args)
+        if name == "SET":
+            options = [arg.upper() for arg in args[2:]]
+            if b"NX" in options and live(args[0]):
+                return b"$-1\r\n"
+            expires = now + int(options[options.index(b"PX") + 1]) / 1000 if b"PX" in options else None
+            self.data[args[0]] = (args[1], expires)
+            return b"+OK\r\n"
+        if name == "DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args)
+        if name in ("INCR", "INCRBY"):
+            amount = int(args[1]) if name == "INCRBY" else 1
+            current, expires = self.data[args[0]] if live(args[0]) else (b"0", None)
+            value = int(current) + amount
+            self.data[args[0]] = (str(value).encode(), expires)
+            return b":%d\r\n" % value
+        if name == "PTTL":
+            if not live(args[0]):
+                return b":-2\r\n"
+            expires = self.data[args[0]][1]
+            return b":%d\r\n" % (-1 if expires is None else int((expires - now) * 1000))
+        return b"-ERR unknown command\r\n"
+
+def bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        queued = None
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except ConnectionError:
+                return
+            name = command[0].decode().upper()
+            if name == "MULTI":
+                queued = []
+                reply = b"+OK\r\n"
+            elif name == "EXEC":
+                with self.server.lock:
+                    self.server.commands.append(name)
+                    replies = [self.server.run(*queued_command) for queued_command in queued]
+                queued = None
+                reply = b"*%d\r\n" % len(replies) + b"".join(replies)
+            elif queued is not None:
+                queued.append((name, *command[1:]))
+                reply = b"+QUEUED\r\n"
+            else:
+                with self.server.lock:
+                    reply = self.server.run(name, *command[1:])
+            self.wfile.write(reply)
+
+@pytest.fixture
+def redis_server():
+    """A stand-in Redis server and its URL"""
+    server = FakeRedis()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, "redis://127.0.0.1:%d/0" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
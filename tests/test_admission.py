@@ -0,0 +1,113 @@
+import pytest
+import json
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bson import ObjectId
+from app import create_app
+from config import Config
+from utils.admission import ConcurrencyLimiter, SharedTokenBuckets, TokenBuckets, admission_rejections_total
+from utils.resp import RespClient
+
+def limited_app(monkeypatch, **settings):
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value)
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+class TestAdmission:
+    def test_clients_spend_route_costs_from_their_own_bucket(self, monkeypatch):
+        """Test that a client past its burst gets 429 with Retry-After while other clients are admitted"""
+        app = limited_app(monkeypatch, ADMISSION_RATE_PER_SECOND=0.5, ADMISSION_BURST=6,
+                          ADMISSION_API_KEYS=['crawler', 'pipeline'])
+        client = app.test_client()
+        rejected = admission_rejections_total.value(("rate_limited",))
+        
+        assert client.get('/datasets/stats', headers={'X-API-Key': 'crawler'}).status_code == 200
+        response = client.get('/datasets/stats', headers={'X-API-Key': 'crawler'})
+        
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 8
+        assert json.loads(response.data)['error']
+        assert client.get(f'/datasets/{ObjectId()}', headers={'X-API-Key': 'crawler'}).status_code == 404
+        assert client.get('/datasets/stats', headers={'X-API-Key': 'pipeline'}).status_code == 200
+        assert client.get('/metrics').status_code == 200
+        assert admission_rejections_total.value(("rate_limited",)) == rejected + 1
+
+    def test_unlisted_api_keys_share_the_address_bucket(self, monkeypatch):
+        """Test that a client cannot get a fresh burst by sending a new X-API-Key each time"""
+        app = limited_app(monkeypatch, ADMISSION_RATE_PER_SECOND=0.5, ADMISSION_BURST=6,
+                          ADMISSION_API_KEYS=['crawler'])
+        client = app.test_client()
+        
+        assert client.get('/datasets/stats', headers={'X-API-Key': 'made-up-1'}).status_code == 200
+        assert client.get('/datasets/stats', headers={'X-API-Key': 'made-up-2'}).status_code == 429
+        assert client.get('/datasets/stats').status_code == 429
+        assert client.get('/datasets/stats', headers={'X-API-Key': 'crawler'}).status_code == 200
+
+    def test_busy_worker_answers_503(self, monkeypatch):
+        """Test that requests beyond the concurrency limit and its wait queue are refused at once"""
+        app = limited_app(monkeypatch, ADMISSION_MAX_CONCURRENT=1, ADMISSION_MAX_QUEUED=0)
+        client = app.test_client()
+        limiter = app.extensions['admission'].limiter
+        
+        assert limiter.acquire(0)
+        response = client.get('/datasets')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        
+        limiter.release()
+        assert client.get('/datasets').status_code == 200
+        assert limiter.active == 0
+
+    def test_queued_request_waits_for_a_slot(self):
+        """Test that a queued caller gets the slot released before its timeout"""
+        limiter = ConcurrencyLimiter(1, 1)
+        assert limiter.acquire(0)
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(limiter.acquire(5)))
+        waiter.start()
+        
+        while limiter.waiting == 0:
+            pass
+        assert not limiter.acquire(5)
+        limiter.release()
+        waiter.join()
+        
+        assert acquired == [True]
+        assert not limiter.acquire(0.01)
+
+    def test_shared_buckets_span_workers(self, monkeypatch, redis_server):
+        """Test that buckets on a shared server are spent by every worker"""
+        server, url = redis_server
+        settings = dict(ADMISSION_BACKEND='redis', ADMISSION_REDIS_URL=url, ADMISSION_RATE_PER_SECOND=1,
+                        ADMISSION_BURST=3, ADMISSION_API_KEYS=['other'])
+        first = limited_app(monkeypatch, **settings).test_client()
+        second = limited_app(monkeypatch, **settings).test_client()
+        
+        assert first.get('/datasets').status_code == 200
+        response = second.get('/datasets')
+        
+        assert response.status_code == 429
+        assert 1 <= int(response.headers['Retry-After']) <= 3
+        
+        server.shutdown()
+        server.server_close()
+        assert first.get('/datasets', headers={'X-API-Key': 'other'}).status_code == 200
+
+    def test_shared_bucket_that_lost_its_expiry_starts_a_new_window(self, redis_server):
+        """Test that a key left without a TTL is given one again instead of refusing the client for good"""
+        server, url = redis_server
+        buckets = SharedTokenBuckets(RespClient(url, 1, 5), "test:", TokenBuckets(1, 3, 10))
+        server.data[b"test:admission:ip:10.0.0.1"] = (b"500", None)
+        
+        assert buckets.take("ip:10.0.0.1", 1) == 0
+        
+        count, expires = server.data[b"test:admission:ip:10.0.0.1"]
+        assert count == b"1"
+        assert expires is not None
+        assert buckets.take("ip:10.0.0.1", 2) == 0
+        assert buckets.take("ip:10.0.0.1", 1) > 0
+        assert "EXEC" in server.commands
@@ -0,0 +1,67 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
+from bson import ObjectId
+from utils.cache import TTLCache
+from utils.cache_backends import RedisCacheBackend, cache_backend_errors_total
+from utils.resp import RespClient
+
+def shared_cache(url, name="dataset"):
+    """A cache on its own connection, as in a separate process"""
+    return TTLCache(name, RedisCacheBackend(name, RespClient(url, 1, 5), "test:"), 60, 300)
+
+class TestSharedCache:
+    def test_values_are_shared_and_keep_bson_types(self, redis_server):
+        """Test that a value written by one process is read by another with its ObjectIds and dates"""
+        server, url = redis_server
+        first, second = shared_cache(url), shared_cache(url)
+        dataset = {"_id": ObjectId(), "name": "orders", "tags": ["daily"],
+                   "description": "x" * 4000, "created_at": datetime(2024, 1, 2, 3, 4, 5)}
+        
+        first.set("a", dataset)
+        
+        assert second.get("a") == dataset
+        assert len(server.data[b"test:dataset:k:a"][0]) < 1000
+        assert second.get("b") is None
+
+    def test_clear_and_delete_invalidate_every_process(self, redis_server):
+        """Test that clearing bumps the shared generation and deleting removes the shared entry"""
+        _, url = redis_server
+        first, second = shared_cache(url), shared_cache(url)
+        first.set_many({"a": {"n": 1}, "b": {"n": 2}})
+        
+        second.clear()
+        assert first.get("a") is None
+        
+        first.set_many({"a": {"n": 1}, "b": {"n": 2}})
+        second.delete("a")
+        assert first.get_many(["a", "b"]) == {"b": {"n": 2}}
+        
+        first.set("c", {"n": 3}, generation=(0, 0))
+        assert second.get("c") is None
+
+    def test_get_many_is_one_round_trip(self, redis_server):
+        """Test that a batch read fetches the generation and every key with one MGET"""
+        server, url = redis_server
+        cache = shared_cache(url)
+        cache.set_many({str(i): {"n": i} for i in range(20)})
+        server.commands.clear()
+        
+        found = cache.get_many([str(i) for i in range(25)])
+        
+        assert found == {str(i): {"n": i} for i in range(20)}
+        assert server.commands == ["MGET"]
+
+    def test_unreachable_server_is_a_miss(self, redis_server):
+        """Test that the cache loads from the database when the server is down"""
+        server, url = redis_server
+        server.shutdown()
+        server.server_close()
+        cache = shared_cache(url, "quality_summary")
+        errors = cache_backend_errors_total.value(("quality_summary",))
+        
+        assert cache.get_or_load("a", "aggregate", lambda: {"total_logs": 1}) == {"total_logs": 1}
+        assert cache.get_or_load("a", "aggregate", lambda: {"total_logs": 2}) == {"total_logs": 2}
+        assert cache_backend_errors_total.value(("quality_summary",)) > errors
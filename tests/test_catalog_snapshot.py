@@ -0,0 +1,97 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
+from bson import ObjectId
+from benchmarks.generator import CatalogSpec, generate_datasets, owner_name, tag_name
+from services.storage.memory import MemoryDatasetRepository
+from services.storage.snapshot import CatalogSnapshot
+
+FILTERS = [
+    (None, None),
+    (owner_name(0), None),
+    (None, tag_name(0)),
+    (None, tag_name(7)),
+    (owner_name(0), tag_name(0)),
+    (owner_name(3), tag_name(1)),
+    ("nobody", None),
+    (None, "missing")
+]
+
+@pytest.fixture
+def catalog():
+    """The same synthetic catalog in the in-memory repository and a snapshot"""
+    spec = CatalogSpec(num_datasets=500, logs_per_dataset=0, num_owners=10, num_tags=20)
+    docs = [dict(doc, _id=ObjectId()) for doc in generate_datasets(spec)]
+    repository = MemoryDatasetRepository()
+    for doc in docs:
+        repository.insert(dict(doc))
+    snapshot = CatalogSnapshot()
+    snapshot.load(dict(doc) for doc in docs)
+    return repository, snapshot, docs
+
+def assert_same(repository, snapshot):
+    for owner, tag in FILTERS:
+        assert snapshot.count(owner, tag) == repository.count_active(owner, tag)
+        for skip in (0, 20):
+            listed = snapshot.list(owner, tag, skip, 20)
+            expected = repository.list_active(owner, tag, skip, 20)
+            assert [doc["created_at"] for doc in listed] == [doc["created_at"] for doc in expected]
+            assert {doc["_id"] for doc in listed} == {doc["_id"] for doc in expected}
+    assert {r["_id"]: r["count"] for r in snapshot.top_owners(100)} == \
+        {r["_id"]: r["count"] for r in repository.top_owners(100)}
+    assert {r["_id"]: r["count"] for r in snapshot.top_tags(100)} == \
+        {r["_id"]: r["count"] for r in repository.top_tags(100)}
+    for field, prefix in (("owner", None), ("tag", None), ("tag", "tag_001")):
+        for sort in ("count", "value"):
+            assert snapshot.facet(field, prefix, sort, 0, 100) == repository.facet(field, prefix, sort, 0, 100)
+
+class TestCatalogSnapshot:
+    def test_matches_repository_after_load(self, catalog):
+        """Test that listings, counts and rankings match the in-memory repository"""
+        repository, snapshot, docs = catalog
+
+        assert_same(repository, snapshot)
+        assert snapshot.list(None, None, 0, 1)[0] == repository.list_active(None, None, 0, 1)[0]
+
+    def test_matches_repository_after_writes(self, catalog):
+        """Test that inserts, updates and deletes keep the indexes in step"""
+        repository, snapshot, docs = catalog
+
+        new = {
+            "_id": ObjectId(), "name": "new", "owner": owner_name(0), "description": None,
+            "tags": [tag_name(0), "fresh"], "created_at": datetime(2030, 1, 1),
+            "updated_at": datetime(2030, 1, 1), "is_deleted": False
+        }
+        repository.insert(dict(new))
+        snapshot.upsert(dict(new))
+
+        for doc in docs[:50]:
+            fields = {"owner": owner_name(1), "tags": [tag_name(2)]}
+            repository.update_active(doc["_id"], fields)
+            assert snapshot.update_fields(doc["_id"], fields)
+        for doc in docs[50:100]:
+            repository.soft_delete(doc["_id"], datetime(2030, 1, 2))
+            snapshot.update_fields(doc["_id"], {"is_deleted": True})
+        for doc in docs[100:120]:
+            repository.soft_delete(doc["_id"], datetime(2030, 1, 2))
+            snapshot.remove(doc["_id"])
+
+        assert_same(repository, snapshot)
+        assert snapshot.list(None, "fresh", 0, 10)[0]["name"] == "new"
+
+    def test_reload_keeps_changes_made_while_loading(self, catalog):
+        """Test that writes applied during a reload survive the swap"""
+        repository, snapshot, docs = catalog
+
+        def documents():
+            for index, doc in enumerate(docs):
+                if index == 10:
+                    snapshot.remove(docs[0]["_id"])
+                yield dict(doc)
+
+        snapshot.load(documents())
+
+        assert len(snapshot) == len(docs) - 1
+        assert docs[0]["_id"] not in {doc["_id"] for doc in snapshot.list(None, None, 0, len(docs))}
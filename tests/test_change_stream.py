@@ -0,0 +1,101 @@
+import pytest
+import time
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
+from bson import ObjectId
+from app import create_app
+from utils.database import get_db
+from utils.cache import dataset_cache, quality_summary_cache, clear_caches
+from utils.change_stream import ChangeStreamListener
+
+def is_replica_set(db):
+    return db.client.admin.command('hello').get('setName') is not None
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def app():
+    """Create and configure a test app"""
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def db(app):
+    """Database handle with change stream collections cleaned up"""
+    db = get_db()
+    clear_caches()
+    db.datasets.drop()
+    db.quality_logs.drop()
+    db.change_stream_tokens.drop()
+    yield db
+    db.datasets.drop()
+    db.quality_logs.drop()
+    db.change_stream_tokens.drop()
+
+@pytest.fixture
+def listener(db):
+    """Running change stream listener"""
+    listener = ChangeStreamListener(db, "test-listener")
+    listener.start()
+    assert wait_for(lambda: listener.available is not None)
+    yield listener
+    listener.stop()
+    listener.join(timeout=5)
+
+class TestChangeStream:
+    def test_falls_back_to_ttl_on_standalone(self, db, listener):
+        """Test that the listener disables itself when change streams are unsupported"""
+        if is_replica_set(db):
+            pytest.skip("Requires a standalone mongod")
+        
+        assert listener.available is False
+        assert wait_for(lambda: not listener.is_alive())
+
+    def test_dataset_write_from_another_worker_invalidates_cache(self, db, listener):
+        """Test that a write made outside this process evicts the cached dataset"""
+        if not is_replica_set(db):
+            pytest.skip("Requires a replica set, e.g. mongod --replSet rs0")
+        
+        now = datetime.utcnow()
+        dataset_id = db.datasets.insert_one({
+            "name": "Cached", "owner": "someone", "tags": [],
+            "created_at": now, "updated_at": now, "is_deleted": False
+        }).inserted_id
+        dataset_cache.set(str(dataset_id), {"name": "Cached"})
+        
+        db.datasets.update_one({"_id": dataset_id}, {"$set": {"name": "Renamed"}})
+        
+        assert wait_for(lambda: dataset_cache.get(str(dataset_id)) is None)
+
+    def test_quality_log_insert_invalidates_summary(self, db, listener):
+        """Test that a quality log written elsewhere evicts the cached summary"""
+        if not is_replica_set(db):
+            pytest.skip("Requires a replica set, e.g. mongod --replSet rs0")
+        
+        dataset_id = "507f1f77bcf86cd799439011"
+        quality_summary_cache.set(dataset_id, {"total_logs": 0})
+        
+        db.quality_logs.insert_one({
+            "dataset_id": ObjectId(dataset_id), "status": "PASS",
+            "details": None, "timestamp": datetime.utcnow()
+        })
+        
+        assert wait_for(lambda: quality_summary_cache.get(dataset_id) is None)
+
+    def test_resume_token_is_persisted(self, db, listener):
+        """Test that the listener stores its resume token"""
+        if not is_replica_set(db):
+            pytest.skip("Requires a replica set, e.g. mongod --replSet rs0")
+        
+        db.datasets.insert_one({"name": "Token", "owner": "someone", "is_deleted": False})
+        
+        assert wait_for(lambda: db.change_stream_tokens.find_one({"_id": "test-listener"}) is not None)
@@ -2,36 +2,16 @@ import pytest
 import json
 import sys
 import os
+import threading
+import time
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app import create_app
-from utils.database import get_db
-
-@pytest.fixture
-def app():
-    """Create and configure a test app"""
-    app = create_app()
-    app.config['TESTING'] = True
-    return app
-
-@pytest.fixture
-def client(app):
-    """Create a test client"""
-    return app.test_client()
-
-@pytest.fixture(autouse=True)
-def clean_database(app):
-    """Clean up database before each test"""
-    with app.app_context():
-        db = get_db()
-        if db is not None:
-            db.datasets.drop()
-            db.quality_logs.drop()
-    yield
-    with app.app_context():
-        db = get_db()
-        if db is not None:
-            db.datasets.drop()
-            db.quality_logs.drop()
+from pymongo.errors import ExecutionTimeout
+from config import Config
+from bson import ObjectId
+from services.dataset_service import DatasetService
+from services.storage import get_dataset_repository, get_quality_log_repository
+from utils.cache import stats_cache, cache_requests_total
+from utils.resilience import mongo_breaker, run_guarded, StorageUnavailable
 
 @pytest.fixture
 def sample_dataset():
@@ -70,6 +50,16 @@ class TestDatasets:
         assert 'error' in data
         assert 'Validation error' in data['error']
 
+    def test_create_dataset_malformed_json(self, client):
+        """Test dataset creation with a body that is not valid JSON"""
+        response = client.post('/datasets',
+                             data='{"name": "Test Dataset",',
+                             content_type='application/json')
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'Validation error' in data['error']
+
     def test_get_datasets(self, client, sample_dataset):
         """Test getting datasets list"""
       
@@ -181,3 +171,235 @@ class TestDatasets:
         
         for dataset in datasets:
             assert 'production' in dataset['tags']
+
+    def test_metrics_endpoint(self, client, sample_dataset):
+        """Test that request and MongoDB metrics are exposed"""
+        client.post('/datasets',
+                   data=json.dumps(sample_dataset),
+                   content_type='application/json')
+        client.get('/datasets')
+        
+        response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        body = response.data.decode()
+        assert 'http_requests_total{method="GET",route="/datasets",status="200"}' in body
+        assert 'http_request_duration_seconds_bucket{method="POST",route="/datasets",le="+Inf"}' in body
+        
+        if Config.STORAGE_BACKEND == 'mongo':
+            assert 'mongo_command_duration_seconds_count{command="insert",collection="datasets"}' in body
+            assert 'mongo_documents_returned_total{command="find",collection="datasets"}' in body
+
+    def test_stats_served_stale_when_database_times_out(self, client, sample_dataset, monkeypatch):
+        """Test that a timed-out aggregation falls back to the last cached stats"""
+        monkeypatch.setattr(stats_cache, 'ttl', 0)
+        monkeypatch.setattr(stats_cache, 'swr_ttl', 0)
+        client.post('/datasets',
+                   data=json.dumps(sample_dataset),
+                   content_type='application/json')
+        client.get('/datasets/stats')
+        
+        def time_out(*args, **kwargs):
+            raise ExecutionTimeout("operation exceeded time limit", 50)
+        monkeypatch.setattr(type(get_dataset_repository()), 'top_owners', time_out)
+        
+        response = client.get('/datasets/stats')
+        
+        assert response.status_code == 200
+        assert response.headers['X-Cache-Status'] == 'stale'
+        assert json.loads(response.data)['data']['total_datasets'] == 1
+
+    def test_circuit_breaker_fails_fast_once_open(self, client, monkeypatch):
+        """Test that repeated timeouts open the breaker and later calls get a 503 without querying"""
+        monkeypatch.setattr(mongo_breaker, 'failure_threshold', 2)
+        calls = []
+        
+        def time_out(*args, **kwargs):
+            calls.append(1)
+            raise ExecutionTimeout("operation exceeded time limit", 50)
+        monkeypatch.setattr(type(get_dataset_repository()), 'count_active', time_out)
+        
+        for _ in range(3):
+            response = client.get('/datasets')
+            assert response.status_code == 503
+            assert int(response.headers['Retry-After']) >= 1
+        
+        assert len(calls) == 2
+        assert mongo_breaker.state == 'open'
+
+    def test_circuit_breaker_probe_error_does_not_stick_half_open(self, monkeypatch):
+        """Test that a probe failing with a non-database error lets the next call probe again"""
+        monkeypatch.setattr(mongo_breaker, 'failure_threshold', 1)
+        monkeypatch.setattr(mongo_breaker, 'reset_seconds', 0)
+        
+        def time_out():
+            raise ExecutionTimeout("operation exceeded time limit", 50)
+        
+        def bad_document():
+            raise TypeError("documents must be a dict")
+        
+        with pytest.raises(StorageUnavailable):
+            run_guarded("lookup", time_out)
+        assert mongo_breaker.state == 'open'
+        
+        with pytest.raises(TypeError):
+            run_guarded("lookup", bad_document)
+        assert mongo_breaker.state == 'open'
+        
+        assert run_guarded("lookup", lambda: 1) == 1
+        assert mongo_breaker.state == 'closed'
+
+    def test_concurrent_stats_requests_share_one_aggregation(self, app, monkeypatch):
+        """Test that identical stats requests arriving together run the aggregation once"""
+        repository_class = type(get_dataset_repository())
+        top_owners = repository_class.top_owners
+        calls = []
+        
+        def slow_top_owners(self, limit):
+            calls.append(1)
+            time.sleep(0.3)
+            return top_owners(self, limit)
+        monkeypatch.setattr(repository_class, 'top_owners', slow_top_owners)
+        coalesced_before = cache_requests_total.value(("stats", "coalesced"))
+        
+        responses = []
+        def get_stats():
+            responses.append(app.test_client().get('/datasets/stats').status_code)
+        threads = [threading.Thread(target=get_stats) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert responses == [200] * 5
+        assert len(calls) == 1
+        assert cache_requests_total.value(("stats", "coalesced")) - coalesced_before == 4
+
+    def test_expired_stats_are_served_while_revalidating(self, client, sample_dataset, monkeypatch):
+        """Test that recently expired stats are returned at once and refreshed in the background"""
+        monkeypatch.setattr(stats_cache, 'ttl', 0)
+        client.get('/datasets/stats')
+        
+        # Written behind the service's back, so nothing invalidates the cache.
+        dataset = dict(sample_dataset, created_at=None, updated_at=None, is_deleted=False)
+        get_dataset_repository().insert(dataset)
+        
+        response = client.get('/datasets/stats')
+        assert json.loads(response.data)['data']['total_datasets'] == 0
+        
+        deadline = time.time() + 5
+        while stats_cache.get_stale("dataset_stats")["total_datasets"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert stats_cache.get_stale("dataset_stats")["total_datasets"] == 1
+
+    def test_facets_follow_writes(self, client):
+        """Test that tag and owner facets count active datasets through creates, updates and deletes"""
+        ids = []
+        for name, owner, tags in [("a", "alice", ["sales", "pii"]), ("b", "alice", ["sales"]),
+                                  ("c", "bob", ["sales", "raw"]), ("d", "bob", ["pii"])]:
+            response = client.post('/datasets',
+                                  data=json.dumps({"name": name, "owner": owner, "tags": tags}),
+                                  content_type='application/json')
+            ids.append(json.loads(response.data)['data']['id'])
+        
+        client.put(f'/datasets/{ids[3]}',
+                  data=json.dumps({"tags": ["raw"], "owner": "carol"}),
+                  content_type='application/json')
+        client.delete(f'/datasets/{ids[1]}')
+        
+        tags = json.loads(client.get('/datasets/facets/tags').data)['data']
+        assert tags['values'] == [
+            {"value": "raw", "count": 2},
+            {"value": "sales", "count": 2},
+            {"value": "pii", "count": 1}
+        ]
+        assert tags['total'] == 3
+        
+        owners = json.loads(client.get('/datasets/facets/owners?sort=value').data)['data']
+        assert owners['values'] == [
+            {"value": "alice", "count": 1},
+            {"value": "bob", "count": 1},
+            {"value": "carol", "count": 1}
+        ]
+
+    def test_facet_prefix_and_pagination(self, client):
+        """Test prefix filtering and paging through facet values"""
+        for index, tag in enumerate(["team-a", "team-b", "team-c", "temp"]):
+            client.post('/datasets',
+                       data=json.dumps({"name": f"d{index}", "owner": "owner", "tags": [tag]}),
+                       content_type='application/json')
+        
+        response = client.get('/datasets/facets/tags?prefix=team-&sort=value&limit=2&page=2')
+        
+        data = json.loads(response.data)['data']
+        assert data['total'] == 3
+        assert data['total_pages'] == 2
+        assert data['values'] == [{"value": "team-c", "count": 1}]
+        
+        assert client.get('/datasets/facets/tags?sort=size').status_code == 400
+        assert client.get('/datasets/facets/names').status_code == 404
+
+    def test_archive_moves_deleted_datasets_after_grace_period(self, client):
+        """Test that archival moves only deleted datasets past the grace period, with their logs"""
+        ids = []
+        for name in ("kept", "deleted", "also-deleted"):
+            response = client.post('/datasets',
+                                  data=json.dumps({"name": name, "owner": "owner"}),
+                                  content_type='application/json')
+            ids.append(json.loads(response.data)['data']['id'])
+        for dataset_id in ids:
+            client.post(f'/datasets/{dataset_id}/quality-logs',
+                       data=json.dumps({"status": "PASS"}),
+                       content_type='application/json')
+        client.delete(f'/datasets/{ids[1]}')
+        client.delete(f'/datasets/{ids[2]}')
+        time.sleep(0.01)
+        
+        service = DatasetService()
+        assert service.archive_deleted_datasets(grace_days=1, include_logs=True) == \
+            {"datasets": 0, "quality_logs": 0}
+        assert service.archive_deleted_datasets(grace_days=0, include_logs=True, batch_size=1) == \
+            {"datasets": 2, "quality_logs": 2}
+        
+        remaining = get_dataset_repository().find_by_ids([ObjectId(i) for i in ids])
+        assert [str(doc["_id"]) for doc in remaining] == [ids[0]]
+        quality_logs = get_quality_log_repository()
+        assert [quality_logs.count_for_dataset(ObjectId(i)) for i in ids] == [1, 0, 0]
+        assert set(quality_logs.first_buckets([ObjectId(i) for i in ids])) == {ObjectId(ids[0])}
+        assert json.loads(client.get('/datasets').data)['data']['total'] == 1
+
+    def test_changes_feed_is_resumable_and_reports_deletes(self, client, monkeypatch):
+        """Test paging through the changes feed, resuming with its token and seeing tombstones"""
+        monkeypatch.setattr(Config, 'SYNC_SETTLE_SECONDS', 0)
+        ids = []
+        for name in ("a", "b", "c"):
+            response = client.post('/datasets',
+                                  data=json.dumps({"name": name, "owner": "owner"}),
+                                  content_type='application/json')
+            ids.append(json.loads(response.data)['data']['id'])
+            time.sleep(0.002)
+        time.sleep(0.002)
+        
+        first = json.loads(client.get('/datasets/changes?limit=2').data)['data']
+        assert [change['id'] for change in first['changes']] == ids[:2]
+        assert first['has_more'] is True
+        
+        client.put(f'/datasets/{ids[0]}',
+                  data=json.dumps({"description": "changed"}),
+                  content_type='application/json')
+        time.sleep(0.002)
+        client.delete(f'/datasets/{ids[1]}')
+        time.sleep(0.002)
+        
+        second = json.loads(client.get(f"/datasets/changes?token={first['next_token']}").data)['data']
+        changes = second['changes']
+        assert [change['id'] for change in changes] == [ids[2], ids[0], ids[1]]
+        assert changes[1]['description'] == "changed"
+        assert changes[2]['is_deleted'] is True and 'name' not in changes[2]
+        assert second['has_more'] is False
+        
+        caught_up = json.loads(client.get(f"/datasets/changes?token={second['next_token']}").data)['data']
+        assert caught_up['changes'] == []
+        assert caught_up['next_token'] == second['next_token']
+        
+        assert client.get('/datasets/changes?token=not-a-token').status_code == 400
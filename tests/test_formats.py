@@ -0,0 +1,65 @@
+import pytest
+import bson
+import json
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
+from bson import ObjectId
+
+def create_dataset(client, name="orders"):
+    response = client.post('/datasets',
+                           data=json.dumps({"name": name, "owner": "sales", "tags": ["daily"]}),
+                           content_type='application/json')
+    return json.loads(response.data)['data']['id']
+
+class TestResponseFormats:
+    def test_bson_returns_stored_documents(self, client):
+        """Test that BSON responses carry documents with their stored types"""
+        dataset_id = create_dataset(client)
+        client.post(f'/datasets/{dataset_id}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+
+        response = client.get('/datasets?owner=sales', headers={'Accept': 'application/bson'})
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/bson'
+        assert 'Accept' in response.headers['Vary']
+        result = bson.decode(response.data)['data']
+        assert result['total'] == 1
+        assert result['datasets'][0]['_id'] == ObjectId(dataset_id)
+        assert isinstance(result['datasets'][0]['created_at'], datetime)
+
+        response = client.get(f'/datasets/{dataset_id}', headers={'Accept': 'application/bson'})
+        assert bson.decode(response.data)['data']['tags'] == ['daily']
+
+        response = client.get(f'/datasets/{dataset_id}/quality-logs', headers={'Accept': 'application/bson'})
+        logs = bson.decode(response.data)['data']['logs']
+        assert [(log['dataset_id'], log['status']) for log in logs] == [(ObjectId(dataset_id), 'PASS')]
+
+    def test_json_unless_another_format_is_preferred(self, client):
+        """Test that JSON stays the default and routes without stored documents do not offer BSON"""
+        dataset_id = create_dataset(client)
+
+        response = client.get(f'/datasets/{dataset_id}', headers={'Accept': 'application/bson;q=0.5, */*'})
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.data)['data']['id'] == dataset_id
+
+        response = client.get('/datasets/stats', headers={'Accept': 'application/bson'})
+        assert response.mimetype == 'application/json'
+
+        response = client.get(f'/datasets/{ObjectId()}', headers={'Accept': 'application/bson'})
+        assert response.status_code == 404
+        assert response.mimetype == 'application/json'
+
+    def test_msgpack_encodes_the_json_envelope(self, client):
+        """Test that MessagePack responses decode to the same body as JSON"""
+        msgpack = pytest.importorskip("msgpack")
+        create_dataset(client)
+
+        packed = client.get('/datasets', headers={'Accept': 'application/msgpack'})
+        plain = client.get('/datasets')
+
+        assert packed.mimetype == 'application/msgpack'
+        assert msgpack.unpackb(packed.data) == json.loads(plain.data)
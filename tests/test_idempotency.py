@@ -0,0 +1,87 @@
+import pytest
+import json
+import threading
+import time
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pymongo.errors import ExecutionTimeout
+from services.storage import get_quality_log_repository
+
+def post(client, path, body, key):
+    return client.post(path, data=json.dumps(body), content_type='application/json',
+                       headers={'Idempotency-Key': key})
+
+def quality_summary(client, dataset_id):
+    return json.loads(client.get(f'/datasets/{dataset_id}/quality-summary').data)['data']
+
+class TestIdempotency:
+    def test_retries_replay_the_first_response(self, client):
+        """Test that repeating a key returns the stored response without writing again"""
+        dataset = {"name": "orders", "owner": "sales"}
+        first = post(client, '/datasets', dataset, 'create-orders')
+        retry = post(client, '/datasets', dataset, 'create-orders')
+        
+        assert first.status_code == retry.status_code == 201
+        assert retry.data == first.data
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first.headers
+        dataset_id = json.loads(first.data)['data']['id']
+        
+        path = f'/datasets/{dataset_id}/quality-logs'
+        for _ in range(3):
+            assert post(client, path, {"status": "PASS"}, 'log-1').status_code == 201
+        assert post(client, path, {"status": "FAIL"}, 'log-2').status_code == 201
+        
+        assert quality_summary(client, dataset_id)['total_logs'] == 2
+
+    def test_key_reused_for_another_body_is_refused(self, client):
+        """Test that a key is bound to its first request body and scoped to its route"""
+        assert post(client, '/datasets', {"name": "orders", "owner": "sales"}, 'shared').status_code == 201
+        
+        response = post(client, '/datasets', {"name": "users", "owner": "crm"}, 'shared')
+        assert response.status_code == 422
+        
+        dataset_id = json.loads(client.get('/datasets').data)['data']['datasets'][0]['id']
+        response = post(client, f'/datasets/{dataset_id}/quality-logs', {"status": "PASS"}, 'shared')
+        assert response.status_code == 201
+
+    def test_concurrent_duplicates_wait_for_the_first(self, app, client, monkeypatch):
+        """Test that a duplicate arriving mid-request waits and gets the first request's response"""
+        dataset_id = json.loads(post(client, '/datasets', {"name": "orders", "owner": "sales"}, 'd').data)['data']['id']
+        repository_class = type(get_quality_log_repository())
+        insert = repository_class.insert
+        
+        def slow_insert(self, doc):
+            time.sleep(0.3)
+            return insert(self, doc)
+        monkeypatch.setattr(repository_class, 'insert', slow_insert)
+        
+        responses = []
+        def create_log():
+            responses.append(post(app.test_client(), f'/datasets/{dataset_id}/quality-logs', {"status": "PASS"}, 'k'))
+        threads = [threading.Thread(target=create_log) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert [response.status_code for response in responses] == [201, 201, 201]
+        assert len({response.data for response in responses}) == 1
+        assert quality_summary(client, dataset_id)['total_logs'] == 1
+
+    def test_server_errors_are_not_stored(self, client, monkeypatch):
+        """Test that a retry after a 503 runs the request again"""
+        dataset_id = json.loads(post(client, '/datasets', {"name": "orders", "owner": "sales"}, 'd').data)['data']['id']
+        repository_class = type(get_quality_log_repository())
+        
+        with monkeypatch.context() as patch:
+            def time_out(*args, **kwargs):
+                raise ExecutionTimeout("operation exceeded time limit", 50)
+            patch.setattr(repository_class, 'insert', time_out)
+            assert post(client, f'/datasets/{dataset_id}/quality-logs', {"status": "PASS"}, 'k').status_code == 503
+        
+        response = post(client, f'/datasets/{dataset_id}/quality-logs', {"status": "PASS"}, 'k')
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
+        assert quality_summary(client, dataset_id)['total_logs'] == 1
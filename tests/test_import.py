@@ -0,0 +1,101 @@
+import pytest
+import gzip
+import json
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def write_ndjson(path, records, opener=open):
+    with opener(path, 'wt') as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+
+def import_catalog(app, *args):
+    result = app.test_cli_runner().invoke(args=['import-catalog', *map(str, args)])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+def get_datasets(client, **params):
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    return json.loads(client.get(f'/datasets?limit=100&{query}').data)['data']
+
+class TestImport:
+    def test_import_datasets_then_quality_logs_by_name(self, app, client, tmp_path):
+        """Test that datasets and quality logs naming them import with rejected records reported"""
+        datasets = tmp_path / "datasets.ndjson.gz"
+        write_ndjson(datasets, [
+            {"name": "orders", "owner": "sales", "tags": ["daily"], "created_at": "2024-01-02T03:04:05Z"},
+            {"name": "users", "owner": "crm"},
+            {"name": "orders", "owner": "sales"},
+            {"owner": "crm"},
+            "not json"
+        ], gzip.open)
+        errors = tmp_path / "errors.ndjson"
+        
+        output = import_catalog(app, datasets, '--kind', 'datasets', '--workers', 0, '--errors', errors)
+        
+        assert "Imported 2 of 5 records (1 already present, 2 rejected)" in output
+        assert [json.loads(line)['record'] for line in errors.read_text().splitlines()] == [4, 5]
+        listed = get_datasets(client)
+        assert listed['total'] == 2
+        orders = next(d for d in listed['datasets'] if d['name'] == 'orders')
+        assert orders['created_at'].startswith('2024-01-02T03:04:05')
+        assert json.loads(client.get('/datasets/facets/tags').data)['data']['values'] == [{"value": "daily", "count": 1}]
+        
+        logs = tmp_path / "logs.csv"
+        logs.write_text(
+            "dataset_name,owner,status,details,timestamp\n"
+            "orders,sales,PASS,,2024-01-03T00:00:00\n"
+            "orders,sales,FAIL,late,2024-01-03T01:00:00\n"
+            "orders,sales,FAIL,late,2024-01-03T02:00:00\n"
+            "orders,nobody,PASS,,2024-01-03T00:00:00\n"
+            "users,crm,MAYBE,,2024-01-03T00:00:00\n"
+        )
+        
+        output = import_catalog(app, logs, '--kind', 'quality-logs', '--workers', 0, '--batch-size', 2)
+        
+        assert "Imported 3 of 5 records (0 already present, 2 rejected)" in output
+        assert "record 4: Dataset not found" in output
+        orders = json.loads(client.get(f"/datasets/{orders['id']}").data)['data']
+        assert orders['last_quality_status'] == 'FAIL'
+        runs = json.loads(client.get(f"/datasets/{orders['id']}/quality-runs").data)['data']['runs']
+        assert [(run['status'], run['count']) for run in runs] == [('FAIL', 2), ('PASS', 1)]
+
+    def test_import_resumes_and_skips_written_records(self, app, client, tmp_path):
+        """Test that a resumed import starts after its checkpoint and a fresh re-run inserts nothing twice"""
+        path = tmp_path / "datasets.ndjson"
+        write_ndjson(path, [{"name": f"d{index}", "owner": "owner"} for index in range(3)])
+        import_catalog(app, path, '--kind', 'datasets', '--workers', 0)
+        
+        with open(path, 'a') as f:
+            f.write(json.dumps({"name": "d3", "owner": "owner"}) + "\n")
+        output = import_catalog(app, path, '--kind', 'datasets', '--workers', 0)
+        
+        assert "Imported 1 of 1 records" in output
+        checkpoint = json.loads((tmp_path / "datasets.ndjson.checkpoint").read_text())
+        assert checkpoint['records'] == 4 and checkpoint['inserted'] == 4 and checkpoint['finished']
+        
+        dataset_id = get_datasets(client)['datasets'][0]['id']
+        logs = tmp_path / "logs.ndjson"
+        write_ndjson(logs, [
+            {"dataset_id": dataset_id, "status": "PASS", "timestamp": f"2024-01-0{day}T00:00:00"} for day in (1, 2)
+        ])
+        import_catalog(app, logs, '--kind', 'quality-logs', '--workers', 0, '--no-checkpoint')
+        output = import_catalog(app, logs, '--kind', 'quality-logs', '--workers', 0, '--no-checkpoint')
+        
+        assert "Imported 0 of 2 records (2 already present, 0 rejected)" in output
+        assert json.loads(client.get(f'/datasets/{dataset_id}/quality-logs').data)['data']['total'] == 2
+        assert get_datasets(client)['total'] == 4
+
+    def test_import_validates_on_worker_processes(self, app, client, tmp_path):
+        """Test that records validated on a process pool are written in file order"""
+        path = tmp_path / "datasets.csv"
+        path.write_text("name,owner,tags\n" + "".join(f"d{index},owner,a;b\n" for index in range(7)) + ",owner,\n")
+        
+        output = import_catalog(app, path, '--kind', 'datasets', '--workers', 2, '--batch-size', 2)
+        
+        assert "Imported 7 of 8 records (0 already present, 1 rejected)" in output
+        assert "record 8: Validation error" in output
+        listed = get_datasets(client, tag='b')
+        assert listed['total'] == 7
+        assert listed['datasets'][0]['tags'] == ['a', 'b']
@@ -0,0 +1,118 @@
+import pytest
+import json
+import sys
+import os
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime, timedelta
+from bson import ObjectId
+from services import job_service
+from services.storage import get_job_repository
+
+def wait_for(client, job_id, statuses=("succeeded", "failed", "cancelled"), timeout=5):
+    """Poll a job until it reaches one of statuses"""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = json.loads(client.get(f'/jobs/{job_id}').data)['data']
+        if job['status'] in statuses or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+def submit(client, job_type, params=None):
+    return client.post('/jobs',
+                       data=json.dumps({"type": job_type, "params": params or {}}),
+                       content_type='application/json')
+
+class TestJobs:
+    def test_dataset_stats_job(self, client):
+        """Test that a stats job runs in the background and stores the same stats the route serves"""
+        for index in range(3):
+            client.post('/datasets',
+                       data=json.dumps({"name": f"d{index}", "owner": "owner", "tags": ["t"]}),
+                       content_type='application/json')
+        
+        response = submit(client, "dataset_stats")
+        
+        assert response.status_code == 202
+        job_id = json.loads(response.data)['data']['id']
+        assert response.headers['Location'] == f'/jobs/{job_id}'
+        
+        job = wait_for(client, job_id)
+        assert job['status'] == 'succeeded'
+        stats = json.loads(client.get('/datasets/stats').data)['data']
+        assert job['result']['total_datasets'] == stats['total_datasets'] == 3
+        assert [(t['id'], t['count']) for t in job['result']['top_tags']] == \
+            [(t['_id'], t['count']) for t in stats['top_tags']]
+        
+        listed = json.loads(client.get('/jobs?type=dataset_stats').data)['data']
+        assert [j['id'] for j in listed] == [job_id]
+        assert 'result' not in listed[0]
+
+    def test_quality_trend_job_reports_progress(self, client, monkeypatch):
+        """Test that a trend job over many datasets merges chunks and records progress"""
+        monkeypatch.setattr(job_service, 'TREND_JOB_CHUNK', 1)
+        dataset_ids = []
+        for index in range(3):
+            response = client.post('/datasets',
+                                   data=json.dumps({"name": f"d{index}", "owner": "owner"}),
+                                   content_type='application/json')
+            dataset_ids.append(json.loads(response.data)['data']['id'])
+            client.post(f'/datasets/{dataset_ids[-1]}/quality-logs',
+                       data=json.dumps({"status": "PASS" if index else "FAIL"}),
+                       content_type='application/json')
+        
+        end = (datetime.utcnow() + timedelta(minutes=1)).isoformat()
+        response = submit(client, "quality_trend", {"dataset_ids": dataset_ids, "end": end})
+        job = wait_for(client, json.loads(response.data)['data']['id'])
+        
+        assert job['status'] == 'succeeded'
+        assert job['progress'] == {"done": 3, "total": 3}
+        assert sum(b['pass_count'] for b in job['result']['buckets']) == 2
+        assert sum(b['fail_count'] for b in job['result']['buckets']) == 1
+
+    def test_invalid_jobs_are_rejected(self, client):
+        """Test that unknown types and bad params fail at submission, not in the background"""
+        assert submit(client, "reindex").status_code == 400
+        assert submit(client, "quality_trend", {"dataset_ids": ["nope"]}).status_code == 400
+        assert submit(client, "dataset_stats", {"unexpected": 1}).status_code == 400
+        assert client.get(f'/jobs/{ObjectId()}').status_code == 404
+
+    def test_cancel_running_job(self, client, monkeypatch):
+        """Test that a running job stops at its next progress report after a cancel"""
+        started, release = threading.Event(), threading.Event()
+        
+        def run_slow(context):
+            started.set()
+            release.wait(5)
+            context.progress(1, 2)
+            return "finished"
+        monkeypatch.setitem(job_service.JOB_TYPES, "slow", (job_service.parse_no_params, run_slow))
+        
+        job_id = json.loads(submit(client, "slow").data)['data']['id']
+        assert started.wait(5)
+        
+        response = client.post(f'/jobs/{job_id}/cancel')
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']['cancel_requested'] is True
+        release.set()
+        
+        job = wait_for(client, job_id)
+        assert job['status'] == 'cancelled'
+        assert job['result'] is None
+        assert client.post(f'/jobs/{job_id}/cancel').status_code == 200
+
+    def test_stale_jobs_are_reported_failed(self, app, client):
+        """Test that a job left unfinished by a stopped worker is failed once its heartbeat is stale"""
+        with app.app_context():
+            long_ago = datetime.utcnow() - timedelta(hours=1)
+            job_id = get_job_repository().insert({
+                "type": "dataset_stats", "params": {}, "status": "running", "progress": None,
+                "result": None, "error": None, "cancel_requested": False, "worker": "gone:1",
+                "created_at": long_ago, "heartbeat_at": long_ago
+            })
+        
+        job = json.loads(client.get(f'/jobs/{job_id}').data)['data']
+        assert job['status'] == 'failed'
+        assert 'stopped' in job['error']
+        assert client.post(f'/jobs/{job_id}/cancel').status_code == 409
@@ -0,0 +1,55 @@
+import pytest
+import json
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from config import Config
+from services.storage import get_dataset_repository
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+@pytest.fixture
+def profiled_client(app, monkeypatch):
+    """Test client for an app that profiles requests carrying the admin token"""
+    monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'secret')
+    profiled = create_app()
+    profiled.config['TESTING'] = True
+    return profiled.test_client()
+
+class TestProfiling:
+    def test_profiles_requests_with_the_token(self, profiled_client, monkeypatch):
+        """Test that a request with the token is profiled and its profile can be fetched"""
+        repository_class = type(get_dataset_repository())
+        list_active = repository_class.list_active
+
+        def slow_list_active(self, *args):
+            time.sleep(0.05)
+            return list_active(self, *args)
+        monkeypatch.setattr(repository_class, 'list_active', slow_list_active)
+
+        response = profiled_client.get('/datasets', headers={'X-Profile': 'true', 'X-Admin-Token': 'secret'})
+        assert response.status_code == 200
+        assert 'db;dur=' in response.headers['Server-Timing']
+
+        profile_id = response.headers['X-Profile-Id']
+        profile = profiled_client.get(f'/admin/profiles/{profile_id}', headers=ADMIN)
+        data = json.loads(profile.data)['data']
+        assert data['route'] == '/datasets'
+        assert data['phases_ms']['db'] >= 25
+        assert data['samples'] > 0
+
+        collapsed = profiled_client.get(f'/admin/profiles/{profile_id}?format=collapsed', headers=ADMIN)
+        assert 'slow_list_active' in collapsed.get_data(as_text=True)
+
+        listed = json.loads(profiled_client.get('/admin/profiles', headers=ADMIN).data)
+        assert [summary['id'] for summary in listed['data']] == [profile_id]
+
+    def test_requests_without_the_token_are_not_profiled(self, profiled_client, client):
+        """Test that only requests asking with the right token are profiled or see profiles"""
+        assert 'X-Profile-Id' not in profiled_client.get('/datasets', headers=ADMIN).headers
+        wrong = {'X-Profile': 'true', 'X-Admin-Token': 'wrong'}
+        assert 'X-Profile-Id' not in profiled_client.get('/datasets', headers=wrong).headers
+        assert profiled_client.get('/admin/profiles', headers=wrong).status_code == 403
+        assert client.get('/admin/profiles').status_code == 404
@@ -3,35 +3,11 @@ import json
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app import create_app
-from utils.database import get_db
-
-@pytest.fixture
-def app():
-    """Create and configure a test app"""
-    app = create_app()
-    app.config['TESTING'] = True
-    return app
-
-@pytest.fixture
-def client(app):
-    """Create a test client"""
-    return app.test_client()
-
-@pytest.fixture(autouse=True)
-def clean_database(app):
-    """Clean up database before each test"""
-    with app.app_context():
-        db = get_db()
-        if db is not None:
-            db.datasets.drop()
-            db.quality_logs.drop()
-    yield
-    with app.app_context():
-        db = get_db()
-        if db is not None:
-            db.datasets.drop()
-            db.quality_logs.drop()
+from datetime import datetime, timedelta
+from bson import ObjectId
+from services.storage import get_quality_log_repository
+from services.quality_log_service import QualityLogService
+from utils.events import QualityEventBroker
 
 @pytest.fixture
 def sample_dataset(client):
@@ -99,6 +75,52 @@ class TestQualityLogs:
         data = json.loads(response.data)
         assert data['error'] == 'Dataset not found'
 
+    def test_create_quality_logs_bulk(self, client, sample_dataset):
+        """Test creating several quality logs in one request"""
+        logs = [{"status": "PASS"}, {"status": "FAIL", "details": "Nulls in id"}, {"status": "PASS"}]
+        
+        response = client.post(f'/datasets/{sample_dataset}/quality-logs/bulk',
+                              data=json.dumps(logs),
+                              content_type='application/json')
+        
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert [log['status'] for log in data['data']] == ['PASS', 'FAIL', 'PASS']
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-summary')
+        summary = json.loads(response.data)['data']
+        assert summary['pass_count'] == 2
+        assert summary['fail_count'] == 1
+
+    def test_create_quality_logs_bulk_rejects_invalid_item(self, client, sample_dataset):
+        """Test that one invalid item rejects the whole batch"""
+        logs = [{"status": "PASS"}, {"status": "UNKNOWN"}]
+        
+        response = client.post(f'/datasets/{sample_dataset}/quality-logs/bulk',
+                              data=json.dumps(logs),
+                              content_type='application/json')
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert data['error'].startswith('Validation error: 1.status')
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-logs')
+        assert json.loads(response.data)['data']['total'] == 0
+
+    def test_create_quality_logs_bulk_keeps_batch_order(self, client, sample_dataset):
+        """Test that logs sharing a batch timestamp are read back in batch order"""
+        logs = [{"status": "PASS", "details": "First"}, {"status": "FAIL", "details": "Last"}]
+        
+        client.post(f'/datasets/{sample_dataset}/quality-logs/bulk',
+                   data=json.dumps(logs),
+                   content_type='application/json')
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-status')
+        assert json.loads(response.data)['data']['details'] == 'Last'
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-logs')
+        assert [log['details'] for log in json.loads(response.data)['data']['logs']] == ['Last', 'First']
+
     def test_get_quality_logs(self, client, sample_dataset):
         """Test getting quality logs for a dataset"""
      
@@ -184,3 +206,313 @@ class TestQualityLogs:
         assert len(data['data']['logs']) == 3
         assert data['data']['page'] == 1
         assert data['data']['total_pages'] == 2
+
+    def test_get_quality_runs_and_transitions(self, client, sample_dataset):
+        """Test that repeated statuses extend one run and each flip opens a new one"""
+        for status in ["PASS", "PASS", "PASS", "FAIL", "FAIL"]:
+            client.post(f'/datasets/{sample_dataset}/quality-logs',
+                       data=json.dumps({"status": status, "details": status.lower()}),
+                       content_type='application/json')
+        client.post(f'/datasets/{sample_dataset}/quality-logs/bulk',
+                   data=json.dumps([{"status": "FAIL"}, {"status": "PASS", "details": "fixed"}]),
+                   content_type='application/json')
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-runs')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)['data']
+        assert data['total'] == 3
+        assert [(run['status'], run['count']) for run in data['runs']] == [("PASS", 1), ("FAIL", 3), ("PASS", 3)]
+        assert [run['open'] for run in data['runs']] == [True, False, False]
+        assert data['runs'][0]['last_details'] == "fixed"
+        assert data['runs'][1]['first_ts'] <= data['runs'][1]['last_ts']
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-transitions?limit=1')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)['data']
+        assert data['status'] == "PASS"
+        assert data['count'] == 1
+        assert [(t['from_status'], t['to_status']) for t in data['transitions']] == [("FAIL", "PASS")]
+        assert data['transitions'][0]['at'] == data['since']
+        assert data['transitions'][0]['previous_count'] == 3
+
+    def test_rebuild_quality_runs_matches_live_runs(self, app, client, sample_dataset):
+        """Test that the backfill rebuilds the same runs from raw logs"""
+        for status in ["FAIL", "PASS", "PASS", "FAIL"]:
+            client.post(f'/datasets/{sample_dataset}/quality-logs',
+                       data=json.dumps({"status": status}),
+                       content_type='application/json')
+        live = json.loads(client.get(f'/datasets/{sample_dataset}/quality-runs').data)['data']['runs']
+        
+        result = app.test_cli_runner().invoke(args=['rebuild-quality-runs', '--dataset-id', sample_dataset])
+        assert result.exit_code == 0
+        
+        rebuilt = json.loads(client.get(f'/datasets/{sample_dataset}/quality-runs').data)['data']['runs']
+        fields = ('status', 'first_ts', 'last_ts', 'count', 'open')
+        assert [[run[f] for f in fields] for run in rebuilt] == [[run[f] for f in fields] for run in live]
+        assert [run['status'] for run in rebuilt] == ["FAIL", "PASS", "FAIL"]
+
+    def test_get_quality_trend(self, client, sample_dataset):
+        """Test getting the bucketed quality trend for a dataset"""
+        for status in ["PASS", "PASS", "FAIL", "PASS"]:
+            client.post(f'/datasets/{sample_dataset}/quality-logs',
+                       data=json.dumps({"status": status}),
+                       content_type='application/json')
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-trend?granularity=day')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        trend = data['data']
+        
+        assert trend['granularity'] == 'day'
+        assert trend['source'] == 'buckets'
+        assert len(trend['buckets']) == 1
+        assert trend['buckets'][0]['pass_count'] == 3
+        assert trend['buckets'][0]['fail_count'] == 1
+        assert trend['buckets'][0]['pass_rate'] == 75.0
+
+    def test_get_quality_trend_counts_exact_range(self, client, sample_dataset):
+        """Test that hourly buckets do not count logs before start"""
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+        
+        start = (datetime.utcnow() + timedelta(seconds=1)).isoformat()
+        end = (datetime.utcnow() + timedelta(days=1)).isoformat()
+        response = client.get(f'/datasets/{sample_dataset}/quality-trend?granularity=hour&start={start}&end={end}')
+        
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']['buckets'] == []
+
+    def test_get_quality_trend_falls_back_to_logs_until_backfilled(self, app, client, sample_dataset):
+        """Test that logs without hourly buckets are counted until the backfill runs"""
+        with app.app_context():
+            get_quality_log_repository().insert({
+                "dataset_id": ObjectId(sample_dataset),
+                "status": "FAIL",
+                "details": None,
+                "timestamp": datetime.utcnow() - timedelta(hours=2)
+            })
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-trend?granularity=day')
+        trend = json.loads(response.data)['data']
+        assert trend['source'] == 'logs'
+        assert sum(b['fail_count'] for b in trend['buckets']) == 1
+        
+        result = app.test_cli_runner().invoke(args=['rebuild-quality-buckets'])
+        assert result.exit_code == 0
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-trend?granularity=day')
+        trend = json.loads(response.data)['data']
+        assert trend['source'] == 'buckets'
+        assert sum(b['fail_count'] for b in trend['buckets']) == 1
+
+    def test_get_quality_trend_counts_logs_before_the_first_bucket(self, app, client, sample_dataset):
+        """Test that logs from before the bucket rollout still count once the dataset has buckets"""
+        with app.app_context():
+            get_quality_log_repository().insert({
+                "dataset_id": ObjectId(sample_dataset),
+                "status": "FAIL",
+                "details": None,
+                "timestamp": datetime.utcnow() - timedelta(hours=3)
+            })
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+        
+        response = client.get(f'/datasets/{sample_dataset}/quality-trend?granularity=hour')
+        trend = json.loads(response.data)['data']
+        
+        assert trend['source'] == 'buckets'
+        assert sum(b['fail_count'] for b in trend['buckets']) == 1
+        assert sum(b['pass_count'] for b in trend['buckets']) == 1
+
+    def test_get_quality_trend_multiple_datasets(self, client, sample_dataset):
+        """Test getting a combined quality trend across datasets"""
+        other = client.post('/datasets',
+                           data=json.dumps({"name": "Other Dataset", "owner": "test_user"}),
+                           content_type='application/json')
+        other_id = json.loads(other.data)['data']['id']
+        
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+        client.post(f'/datasets/{other_id}/quality-logs',
+                   data=json.dumps({"status": "FAIL"}),
+                   content_type='application/json')
+        
+        response = client.get(f'/quality-trend?dataset_ids={sample_dataset},{other_id}&granularity=week')
+        
+        assert response.status_code == 200
+        buckets = json.loads(response.data)['data']['buckets']
+        assert sum(b['total'] for b in buckets) == 2
+        assert sum(b['fail_count'] for b in buckets) == 1
+
+    def test_get_quality_trend_invalid_granularity(self, client, sample_dataset):
+        """Test quality trend with an unsupported granularity"""
+        response = client.get(f'/datasets/{sample_dataset}/quality-trend?granularity=minute')
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'Invalid parameter' in data['error']
+
+    def test_get_quality_overview(self, client, sample_dataset):
+        """Test fleet-wide quality overview"""
+        healthy = client.post('/datasets',
+                             data=json.dumps({"name": "Healthy Dataset", "owner": "other_user"}),
+                             content_type='application/json')
+        healthy_id = json.loads(healthy.data)['data']['id']
+        
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "FAIL"}),
+                   content_type='application/json')
+        client.post(f'/datasets/{healthy_id}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+        
+        response = client.get('/quality-overview')
+        
+        assert response.status_code == 200
+        overview = json.loads(response.data)['data']
+        
+        assert overview['global']['total_logs'] == 3
+        assert overview['global']['datasets_reporting'] == 2
+        assert overview['failing_now']['total'] == 1
+        assert overview['failing_now']['datasets'][0]['id'] == sample_dataset
+        assert overview['worst_datasets'][0]['dataset_id'] == sample_dataset
+        assert overview['worst_datasets'][0]['pass_rate'] == 50.0
+        
+        response = client.get('/quality-overview?owner=other_user')
+        overview = json.loads(response.data)['data']
+        
+        assert overview['failing_now']['total'] == 0
+        assert overview['global']['total_logs'] == 1
+
+    def test_rebuild_latest_status_backfills_failing_now(self, app, client, sample_dataset):
+        """Test that logs written before the status rollup count as failing after the backfill"""
+        with app.app_context():
+            get_quality_log_repository().insert({
+                "dataset_id": ObjectId(sample_dataset),
+                "status": "FAIL",
+                "details": None,
+                "timestamp": datetime.utcnow()
+            })
+        
+        overview = json.loads(client.get('/quality-overview').data)['data']
+        assert overview['failing_now']['total'] == 0
+        
+        result = app.test_cli_runner().invoke(args=['rebuild-latest-status'])
+        assert result.exit_code == 0
+        
+        overview = json.loads(client.get('/quality-overview').data)['data']
+        assert overview['failing_now']['total'] == 1
+
+    def test_quality_events_stream_live(self, client, sample_dataset):
+        """Test that new quality logs are pushed to SSE subscribers"""
+        response = client.get(f'/datasets/{sample_dataset}/quality-events?status=FAIL', buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        
+        stream = iter(response.response)
+        assert next(stream).startswith(b'retry:')
+        
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "PASS"}),
+                   content_type='application/json')
+        client.post(f'/datasets/{sample_dataset}/quality-logs',
+                   data=json.dumps({"status": "FAIL", "details": "Row count dropped"}),
+                   content_type='application/json')
+        
+        message = next(stream).decode()
+        response.close()
+        
+        assert 'event: quality_log' in message
+        payload = json.loads(message.split('data: ', 1)[1])
+        assert payload['status'] == 'FAIL'
+        assert payload['details'] == 'Row count dropped'
+        assert payload['dataset_id'] == sample_dataset
+
+    def test_quality_events_resume_from_last_event_id(self, client, sample_dataset):
+        """Test that reconnecting with Last-Event-ID replays missed logs"""
+        ids = []
+        for status in ["PASS", "FAIL", "PASS"]:
+            created = client.post(f'/datasets/{sample_dataset}/quality-logs',
+                                 data=json.dumps({"status": status}),
+                                 content_type='application/json')
+            ids.append(json.loads(created.data)['data']['id'])
+        
+        response = client.get('/quality-events?owner=test_user',
+                             headers={'Last-Event-ID': ids[0]},
+                             buffered=False)
+        stream = iter(response.response)
+        next(stream)
+        replayed = [next(stream).decode(), next(stream).decode()]
+        response.close()
+        
+        assert replayed[0].startswith(f'id: {ids[1]}')
+        assert replayed[1].startswith(f'id: {ids[2]}')
+
+    def test_quality_events_resume_includes_lower_ids_from_other_workers(self, app, client, sample_dataset):
+        """Test that replay resumes by timestamp, not by ObjectId order"""
+        other_worker_id = ObjectId()
+        created = client.post(f'/datasets/{sample_dataset}/quality-logs',
+                             data=json.dumps({"status": "PASS"}),
+                             content_type='application/json')
+        last_event_id = json.loads(created.data)['data']['id']
+        with app.app_context():
+            get_quality_log_repository().insert({
+                "_id": other_worker_id,
+                "dataset_id": ObjectId(sample_dataset),
+                "status": "FAIL",
+                "details": None,
+                "timestamp": datetime.utcnow()
+            })
+        
+        response = client.get('/quality-events',
+                             headers={'Last-Event-ID': last_event_id},
+                             buffered=False)
+        stream = iter(response.response)
+        next(stream)
+        message = next(stream).decode()
+        response.close()
+        
+        assert message.startswith(f'id: {other_worker_id}')
+
+    def test_quality_events_replay_limit_counts_filtered_events(self, app, client, sample_dataset):
+        """Test that the replay limit applies after the owner filter"""
+        other = client.post('/datasets',
+                           data=json.dumps({"name": "Other Dataset", "owner": "other_user"}),
+                           content_type='application/json')
+        other_id = json.loads(other.data)['data']['id']
+        
+        ids = []
+        for dataset_id in [sample_dataset, other_id, other_id, other_id, sample_dataset]:
+            created = client.post(f'/datasets/{dataset_id}/quality-logs',
+                                 data=json.dumps({"status": "PASS"}),
+                                 content_type='application/json')
+            ids.append(json.loads(created.data)['data']['id'])
+        
+        with app.app_context():
+            events = QualityLogService().get_quality_events_since(ids[0], owner='test_user', limit=1)
+        
+        assert [event['id'] for event in events] == [ids[4]]
+
+    def test_quality_event_broker_drops_slow_consumers(self):
+        """Test that a subscriber whose queue fills up is disconnected"""
+        broker = QualityEventBroker(max_queue=2)
+        slow = broker.subscribe({})
+        filtered = broker.subscribe({"status": "FAIL"})
+        
+        for i in range(3):
+            broker.publish({"id": str(i), "dataset_id": "d", "status": "PASS", "tags": []})
+        broker.publish({"id": "2", "dataset_id": "d", "status": "PASS", "tags": []})
+        
+        assert slow.overflowed
+        assert not filtered.overflowed
+        assert filtered.queue.empty()
+        assert broker.subscriber_count() == 1
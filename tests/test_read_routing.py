@@ -0,0 +1,82 @@
+import pytest
+import json
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pymongo import MongoClient
+from pymongo.read_preferences import SecondaryPreferred
+from config import Config
+from utils import database
+from utils.database import get_db, operation_options, operation_scope, routed
+
+def members(db):
+    """Direct clients for the primary and the secondaries of db's replica set, or None if it is not one"""
+    hello = db.client.admin.command('hello')
+    if hello.get('setName') is None or not hello.get('hosts'):
+        return None
+    secondaries = [host for host in hello['hosts'] if host != hello['primary']]
+    connect = lambda host: MongoClient(host, directConnection=True)
+    return connect(hello['primary']), [connect(host) for host in secondaries]
+
+def reads(client):
+    """Queries and commands a member has served"""
+    counters = client.admin.command('serverStatus')['opcounters']
+    return counters['query'] + counters['command']
+
+class TestReadRouting:
+    def test_operation_options(self):
+        """Test that only non-default settings become collection options"""
+        assert operation_options() == {}
+
+        options = operation_options("secondaryPreferred", "local", "majority")
+        assert isinstance(options["read_preference"], SecondaryPreferred)
+        assert options["read_concern"].level == "local"
+        assert options["write_concern"].document == {"w": "majority"}
+        assert operation_options(write_concern="2")["write_concern"].document == {"w": 2}
+
+        with pytest.raises(ValueError):
+            operation_options("secondaryPrefered")
+
+    def test_routed_collection_follows_operation_class(self, monkeypatch):
+        """Test that collections pick up the options of the surrounding operation class"""
+        monkeypatch.setitem(database.OPERATION_OPTIONS, "list", operation_options("secondaryPreferred"))
+        collection = MongoClient(connect=False).catalog.datasets
+
+        assert routed(collection) is collection
+        with operation_scope("lookup"):
+            assert routed(collection) is collection
+        with operation_scope("list"):
+            assert routed(collection).read_preference.mongos_mode == "secondaryPreferred"
+        assert routed(collection) is collection
+
+    def test_list_reads_move_to_secondaries(self, client, monkeypatch):
+        """Against a replica set, test that secondaryPreferred listings leave the primary alone"""
+        if Config.STORAGE_BACKEND != 'mongo':
+            pytest.skip("Requires MongoDB")
+        replica_set = members(get_db())
+        if replica_set is None:
+            pytest.skip("Requires a replica set with secondaries")
+        primary, secondaries = replica_set
+
+        for index in range(20):
+            client.post('/datasets',
+                       data=json.dumps({"name": f"d{index}", "owner": "owner"}),
+                       content_type='application/json')
+
+        def served(requests):
+            before = [reads(primary)] + [reads(secondary) for secondary in secondaries]
+            for _ in range(requests):
+                assert client.get('/datasets?owner=owner').status_code == 200
+            after = [reads(primary)] + [reads(secondary) for secondary in secondaries]
+            deltas = [b - a for a, b in zip(before, after)]
+            return deltas[0], sum(deltas[1:])
+
+        # Each listing is a count and a find; the rest is monitoring traffic.
+        on_primary, _ = served(50)
+        assert on_primary >= 100
+
+        monkeypatch.setitem(database.OPERATION_OPTIONS, "list", operation_options("secondaryPreferred"))
+        on_primary, on_secondaries = served(50)
+        print(f"\n50 listings: {on_primary} reads on the primary, {on_secondaries} on the secondaries")
+        assert on_secondaries >= 100
+        assert on_primary < 50
@@ -0,0 +1,87 @@
+import pytest
+import json
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
+from bson import ObjectId
+from app import create_app
+from config import Config
+from utils.slow_queries import SlowQueryRecorder, command_shape, slow_query_recorder, summarize_explain
+
+@pytest.fixture
+def admin_client(app, monkeypatch):
+    """Test client for an app with an admin token"""
+    monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'secret')
+    admin = create_app()
+    admin.config['TESTING'] = True
+    slow_query_recorder.reset()
+    yield admin.test_client()
+    slow_query_recorder.reset()
+
+def find(owner, skip):
+    return {"find": "datasets", "filter": {"is_deleted": False, "owner": owner}, "sort": {"created_at": -1},
+            "skip": skip, "limit": 20, "lsid": {"id": ObjectId()}, "$db": "catalog"}
+
+class TestSlowQueries:
+    def test_shapes_ignore_literal_values(self):
+        """Test that commands differing only in values share a shape, and field paths survive"""
+        assert command_shape("find", find("alice", 20)) == command_shape("find", find("bob", 40)) == {
+            "filter": {"is_deleted": "?", "owner": "?"}, "sort": {"created_at": -1}
+        }
+        pipeline = [
+            {"$match": {"dataset_id": {"$in": [ObjectId(), ObjectId()]}, "bucket": {"$gte": datetime(2024, 1, 1)}}},
+            {"$group": {"_id": "$dataset_id", "pass_count": {"$sum": "$pass_count"}}},
+            {"$limit": 10}
+        ]
+        assert command_shape("aggregate", {"aggregate": "quality_log_buckets", "pipeline": pipeline}) == {
+            "pipeline": [
+                {"$match": {"dataset_id": {"$in": "?"}, "bucket": {"$gte": "?"}}},
+                {"$group": {"_id": "$dataset_id", "pass_count": {"$sum": "$pass_count"}}},
+                {"$limit": "?"}
+            ]
+        }
+
+    def test_recorder_aggregates_by_shape(self):
+        """Test counts and timings per shape, and that the explain command drops session fields"""
+        recorder = SlowQueryRecorder(threshold_ms=100, explain_interval=300, max_shapes=10)
+        explained = []
+        recorder._queue_explain = lambda key, database, command: explained.append(command)
+
+        recorder.record("find", find("alice", 0), "catalog", 150)
+        recorder.record("find", find("bob", 20), "catalog", 450)
+        recorder.record("count", {"count": "datasets", "query": {"owner": "alice"}}, "catalog", 120)
+
+        top = recorder.report()
+        assert [(entry["command"], entry["count"]) for entry in top] == [("find", 2), ("count", 1)]
+        assert top[0]["max_ms"] == 450 and top[0]["avg_ms"] == 300
+        assert len(explained) == 2
+        assert "lsid" not in explained[0] and "$db" not in explained[0]
+
+    def test_summarize_explain(self):
+        """Test reading the winning plan and execution stats out of an explain result"""
+        result = {
+            "queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {
+                "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "active_owner_created_at"}
+            }}},
+            "executionStats": {"nReturned": 20, "totalKeysExamined": 40, "totalDocsExamined": 40,
+                               "executionTimeMillis": 3}
+        }
+        assert summarize_explain(result) == {
+            "winning_plan": "LIMIT > FETCH > IXSCAN active_owner_created_at",
+            "n_returned": 20, "keys_examined": 40, "docs_examined": 40, "execution_time_ms": 3
+        }
+
+    def test_admin_endpoint(self, admin_client, monkeypatch):
+        """Test that the slow query log needs the admin token and can be cleared"""
+        monkeypatch.setattr(slow_query_recorder, '_queue_explain', lambda *args: None)
+        slow_query_recorder.record("find", find("alice", 0), "catalog", 250)
+
+        assert admin_client.get('/admin/slow-queries').status_code == 403
+        response = admin_client.get('/admin/slow-queries?sort=max_ms', headers={'X-Admin-Token': 'secret'})
+        queries = json.loads(response.data)['data']['queries']
+        assert [(query['collection'], query['count']) for query in queries] == [("datasets", 1)]
+
+        admin_client.delete('/admin/slow-queries', headers={'X-Admin-Token': 'secret'})
+        response = admin_client.get('/admin/slow-queries', headers={'X-Admin-Token': 'secret'})
+        assert json.loads(response.data)['data']['queries'] == []
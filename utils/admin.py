@@ -0,0 +1,27 @@
+"""
+Access control for the /admin endpoints.
+
+They answer only requests whose X-Admin-Token header matches ADMIN_TOKEN,
+and are refused with 403 when ADMIN_TOKEN is not set.
+"""
+import hmac
+from functools import wraps
+from flask import current_app, request
+from utils.helpers import create_error_response
+
+def has_admin_token() -> bool:
+    """Whether the current request carries the admin token"""
+    token = current_app.config['ADMIN_TOKEN']
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+def admin_required(view):
+    """Refuse requests to a view without the admin token"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not has_admin_token():
+            return create_error_response("Forbidden", 403)
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,233 @@
+"""
+Admission control for the API blueprints.
+
+Each client, identified by a recognised X-API-Key header or else its address, has a
+token bucket holding up to ADMISSION_BURST tokens and refilled at
+ADMISSION_RATE_PER_SECOND. A request spends the cost of its route (see
+ROUTE_COSTS: listings, aggregations and exports cost more than a single-id
+read) and is refused with 429 and Retry-After when the bucket is short.
+
+Admitted requests then take one of ADMISSION_MAX_CONCURRENT slots in this
+worker. When all are busy, up to ADMISSION_MAX_QUEUED requests wait up to
+ADMISSION_QUEUE_TIMEOUT_MS for one; beyond that they are refused with 503
+at once, so an overloaded worker answers quickly instead of piling up
+requests on the MongoDB pool. Event streams are long-lived and take no slot.
+
+Only the keys listed in ADMISSION_API_KEYS get a bucket of their own. Keys
+are not authenticated anywhere else, so a request with any other key, or
+none, spends from its address's bucket: a client cannot earn a fresh burst
+by sending a new key with each request, nor push known clients out of the
+max_clients most recently seen.
+
+Buckets are kept in-process by default. With ADMISSION_BACKEND=redis they
+are fixed windows of ADMISSION_BURST tokens per burst/rate seconds on a
+Redis-protocol server, shared by every worker; while it is unreachable each
+worker falls back to its own buckets.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, request
+from utils.helpers import create_error_response
+from utils.metrics import registry, Counter, Gauge
+from utils.resp import RespClient, RespError
+from typing import Set
+
+ADMITTED_BLUEPRINTS = ("datasets", "quality_logs", "jobs")
+
+ROUTE_COSTS = {
+    "datasets.get_datasets": 2,
+    "datasets.get_dataset_facet": 2,
+    "datasets.get_dataset_changes": 5,
+    "datasets.get_dataset_stats": 5,
+    "quality_logs.create_quality_logs_bulk": 10,
+    "quality_logs.get_quality_logs": 2,
+    "quality_logs.get_quality_runs": 2,
+    "quality_logs.get_quality_trend": 5,
+    "quality_logs.get_multi_dataset_quality_trend": 10,
+    "quality_logs.get_quality_overview": 10,
+    "jobs.submit_job": 10
+}
+
+STREAMING_ENDPOINTS = ("quality_logs.get_quality_events", "quality_logs.get_dataset_quality_events")
+
+admission_rejections_total = registry.register(Counter(
+    "admission_rejections_total",
+    "Requests refused by admission control, by reason: rate_limited (429) or overloaded (503)",
+    ("reason",)
+))
+admission_queued = registry.register(Gauge(
+    "admission_queued", "Requests in this worker waiting for a concurrency slot"
+))
+
+class TokenBuckets:
+    """Per-client token buckets in this process, keeping the max_clients most recently seen"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str, cost: float) -> float:
+        """Spend cost tokens; returns 0 if admitted, else the seconds until enough tokens are available"""
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+class SharedTokenBuckets:
+    """Fixed-window buckets on a Redis-protocol server, falling back to local buckets while it is unreachable"""
+
+    def __init__(self, client: RespClient, prefix: str, fallback: TokenBuckets):
+        self.client = client
+        self.prefix = prefix
+        self.fallback = fallback
+        self.window_ms = max(int(fallback.burst / fallback.rate * 1000), 1)
+        self._warned = False
+
+    def take(self, client: str, cost: float) -> float:
+        key = f"{self.prefix}admission:{client}"
+        cost = math.ceil(min(cost, self.fallback.burst))
+        try:
+            # MULTI/EXEC runs the three commands together, so the window
+            # cannot expire between creating the key and spending from it.
+            *_, replies = self.client.execute(
+                ("MULTI",),
+                ("SET", key, 0, "PX", self.window_ms, "NX"),
+                ("INCRBY", key, cost),
+                ("PTTL", key),
+                ("EXEC",)
+            )
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise reply
+            _, spent, remaining_ms = replies
+            if remaining_ms < 0:
+                # A key without an expiry would never refill; start a new window
+                self.client.execute(("SET", key, cost, "PX", self.window_ms))
+                spent, remaining_ms = cost, self.window_ms
+        except Exception as e:
+            if not self._warned:
+                self._warned = True
+                logging.warning(f"Shared admission buckets unavailable, using this worker's: {e}")
+            return self.fallback.take(client, cost)
+
+        self._warned = False
+        if spent <= self.fallback.burst:
+            return 0.0
+        return max(remaining_ms, 1) / 1000
+
+class ConcurrencyLimiter:
+    """At most limit holders at once, with at most max_queued callers waiting for a slot"""
+
+    def __init__(self, limit: int, max_queued: int):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting up to timeout; False when the queue is full or the wait times out"""
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queued:
+                return False
+
+            self.waiting += 1
+            admission_queued.inc()
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+                admission_queued.dec()
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+class AdmissionController:
+    """Client buckets and the concurrency limiter of one app"""
+
+    def __init__(self, config):
+        self.buckets = TokenBuckets(config['ADMISSION_RATE_PER_SECOND'], config['ADMISSION_BURST'],
+                                    config['ADMISSION_MAX_CLIENTS'])
+        if config['ADMISSION_BACKEND'] == 'redis':
+            client = RespClient(config['ADMISSION_REDIS_URL'], config['CACHE_REDIS_TIMEOUT_MS'] / 1000,
+                                config['CACHE_REDIS_RETRY_SECONDS'])
+            self.buckets = SharedTokenBuckets(client, config['CACHE_KEY_PREFIX'], self.buckets)
+        elif config['ADMISSION_BACKEND'] != 'local':
+            raise ValueError(f"Unknown ADMISSION_BACKEND: {config['ADMISSION_BACKEND']}")
+        self.limiter = ConcurrencyLimiter(config['ADMISSION_MAX_CONCURRENT'], config['ADMISSION_MAX_QUEUED'])
+        self.queue_timeout = config['ADMISSION_QUEUE_TIMEOUT_MS'] / 1000
+        self.api_keys = {key_digest(api_key) for api_key in config['ADMISSION_API_KEYS']}
+
+def key_digest(api_key: str) -> str:
+    return hashlib.blake2b(api_key.encode(), digest_size=12).hexdigest()
+
+def client_key(api_keys: Set[str]) -> str:
+    """The API key's digest when it is one of api_keys, else the client address"""
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        digest = key_digest(api_key)
+        if digest in api_keys:
+            return f"key:{digest}"
+    return f"ip:{request.remote_addr}"
+
+def rejection(message: str, status_code: int, retry_after: float, reason: str):
+    admission_rejections_total.inc((reason,))
+    response, status_code = create_error_response(message, status_code)
+    response.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    return response, status_code
+
+def init_admission(app):
+    """Rate-limit clients and bound concurrent requests on the API blueprints"""
+    app.extensions['admission'] = AdmissionController(app.config)
+
+    @app.before_request
+    def admit_request():
+        if request.blueprint not in ADMITTED_BLUEPRINTS:
+            return None
+
+        controller = current_app.extensions['admission']
+        wait = controller.buckets.take(client_key(controller.api_keys), ROUTE_COSTS.get(request.endpoint, 1))
+        if wait > 0:
+            return rejection("Too many requests, retry later", 429, wait, "rate_limited")
+
+        if request.endpoint in STREAMING_ENDPOINTS:
+            return None
+        if not controller.limiter.acquire(controller.queue_timeout):
+            return rejection("Server busy, retry later", 503, 1, "overloaded")
+        g._admission_slot = controller.limiter
+        return None
+
+    @app.teardown_request
+    def release_slot(error=None):
+        limiter = g.pop('_admission_slot', None)
+        if limiter is not None:
+            limiter.release()
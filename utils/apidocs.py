@@ -0,0 +1,45 @@
+"""
+Swagger UI on /apidocs.
+
+flasgger is imported when the app is created, but the spec is only built
+from the route docstrings on the first request for it. Deployments can
+precompile it with `flask export-apispec` and point API_SPEC_FILE at the
+result, so workers serve the file instead of parsing docstrings.
+"""
+import json
+
+API_SPEC_ENDPOINT = "apispec_1"
+
+API_SPEC_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "Dataset Catalog API",
+        "description": "A lightweight API for managing datasets and quality logs",
+        "version": "1.0.0"
+    },
+    "host": "localhost:5000",
+    "basePath": "/",
+    "schemes": ["http"]
+}
+
+def init_apidocs(app):
+    """Register the Swagger UI and spec routes, serving API_SPEC_FILE when it is set"""
+    from flasgger import Swagger
+
+    class PrecompiledSwagger(Swagger):
+        def get_apispecs(self, endpoint=API_SPEC_ENDPOINT):
+            if endpoint not in self.apispecs:
+                with open(app.config['API_SPEC_FILE']) as f:
+                    self.apispecs[endpoint] = json.load(f)
+            return self.apispecs[endpoint]
+
+    swagger_class = PrecompiledSwagger if app.config.get('API_SPEC_FILE') else Swagger
+    app.extensions['apidocs'] = swagger_class(app, template=API_SPEC_TEMPLATE)
+    return app.extensions['apidocs']
+
+def build_apispec(app):
+    """Build the spec from the route docstrings, ignoring API_SPEC_FILE"""
+    from flasgger import Swagger
+
+    with app.test_request_context():
+        return Swagger.get_apispecs(app.extensions['apidocs'], API_SPEC_ENDPOINT)
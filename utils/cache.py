@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from typing import Any, Dict
+from config import Config
+from utils.cache_backends import CacheBackend, cache_backend
+from utils.metrics import registry, Counter
+from utils.resilience import StorageUnavailable, run_guarded, serve_stale
+
+_MISSING = object()
+
+cache_requests_total = registry.register(Counter(
+    "cache_requests_total",
+    "Read-through cache lookups by cache and outcome: hit, revalidate (stale served while refreshing), "
+    "miss (ran the load) or coalesced (waited for a load already in flight)",
+    ("cache", "outcome")
+))
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Let concurrent calls with the same key share one in-flight computation"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn, or wait for the call already running for key; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        
+        if leader:
+            self._run(key, call, fn)
+        else:
+            call.done.wait()
+        
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+    def start(self, key, fn) -> bool:
+        """Run fn on a background thread unless a call for key is already in flight"""
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+        
+        threading.Thread(target=self._run, args=(key, call, fn), name="cache-revalidate", daemon=True).start()
+        return True
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class TTLCache:
+    """Thread-safe cache whose entries expire after a fixed TTL
+
+    Entries live in a CacheBackend: an LRU in this process, or a server shared
+    by every process. For swr_ttl seconds after expiry, get_or_load serves the
+    old value and refreshes it in the background. Expired entries are kept for
+    stale_ttl seconds so get_stale can serve them while the database is
+    unavailable.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float, stale_ttl: float = 0, swr_ttl: float = 0):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.swr_ttl = swr_ttl
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._flights = SingleFlight()
+
+    def get(self, key, default=None):
+        """Get a cached value, or default if missing or expired"""
+        value, expired_for = self._lookup(key)
+        return default if value is _MISSING or expired_for > 0 else value
+
+    def get_many(self, keys) -> Dict[str, Any]:
+        """Unexpired cached values for those of keys that have one, fetched in one backend call"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        _, found = self._lookup_many(keys)
+        return {key: value for key, (value, expired_for) in zip(keys, found)
+                if value is not _MISSING and expired_for == 0}
+
+    def get_stale(self, key, default=None):
+        """Get a cached value even if expired, or default if missing or past its stale TTL"""
+        value, _ = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def get_or_load(self, key, operation: str, load):
+        """
+        Get a cached value, loading it through the circuit breaker on a miss.
+        
+        Concurrent misses for the same key share one load. A value that expired
+        less than swr_ttl ago is returned while one background load refreshes
+        it. When the database is unavailable the stale value is served instead.
+        """
+        backend_generation, [(value, expired_for)] = self._lookup_many([key])
+        if value is not _MISSING and expired_for == 0:
+            cache_requests_total.inc((self.name, "hit"))
+            return value
+        
+        # Loads started before an invalidation are neither joined nor cached.
+        with self._lock:
+            generation = (self._generation, backend_generation)
+
+        def refresh():
+            loaded = run_guarded(operation, load)
+            self.set(key, loaded, generation)
+            return loaded
+        
+        if value is not _MISSING and expired_for < self.swr_ttl:
+            cache_requests_total.inc((self.name, "revalidate"))
+            self._flights.start((key, generation), lambda: self._revalidate(refresh))
+            return value
+        
+        try:
+            loaded, shared = self._flights.do((key, generation), refresh)
+        except StorageUnavailable as e:
+            return serve_stale(operation, lambda: self.get_stale(key), e)
+        
+        cache_requests_total.inc((self.name, "coalesced" if shared else "miss"))
+        return loaded
+
+    def _revalidate(self, refresh):
+        try:
+            refresh()
+        except Exception as e:
+            logging.warning(f"Background refresh of {self.name} cache failed: {e}")
+
+    def _lookup(self, key):
+        """(value, seconds since expiry) for an entry within its stale TTL, or (_MISSING, 0)"""
+        return self._lookup_many([key])[1][0]
+
+    def _lookup_many(self, keys):
+        """The backend generation and a _lookup result for each key"""
+        backend_generation, entries = self.backend.lookup(keys)
+        now = time.time()
+        found = []
+        for entry in entries:
+            if entry is None or entry[0] != backend_generation:
+                found.append((_MISSING, 0))
+                continue
+            
+            _, expires_at, value = entry
+            if expires_at > now:
+                found.append((value, 0))
+            elif expires_at + max(self.stale_ttl, self.swr_ttl) <= now:
+                found.append((_MISSING, 0))
+            else:
+                found.append((value, now - expires_at))
+        return backend_generation, found
+
+    def set(self, key, value, generation=None):
+        """Cache a value
+        
+        With a generation from before the last delete or clear, the value is
+        dropped, since it may predate the write that invalidated the cache.
+        """
+        self.set_many({key: value}, generation)
+
+    def set_many(self, items: Dict[str, Any], generation=None):
+        """Cache several values in one backend call"""
+        if generation is None:
+            with self._lock:
+                local_generation = self._generation
+            backend_generation = self.backend.lookup([])[0]
+        else:
+            local_generation, backend_generation = generation
+        if backend_generation < 0:
+            return
+        
+        expires_at = time.time() + self.ttl
+        entries = {key: (backend_generation, expires_at, value) for key, value in items.items()}
+        with self._lock:
+            if local_generation != self._generation:
+                return
+            self.backend.store(entries, self.ttl + max(self.stale_ttl, self.swr_ttl))
+
+    def delete(self, key):
+        """Remove a cached value if present"""
+        with self._lock:
+            self._generation += 1
+            self.backend.remove(key)
+
+    def clear(self):
+        """Remove all cached values, in every process sharing the backend"""
+        with self._lock:
+            self._generation += 1
+            self.backend.bump()
+
+dataset_cache = TTLCache("dataset", cache_backend("dataset", Config.CACHE_MAX_ENTRIES),
+                         Config.CACHE_TTL_SECONDS, Config.CACHE_STALE_SECONDS)
+stats_cache = TTLCache("stats", cache_backend("stats", 16), Config.CACHE_TTL_SECONDS,
+                       Config.CACHE_STALE_SECONDS, Config.CACHE_SWR_SECONDS)
+quality_summary_cache = TTLCache("quality_summary", cache_backend("quality_summary", Config.CACHE_MAX_ENTRIES),
+                                 Config.CACHE_TTL_SECONDS, Config.CACHE_STALE_SECONDS, Config.CACHE_SWR_SECONDS)
+
+def invalidate_dataset(dataset_id: str, affects_stats: bool = True):
+    """Drop cached state derived from a dataset document"""
+    dataset_cache.delete(dataset_id)
+    if affects_stats:
+        stats_cache.clear()
+
+def invalidate_quality_logs(dataset_id: str):
+    """Drop cached state derived from a dataset's quality logs"""
+    quality_summary_cache.delete(dataset_id)
+
+def clear_caches():
+    """Drop every cached value"""
+    dataset_cache.clear()
+    stats_cache.clear()
+    quality_summary_cache.clear()
@@ -0,0 +1,198 @@
+"""
+Where TTLCache keeps its entries.
+
+The local backend is an LRU dict in this process. The redis backend stores
+entries on a Redis-protocol server shared by every worker and instance, so a
+value loaded once is served everywhere and an invalidation in one process is
+seen by all of them.
+
+Each cache has a generation number and every entry records the generation it
+was written under. Clearing a cache bumps the generation (an INCR on the
+shared server) instead of deleting keys; entries from older generations are
+then treated as misses and left to expire. A lookup fetches the generation
+and its entries in one MGET. Shared values are encoded as BSON, so ObjectIds
+and datetimes round-trip, and zlib-compressed above CACHE_COMPRESS_MIN_BYTES.
+
+The shared server is an optimization, not a dependency: when it cannot be
+reached, lookups are misses and writes are dropped, so requests go to the
+database as if the cache were cold.
+"""
+import logging
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import bson
+from config import Config
+from utils.metrics import registry, Counter
+from utils.resp import RespClient
+
+Entry = Tuple[int, float, Any]
+
+ENTRY_BSON = b"b"
+ENTRY_ZLIB = b"z"
+
+cache_backend_errors_total = registry.register(Counter(
+    "cache_backend_errors_total",
+    "Shared cache calls that failed and were treated as misses or dropped writes, by cache",
+    ("cache",)
+))
+
+class CacheBackend(ABC):
+    """Storage for cache entries: (generation, expires_at wall time, value) tuples"""
+
+    @abstractmethod
+    def lookup(self, keys: Sequence[str]) -> Tuple[int, List[Optional[Entry]]]:
+        """The current generation and the entry for each key, None where missing"""
+
+    @abstractmethod
+    def store(self, entries: Dict[str, Entry], retain_seconds: float):
+        """Write entries, keeping them for retain_seconds"""
+
+    @abstractmethod
+    def remove(self, key: str):
+        """Remove one entry"""
+
+    @abstractmethod
+    def bump(self) -> int:
+        """Start a new generation, invalidating every entry; returns it"""
+
+class LocalCacheBackend(CacheBackend):
+    """Thread-safe LRU dict in this process"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, keys):
+        now = time.time()
+        entries = []
+        with self._lock:
+            for key in keys:
+                stored = self._data.get(key)
+                if stored is None or stored[0] <= now:
+                    if stored is not None:
+                        del self._data[key]
+                    entries.append(None)
+                    continue
+                self._data.move_to_end(key)
+                entries.append(stored[1])
+            return self._generation, entries
+
+    def store(self, entries, retain_seconds):
+        retain_until = time.time() + retain_seconds
+        with self._lock:
+            for key, entry in entries.items():
+                self._data[key] = (retain_until, entry)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def remove(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def bump(self):
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            return self._generation
+
+def encode_entry(entry: Entry) -> bytes:
+    generation, expires_at, value = entry
+    data = bson.encode({"g": generation, "e": expires_at, "v": value})
+    if len(data) >= Config.CACHE_COMPRESS_MIN_BYTES:
+        return ENTRY_ZLIB + zlib.compress(data, 1)
+    return ENTRY_BSON + data
+
+def decode_entry(data: bytes) -> Entry:
+    body = zlib.decompress(data[1:]) if data[:1] == ENTRY_ZLIB else data[1:]
+    document = bson.decode(body)
+    return document["g"], document["e"], document["v"]
+
+class RedisCacheBackend(CacheBackend):
+    """Entries on a Redis-protocol server under {prefix}{cache name}:"""
+
+    def __init__(self, name: str, client: RespClient, prefix: str):
+        self.name = name
+        self.client = client
+        self.namespace = f"{prefix}{name}:"
+        self.generation_key = self.namespace + "generation"
+        self._warned = False
+
+    def _key(self, key: str) -> str:
+        return self.namespace + "k:" + key
+
+    def _failed(self, action: str, error: Exception):
+        cache_backend_errors_total.inc((self.name,))
+        if not self._warned:
+            self._warned = True
+            logging.warning(f"Shared {self.name} cache {action} failed, continuing without it: {error}")
+
+    def lookup(self, keys):
+        try:
+            (values,) = self.client.execute(("MGET", self.generation_key, *[self._key(key) for key in keys]))
+        except Exception as e:
+            self._failed("lookup", e)
+            return -1, [None] * len(keys)
+
+        self._warned = False
+        generation = int(values[0] or 0)
+        entries = []
+        for value in values[1:]:
+            try:
+                entries.append(decode_entry(value) if value is not None else None)
+            except Exception:
+                entries.append(None)
+        return generation, entries
+
+    def store(self, entries, retain_seconds):
+        if not entries:
+            return
+
+        retain_ms = max(int(retain_seconds * 1000), 1)
+        try:
+            self.client.execute(*[
+                ("SET", self._key(key), encode_entry(entry), "PX", retain_ms) for key, entry in entries.items()
+            ])
+        except Exception as e:
+            self._failed("write", e)
+
+    def remove(self, key):
+        try:
+            self.client.execute(("DEL", self._key(key)))
+        except Exception as e:
+            self._failed("delete", e)
+
+    def bump(self):
+        try:
+            (generation,) = self.client.execute(("INCR", self.generation_key))
+            return generation
+        except Exception as e:
+            self._failed("invalidation", e)
+            return -1
+
+_shared_client: Optional[RespClient] = None
+
+def shared_client() -> RespClient:
+    """The RESP client for CACHE_REDIS_URL, shared by every cache in the process"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = RespClient(
+            Config.CACHE_REDIS_URL,
+            Config.CACHE_REDIS_TIMEOUT_MS / 1000,
+            Config.CACHE_REDIS_RETRY_SECONDS
+        )
+    return _shared_client
+
+def cache_backend(name: str, maxsize: int) -> CacheBackend:
+    """The backend selected by CACHE_BACKEND for the named cache"""
+    if Config.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(name, shared_client(), Config.CACHE_KEY_PREFIX)
+    if Config.CACHE_BACKEND != "local":
+        raise ValueError(f"Unknown CACHE_BACKEND: {Config.CACHE_BACKEND}")
+    return LocalCacheBackend(maxsize)
@@ -0,0 +1,182 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pymongo.errors import OperationFailure, PyMongoError
+from config import Config
+from utils.cache import invalidate_dataset, invalidate_quality_logs, clear_caches
+
+WATCHED_COLLECTIONS = ["datasets", "quality_logs"]
+
+# Fields that quality log writes roll up onto dataset documents; changes limited
+# to these do not affect dataset stats.
+QUALITY_ROLLUP_FIELDS = {"last_quality_status", "last_quality_at"}
+
+# Server error codes meaning change streams cannot run on this deployment
+# (standalone mongod, or a storage engine without majority read concern).
+UNSUPPORTED_CODES = {40573, 148}
+
+# Server error codes meaning the persisted resume token can no longer be used.
+STALE_TOKEN_CODES = {260, 280, 286}
+
+TOKEN_SAVE_INTERVAL_SECONDS = 5.0
+RETRY_BACKOFF_SECONDS = 5.0
+
+_listener = None
+
+class ChangeStreamListener(threading.Thread):
+    """Watch datasets and quality_logs and invalidate this worker's caches on every change"""
+
+    def __init__(self, db, listener_id: str):
+        super().__init__(name="change-stream-listener", daemon=True)
+        self.db = db
+        self.listener_id = listener_id
+        self.tokens = db.change_stream_tokens
+        self.available = None
+        self._stop_event = threading.Event()
+        self._last_saved = 0.0
+        self._handlers = []
+
+    def add_handler(self, handler):
+        """Register a callable invoked with every change event after caches are invalidated"""
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    def stop(self):
+        """Ask the listener to exit after its current poll"""
+        self._stop_event.set()
+
+    def run(self):
+        resume_token = self._load_resume_token()
+        if resume_token is None:
+            clear_caches()
+
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}},
+            {"$project": {
+                "operationType": 1,
+                "ns": 1,
+                "documentKey": 1,
+                "updateDescription.updatedFields": 1,
+                "fullDocument": 1
+            }}
+        ]
+
+        while not self._stop_event.is_set():
+            try:
+                with self.db.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    self.available = True
+                    logging.info("Change stream listener started")
+
+                    while not self._stop_event.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self.handle_change(change)
+
+                        if stream.resume_token is not None:
+                            resume_token = stream.resume_token
+                            self._save_resume_token(resume_token)
+
+            except OperationFailure as e:
+                if e.code in UNSUPPORTED_CODES:
+                    logging.warning(f"Change streams unavailable, falling back to TTL-only cache expiry: {e}")
+                    self.available = False
+                    return
+
+                if e.code in STALE_TOKEN_CODES:
+                    logging.warning(f"Change stream resume token is no longer valid, restarting from now: {e}")
+                    resume_token = None
+                    self._clear_resume_token()
+                    clear_caches()
+                    continue
+
+                logging.error(f"Change stream failed: {e}")
+                clear_caches()
+                self._stop_event.wait(RETRY_BACKOFF_SECONDS)
+
+            except PyMongoError as e:
+                logging.error(f"Change stream failed: {e}")
+                clear_caches()
+                self._stop_event.wait(RETRY_BACKOFF_SECONDS)
+
+    def handle_change(self, change):
+        """Invalidate local caches for a single change event"""
+        operation = change["operationType"]
+
+        if operation in ("drop", "dropDatabase", "rename", "invalidate"):
+            clear_caches()
+        else:
+            collection = change["ns"]["coll"]
+            document_id = change.get("documentKey", {}).get("_id")
+
+            if collection == "datasets" and document_id is not None:
+                updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+                affects_stats = operation != "update" or not set(updated_fields) <= QUALITY_ROLLUP_FIELDS
+                invalidate_dataset(str(document_id), affects_stats=affects_stats)
+            elif collection == "quality_logs":
+                dataset_id = (change.get("fullDocument") or {}).get("dataset_id")
+                if dataset_id is not None:
+                    invalidate_quality_logs(str(dataset_id))
+                else:
+                    clear_caches()
+
+        for handler in self._handlers:
+            try:
+                handler(change)
+            except Exception as e:
+                logging.error(f"Change stream handler failed: {e}")
+
+    def _load_resume_token(self):
+        try:
+            doc = self.tokens.find_one({"_id": self.listener_id})
+        except PyMongoError as e:
+            logging.error(f"Failed to load change stream resume token: {e}")
+            return None
+        return doc["token"] if doc else None
+
+    def _save_resume_token(self, token):
+        now = time.monotonic()
+        if now - self._last_saved < TOKEN_SAVE_INTERVAL_SECONDS:
+            return
+
+        try:
+            self.tokens.update_one(
+                {"_id": self.listener_id},
+                {"$set": {"token": token, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            self._last_saved = now
+        except PyMongoError as e:
+            logging.error(f"Failed to save change stream resume token: {e}")
+
+    def _clear_resume_token(self):
+        try:
+            self.tokens.delete_one({"_id": self.listener_id})
+        except PyMongoError as e:
+            logging.error(f"Failed to clear change stream resume token: {e}")
+
+def default_listener_id():
+    """Resume token key for this worker process: CHANGE_STREAM_LISTENER_ID, or hostname:pid"""
+    return Config.CHANGE_STREAM_LISTENER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+def start_change_stream_listener(db):
+    """Start the process-wide change stream listener if it is not already running"""
+    global _listener
+    if _listener is None or not _listener.is_alive():
+        _listener = ChangeStreamListener(db, default_listener_id())
+        _listener.start()
+    return _listener
+
+def get_change_stream_listener():
+    """Get the running change stream listener, if any"""
+    return _listener
+
+def stop_change_stream_listener():
+    """Stop the process-wide change stream listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener.join(timeout=5)
+        _listener = None
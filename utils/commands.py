@@ -0,0 +1,110 @@
+import click
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI (flask --app app:create_app <command>)"""
+
+    @app.cli.command('rebuild-quality-buckets')
+    @click.option('--dataset-id', default=None, help='Only rebuild this dataset')
+    def rebuild_quality_buckets(dataset_id):
+        """Backfill hourly quality buckets from raw quality logs"""
+        from services.quality_log_service import QualityLogService
+        QualityLogService().rebuild_quality_buckets(dataset_id)
+        click.echo("Quality buckets rebuilt")
+
+    @app.cli.command('rebuild-quality-runs')
+    @click.option('--dataset-id', default=None, help='Only rebuild this dataset')
+    def rebuild_quality_runs(dataset_id):
+        """Backfill run-length encoded status history from raw quality logs"""
+        from services.quality_log_service import QualityLogService
+        QualityLogService().rebuild_quality_runs(dataset_id)
+        click.echo("Quality status runs rebuilt")
+
+    @app.cli.command('rebuild-latest-status')
+    def rebuild_latest_status():
+        """Backfill the latest quality status rolled up onto dataset documents"""
+        from services.quality_log_service import QualityLogService
+        QualityLogService().rebuild_latest_status()
+        click.echo("Latest quality status rebuilt")
+
+    @app.cli.command('rebuild-facets')
+    def rebuild_facets():
+        """Backfill the owner and tag counts behind the facet endpoints"""
+        from services.dataset_service import DatasetService
+        DatasetService().rebuild_facets()
+        click.echo("Facets rebuilt")
+
+    @app.cli.command('archive-deleted')
+    @click.option('--grace-days', type=float, default=None, help='Only archive datasets deleted this many days ago '
+                  '(default ARCHIVE_GRACE_DAYS)')
+    @click.option('--include-logs', is_flag=True, help='Also archive the quality logs of archived datasets')
+    @click.option('--batch-size', type=int, default=None, help='Datasets per batch (default ARCHIVE_BATCH_SIZE)')
+    def archive_deleted(grace_days, include_logs, batch_size):
+        """Move soft-deleted datasets past their grace period out of the datasets collection"""
+        from config import Config
+        from services.dataset_service import DatasetService
+        archived = DatasetService().archive_deleted_datasets(
+            Config.ARCHIVE_GRACE_DAYS if grace_days is None else grace_days,
+            include_logs,
+            batch_size or Config.ARCHIVE_BATCH_SIZE
+        )
+        click.echo(f"Archived {archived['datasets']} datasets and {archived['quality_logs']} quality logs")
+
+    @app.cli.command('import-catalog')
+    @click.argument('path')
+    @click.option('--kind', type=click.Choice(['datasets', 'quality-logs']), required=True,
+                  help='What the records are; quality logs name their dataset by dataset_id or dataset_name and owner')
+    @click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default=None,
+                  help='File format (default from the extension, ignoring .gz)')
+    @click.option('--workers', type=int, default=None, help='Validation processes, 0 to validate in this process '
+                  '(default IMPORT_WORKERS)')
+    @click.option('--batch-size', type=int, default=None, help='Records per batch (default IMPORT_BATCH_SIZE)')
+    @click.option('--checkpoint', default=None, help='Checkpoint file to resume from (default PATH.checkpoint)')
+    @click.option('--no-checkpoint', is_flag=True, help='Start from the first record and keep no checkpoint')
+    @click.option('--errors', 'errors_path', default=None, help='Append rejected records to this NDJSON file')
+    def import_catalog(path, kind, fmt, workers, batch_size, checkpoint, no_checkpoint, errors_path):
+        """Bulk import datasets or quality logs from an NDJSON or CSV file, optionally gzipped"""
+        import time
+        from config import Config
+        from services.import_service import ImportService
+        last_report = [time.monotonic()]
+
+        def report(counts, seconds):
+            if time.monotonic() - last_report[0] >= 5:
+                last_report[0] = time.monotonic()
+                click.echo(f"{counts['records']} records, {counts['records'] / seconds:.0f} records/s")
+
+        try:
+            result = ImportService().import_file(
+                path,
+                kind.replace('-', '_'),
+                fmt,
+                Config.IMPORT_WORKERS if workers is None else workers,
+                batch_size or Config.IMPORT_BATCH_SIZE,
+                None if no_checkpoint else checkpoint or f"{path}.checkpoint",
+                errors_path,
+                report
+            )
+        except (OSError, ValueError) as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Imported {result['inserted']} of {result['records']} records ({result['existing']} already "
+                   f"present, {result['invalid']} rejected) in {result['seconds']:.1f}s: "
+                   f"{result['records_per_second']:.0f} records/s")
+        for number, message in result['errors']:
+            click.echo(f"  record {number}: {message}")
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes():
+        """Create any missing MongoDB indexes"""
+        from utils.database import create_indexes
+        created = create_indexes()
+        click.echo(f"Created indexes: {', '.join(created)}" if created else "All indexes exist")
+
+    @app.cli.command('export-apispec')
+    @click.argument('path')
+    def export_apispec(path):
+        """Precompile the Swagger spec from the route docstrings into a JSON file for API_SPEC_FILE"""
+        import json
+        from utils.apidocs import build_apispec
+        with open(path, 'w') as f:
+            json.dump(build_apispec(app), f, indent=2, sort_keys=True)
+        click.echo(f"API spec written to {path}")
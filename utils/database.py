@@ -1,44 +1,186 @@
-from pymongo import MongoClient
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import MongoClient, IndexModel
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from pymongo.write_concern import WriteConcern
 from config import Config
+from utils.metrics import mongo_command_metrics
+from utils.slow_queries import slow_query_recorder
+from typing import Dict, Any
 import logging
+import threading
 
 client = None
 db = None
 
+# Dataset listings, lookups and rankings filter on is_deleted: false, so their
+# indexes only cover active documents. Soft-deleted ones are indexed by
+# deletion time for the archival job; the changes feed reads both.
+ACTIVE = {"is_deleted": False}
+
+INDEXES = {
+    "datasets": [
+        IndexModel([("created_at", -1)], name="active_created_at", partialFilterExpression=ACTIVE),
+        IndexModel([("owner", 1), ("created_at", -1)], name="active_owner_created_at",
+                   partialFilterExpression=ACTIVE),
+        IndexModel([("tags", 1), ("created_at", -1)], name="active_tags_created_at",
+                   partialFilterExpression=ACTIVE),
+        IndexModel([("name", 1), ("owner", 1)], name="active_name_owner", partialFilterExpression=ACTIVE),
+        IndexModel([("last_quality_status", 1), ("last_quality_at", -1)], name="active_last_quality",
+                   partialFilterExpression=ACTIVE),
+        IndexModel([("updated_at", 1)], name="deleted_updated_at", partialFilterExpression={"is_deleted": True}),
+        IndexModel([("updated_at", 1), ("_id", 1)])
+    ],
+    "dataset_facets": [
+        IndexModel([("field", 1), ("value", 1)], unique=True),
+        IndexModel([("field", 1), ("count", -1), ("value", 1)])
+    ],
+    "quality_logs": [
+        IndexModel("dataset_id"),
+        IndexModel([("timestamp", 1), ("_id", 1)]),
+        IndexModel([("dataset_id", 1), ("timestamp", -1), ("_id", -1)])
+    ],
+    "quality_log_buckets": [
+        IndexModel([("dataset_id", 1), ("bucket", 1)], unique=True),
+        IndexModel("bucket")
+    ],
+    "quality_status_runs": [
+        IndexModel([("dataset_id", 1), ("first_ts", -1), ("_id", -1)]),
+        IndexModel([("dataset_id", 1)], name="open_run", unique=True, partialFilterExpression={"open": True})
+    ],
+    "jobs": [
+        IndexModel([("type", 1), ("_id", -1)]),
+        IndexModel([("status", 1), ("_id", -1)]),
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ],
+    "idempotency_keys": [
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ]
+}
+
+# Indexes replaced by the ones above, dropped once their replacements exist
+OBSOLETE_INDEXES = {
+    "datasets": ["name_1", "owner_1", "tags_1", "created_at_-1", "is_deleted_1"],
+    "quality_logs": ["timestamp_-1", "dataset_id_1_timestamp_-1"],
+    "quality_status_runs": ["dataset_id_1_first_ts_-1"]
+}
+
+READ_PREFERENCES = {
+    "primary": lambda max_staleness: Primary(),
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+
+def operation_options(read_preference: str = "primary", read_concern: str = "",
+                      write_concern: str = "") -> Dict[str, Any]:
+    """Collection options for an operation class, leaving out those that keep the client's defaults"""
+    if read_preference not in READ_PREFERENCES:
+        raise ValueError(f"Read preference must be one of: {', '.join(READ_PREFERENCES)}")
+    
+    options = {}
+    if read_preference != "primary":
+        options["read_preference"] = READ_PREFERENCES[read_preference](max_staleness=Config.MONGO_MAX_STALENESS_SECONDS)
+    if read_concern:
+        options["read_concern"] = ReadConcern(read_concern)
+    if write_concern:
+        options["write_concern"] = WriteConcern(w=int(write_concern) if write_concern.isdigit() else write_concern)
+    return options
+
+# Per operation class, as named by the services' guarded() calls. Writes
+# always go to the primary; calls outside any class use the client defaults.
+OPERATION_OPTIONS = {
+    "lookup": operation_options(Config.MONGO_READ_PREFERENCE_LOOKUP, Config.MONGO_READ_CONCERN_LOOKUP),
+    "list": operation_options(Config.MONGO_READ_PREFERENCE_LIST, Config.MONGO_READ_CONCERN_LIST),
+    "aggregate": operation_options(Config.MONGO_READ_PREFERENCE_AGGREGATE, Config.MONGO_READ_CONCERN_AGGREGATE),
+    "write": operation_options(write_concern=Config.MONGO_WRITE_CONCERN)
+}
+
+_operation = ContextVar("storage_operation", default=None)
+
+@contextmanager
+def operation_scope(operation: str):
+    """Route the collection calls made inside the block with the options of an operation class"""
+    token = _operation.set(operation)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+def routed(collection):
+    """The collection with the read preference, read concern and write concern of the current operation class"""
+    options = OPERATION_OPTIONS.get(_operation.get())
+    return collection.with_options(**options) if options else collection
+
 def init_db():
     """Initialize MongoDB connection"""
     global client, db
+    if Config.STORAGE_BACKEND == 'memory':
+        logging.info("Using in-memory storage, skipping MongoDB connection")
+        return
+    
     try:
-        client = MongoClient(Config.MONGODB_URI)
+        event_listeners = [mongo_command_metrics] if Config.METRICS_ENABLED else []
+        if Config.SLOW_QUERY_THRESHOLD_MS > 0:
+            event_listeners.append(slow_query_recorder)
+        client = MongoClient(Config.MONGODB_URI, event_listeners=event_listeners)
         db = client[Config.MONGODB_DB]
         
         client.admin.command('ping')
         logging.info("Successfully connected to MongoDB")
         
-        create_indexes()
+        if Config.INDEX_BUILD_MODE == 'startup':
+            create_indexes()
+        elif Config.INDEX_BUILD_MODE == 'background':
+            threading.Thread(target=create_indexes, name="create-indexes", daemon=True).start()
         
     except Exception as e:
         logging.error(f"Failed to connect to MongoDB: {e}")
         raise
 
 def create_indexes():
-    """Create database indexes for better performance"""
+    """Create the indexes in INDEXES that do not exist yet, drop OBSOLETE_INDEXES and return the created names"""
     if db is None:
         logging.error("Database not initialized")
-        return
-        
+        return []
+    
+    created = []
     try:
-        db.datasets.create_index("name")
-        db.datasets.create_index("owner")
-        db.datasets.create_index("tags")
-        db.datasets.create_index("is_deleted")
-        
-        db.quality_logs.create_index("dataset_id")
-        db.quality_logs.create_index("timestamp")
+        for collection, indexes in INDEXES.items():
+            existing = list(db[collection].list_indexes())
+            missing = []
+            for index in indexes:
+                wanted = index.document
+                key = tuple(wanted["key"].items())
+                conflicts = [
+                    current for current in existing
+                    if current["name"] == wanted["name"] or tuple(current["key"].items()) == key
+                ]
+                if any(
+                    tuple(current["key"].items()) == key
+                    and current.get("partialFilterExpression") == wanted.get("partialFilterExpression")
+                    for current in conflicts
+                ):
+                    continue
+                # MongoDB keeps one index per name and per key pattern, so an
+                # index that differs only in its filter has to go first.
+                for current in conflicts:
+                    db[collection].drop_index(current["name"])
+                    existing.remove(current)
+                missing.append(index)
+            if missing:
+                created += db[collection].create_indexes(missing)
+            
+            for name in OBSOLETE_INDEXES.get(collection, ()):
+                if any(current["name"] == name for current in existing):
+                    db[collection].drop_index(name)
         
-        logging.info("Database indexes created successfully")
+        logging.info(f"Database indexes reconciled, created: {created or 'none'}")
     except Exception as e:
         logging.error(f"Failed to create indexes: {e}")
+    return created
 
 def get_db():
     """Get database instance"""
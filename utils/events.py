@@ -0,0 +1,105 @@
+import json
+import queue
+import threading
+from collections import OrderedDict
+from config import Config
+from utils.helpers import serialize_doc
+
+class Subscription:
+    """A single SSE client's bounded event queue and filters"""
+
+    def __init__(self, filters: dict, max_queue: int):
+        self.filters = {key: value for key, value in filters.items() if value}
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def matches(self, event: dict) -> bool:
+        """Check whether an event passes this subscription's filters"""
+        if "dataset_id" in self.filters and str(event["dataset_id"]) != self.filters["dataset_id"]:
+            return False
+        if "status" in self.filters and event["status"] != self.filters["status"]:
+            return False
+        if "owner" in self.filters and event.get("owner") != self.filters["owner"]:
+            return False
+        if "tag" in self.filters and self.filters["tag"] not in (event.get("tags") or []):
+            return False
+        return True
+
+    def get(self, timeout: float):
+        """Wait for the next event, or None on timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class QualityEventBroker:
+    """In-process fan-out of quality log events to SSE subscribers"""
+
+    def __init__(self, max_queue: int, dedupe_size: int = 10000):
+        self.max_queue = max_queue
+        self.dedupe_size = dedupe_size
+        self._subscribers = set()
+        self._recent_ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def subscribe(self, filters: dict) -> Subscription:
+        """Register a new subscriber"""
+        subscription = Subscription(filters, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: dict):
+        """Deliver an event to every matching subscriber, dropping subscribers that fall behind"""
+        with self._lock:
+            event_id = event["id"]
+            if event_id in self._recent_ids:
+                return
+            self._recent_ids[event_id] = True
+            if len(self._recent_ids) > self.dedupe_size:
+                self._recent_ids.popitem(last=False)
+
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            if subscription.overflowed or not subscription.matches(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+
+    def has_published(self, event_id: str) -> bool:
+        """Check whether an event was recently delivered"""
+        with self._lock:
+            return event_id in self._recent_ids
+
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers"""
+        with self._lock:
+            return len(self._subscribers)
+
+def build_quality_event(log_doc: dict, dataset: dict = None) -> dict:
+    """Build a quality log event, denormalizing the dataset's owner and tags for filtering"""
+    dataset = dataset or {}
+    return {
+        "id": str(log_doc["_id"]),
+        "dataset_id": log_doc["dataset_id"],
+        "owner": dataset.get("owner"),
+        "tags": dataset.get("tags", []),
+        "status": getattr(log_doc["status"], "value", log_doc["status"]),
+        "details": log_doc.get("details"),
+        "timestamp": log_doc["timestamp"]
+    }
+
+def format_sse(event: dict, event_type: str = "quality_log") -> str:
+    """Format an event as a Server-Sent Events message"""
+    return f"id: {event['id']}\nevent: {event_type}\ndata: {json.dumps(serialize_doc(event))}\n\n"
+
+quality_event_broker = QualityEventBroker(Config.SSE_QUEUE_SIZE)
@@ -0,0 +1,48 @@
+"""
+Response formats picked from the Accept header.
+
+Success responses are JSON unless the client prefers application/msgpack,
+which encodes the same envelope (with the same string IDs and ISO dates) when
+the optional msgpack package is installed. Routes that return stored
+documents as they are (dataset listings and details, quality log listings)
+also offer application/bson: the documents are fetched as RawBSONDocument
+and their bytes are copied into the response without being decoded, so they
+keep their BSON types, with _id as an ObjectId and dates as BSON datetimes.
+Error responses are always JSON.
+"""
+import bson
+from flask import Response, request
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+BSON = "application/bson"
+
+def offered_formats(raw_bson: bool = False):
+    formats = [JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    if raw_bson:
+        formats.append(BSON)
+    return formats
+
+def response_format(raw_bson: bool = False) -> str:
+    """The format the request's Accept header prefers among those the route offers, JSON if none matches"""
+    if not request.accept_mimetypes:
+        return JSON
+    return request.accept_mimetypes.best_match(offered_formats(raw_bson), default=JSON)
+
+def wants_raw_bson() -> bool:
+    """Whether a route that can return stored documents as raw BSON should fetch them that way"""
+    return response_format(raw_bson=True) == BSON
+
+def binary_response(body, mimetype: str, status_code: int = 200) -> Response:
+    """Encode a response envelope as MessagePack or BSON"""
+    data = msgpack.packb(body) if mimetype == MSGPACK else bson.encode(body)
+    response = Response(data, status=status_code, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
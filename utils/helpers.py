@@ -1,6 +1,7 @@
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timezone
 from flask import jsonify
+from utils.formats import BSON, JSON, binary_response, response_format
 
 def serialize_doc(doc):
     """Convert MongoDB document to JSON serializable format"""
@@ -37,13 +38,38 @@ def validate_object_id(id_string):
     except:
         return False
 
+def parse_datetime_param(value, default=None):
+    """Parse an ISO 8601 query parameter into a naive UTC datetime"""
+    if value is None or value == '':
+        return default
+    
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    return parsed
+
 def create_error_response(message, status_code=400):
     """Create standardized error response"""
     return jsonify({"error": message}), status_code
 
-def create_success_response(data, message=None, status_code=200):
-    """Create standardized success response"""
+def create_success_response(data, message=None, status_code=200, raw_bson=False):
+    """Create standardized success response in the format the client accepts (utils.formats);
+    raw_bson means data holds RawBSONDocuments for a client that asked for BSON"""
     response = {"data": data}
     if message:
         response["message"] = message
-    return jsonify(response), status_code
+    
+    mimetype = BSON if raw_bson else response_format()
+    if mimetype != JSON:
+        return binary_response(response, mimetype, status_code), status_code
+    
+    response = jsonify(response)
+    response.vary.add("Accept")
+    return response, status_code
+
+def create_unavailable_response(retry_after):
+    """Create a 503 response telling the client when to retry"""
+    response, status_code = create_error_response("Storage temporarily unavailable, retry later", 503)
+    response.headers["Retry-After"] = str(retry_after)
+    return response, status_code
@@ -0,0 +1,130 @@
+"""
+Idempotency-Key support for the POST routes that create documents.
+
+A client that may retry a request sends the same Idempotency-Key header with
+every attempt. The first attempt claims the key in the idempotency_keys
+collection (the key's digest is the _id, and a TTL index drops records at
+expires_at) and runs. Its response, unless it is a server error, is stored
+for IDEMPOTENCY_TTL_SECONDS, and repeats get that response back with an
+Idempotent-Replayed header without the view running again. A repeat that
+arrives while the first attempt is still running waits for it for up to
+IDEMPOTENCY_WAIT_MS and then gets 409. Reusing a key for a different body
+gets 422.
+
+Keys are scoped to the method, the path and the X-API-Key header. A claim
+held by a worker that died can be taken over after IDEMPOTENCY_LOCK_SECONDS.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, current_app, request
+from config import Config
+from services.storage import get_idempotency_repository
+from utils.helpers import create_error_response, create_unavailable_response
+from utils.metrics import registry, Counter
+from utils.resilience import StorageUnavailable, run_guarded
+
+MAX_KEY_LENGTH = 255
+
+idempotent_requests_total = registry.register(Counter(
+    "idempotent_requests_total",
+    "Requests carrying an Idempotency-Key by outcome: claimed (ran the view), replayed, "
+    "in_progress (gave up waiting for the first attempt) or mismatch (key reused for another body)",
+    ("outcome",)
+))
+
+def record_id(key: str) -> str:
+    scope = "\n".join((request.method, request.path, request.headers.get('X-API-Key', ''), key))
+    return hashlib.blake2b(scope.encode(), digest_size=16).hexdigest()
+
+def request_fingerprint() -> str:
+    return hashlib.blake2b(request.get_data(), digest_size=16).hexdigest()
+
+def replay(record) -> Response:
+    stored = record["response"]
+    response = Response(stored["body"], status=stored["status"], mimetype=stored["mimetype"])
+    response.headers["Idempotent-Replayed"] = "true"
+    response.vary.add("Accept")
+    return response
+
+def claim_or_wait(repository, key_id: str, fingerprint: str):
+    """Claim the key and return None, or return the response for a repeat"""
+    deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT_MS / 1000
+    delay = 0.01
+    record = None
+    while True:
+        if record is None:
+            now = datetime.utcnow()
+            record = run_guarded("write", lambda: repository.claim({
+                "_id": key_id,
+                "fingerprint": fingerprint,
+                "status": "pending",
+                "locked_until": now + timedelta(seconds=Config.IDEMPOTENCY_LOCK_SECONDS),
+                "expires_at": now + timedelta(seconds=Config.IDEMPOTENCY_TTL_SECONDS)
+            }, now))
+            if record is None:
+                idempotent_requests_total.inc(("claimed",))
+                return None
+
+        if record["fingerprint"] != fingerprint:
+            idempotent_requests_total.inc(("mismatch",))
+            return create_error_response("Idempotency-Key was already used for a different request", 422)
+        if record["status"] == "done":
+            idempotent_requests_total.inc(("replayed",))
+            return replay(record)
+        if time.monotonic() + delay > deadline:
+            idempotent_requests_total.inc(("in_progress",))
+            response, status_code = create_error_response(
+                "A request with this Idempotency-Key is still in progress", 409
+            )
+            response.headers["Retry-After"] = "1"
+            return response, status_code
+
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+        record = run_guarded("write", lambda: repository.find(key_id))
+
+def settle(action: str, call):
+    """Record the outcome of a claimed key; failures are logged since the response is already decided"""
+    try:
+        run_guarded("write", call)
+    except Exception as e:
+        logging.warning(f"Could not {action} Idempotency-Key record: {e}")
+
+def idempotent(view):
+    """Replay the stored response to requests repeating an Idempotency-Key instead of running the view again"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            return create_error_response(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+        repository = get_idempotency_repository()
+        key_id = record_id(key)
+        try:
+            repeated = claim_or_wait(repository, key_id, request_fingerprint())
+        except StorageUnavailable as e:
+            return create_unavailable_response(e.retry_after)
+        if repeated is not None:
+            return repeated
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            settle("release", lambda: repository.release(key_id))
+            raise
+
+        if response.status_code >= 500:
+            settle("release", lambda: repository.release(key_id))
+        else:
+            stored = {"status": response.status_code, "mimetype": response.mimetype, "body": response.get_data()}
+            expires_at = datetime.utcnow() + timedelta(seconds=Config.IDEMPOTENCY_TTL_SECONDS)
+            settle("store", lambda: repository.complete(key_id, stored, expires_at))
+        return response
+
+    return wrapper
@@ -0,0 +1,164 @@
+"""
+Bounded in-process runner for background jobs.
+
+Jobs are documents in the jobs collection (services.storage JobRepository),
+so any worker can answer a status poll or take a cancellation; the work
+itself runs on a thread pool of JOBS_MAX_WORKERS in the worker that accepted
+the job, with at most JOBS_MAX_QUEUED more waiting. Storage calls inside a
+job get JOBS_BUDGET_MS instead of the per-request budgets.
+
+A job moves from queued to running to succeeded, failed or cancelled.
+Cancelling a queued job takes effect at once; a running job stops at its
+next JobContext.progress() or check() call. The runner refreshes
+heartbeat_at on its jobs every JOBS_HEARTBEAT_SECONDS, so a job whose worker
+went away is reported as failed once its heartbeat is stale.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import Config
+from utils.metrics import registry, Counter, Gauge
+from utils.resilience import budget_scope
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+jobs_total = registry.register(Counter(
+    "jobs_total", "Background jobs finished by type and outcome", ("type", "outcome")
+))
+jobs_in_progress = registry.register(Gauge(
+    "jobs_in_progress", "Background jobs queued or running in this worker", ("state",)
+))
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been asked to stop"""
+
+class JobQueueFull(Exception):
+    """Raised when this worker already holds JOBS_MAX_QUEUED waiting jobs"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many background jobs queued")
+        self.retry_after = retry_after
+
+class JobContext:
+    """Passed to a running job to report progress and notice cancellation"""
+
+    # Cancellation is read from the job document at most this often
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, job_id, repository):
+        self.job_id = job_id
+        self.repository = repository
+        self._checked_at = time.monotonic()
+
+    def progress(self, done: int, total: int = None):
+        """Record how far the job is, then stop if it was cancelled"""
+        self.repository.update(self.job_id, {"progress": {"done": done, "total": total}})
+        self.check(force=True)
+
+    def check(self, force: bool = False):
+        """Raise JobCancelled if the job was asked to stop"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        job = self.repository.find(self.job_id)
+        if job is None or job.get("cancel_requested"):
+            raise JobCancelled()
+
+class JobRunner:
+    """Run job functions on a bounded thread pool, recording their outcome on the job documents"""
+
+    def __init__(self, max_workers: int, max_queued: int, budget_ms: int, heartbeat_seconds: float,
+                 retention_days: float):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.budget_ms = budget_ms
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retention = timedelta(days=retention_days)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._heartbeat = None
+        self._queued = {}
+        self._running = {}
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return len(self._queued) < self.max_queued
+
+    def submit(self, job_id, job_type: str, repository, run):
+        """Queue run(context) for the inserted job document job_id"""
+        with self._lock:
+            if len(self._queued) >= self.max_queued:
+                raise JobQueueFull(max(1, int(self.heartbeat_seconds)))
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="job")
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+            self._queued[job_id] = repository
+        jobs_in_progress.inc((QUEUED,))
+        self._executor.submit(self._run, job_id, job_type, repository, run)
+
+    def _run(self, job_id, job_type, repository, run):
+        with self._lock:
+            self._running[job_id] = self._queued.pop(job_id)
+        jobs_in_progress.dec((QUEUED,))
+        jobs_in_progress.inc((RUNNING,))
+        try:
+            now = datetime.utcnow()
+            if not repository.update(job_id, {"status": RUNNING, "started_at": now, "heartbeat_at": now}, (QUEUED,)):
+                return
+            fields = self._execute(job_id, repository, run)
+            finished_at = datetime.utcnow()
+            fields.update(finished_at=finished_at, expires_at=finished_at + self.retention)
+            repository.update(job_id, fields, (RUNNING,))
+            jobs_total.inc((job_type, fields["status"]))
+        except Exception:
+            logging.exception(f"Could not record the outcome of job {job_id}")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            jobs_in_progress.dec((RUNNING,))
+
+    def _execute(self, job_id, repository, run):
+        try:
+            with budget_scope(self.budget_ms):
+                return {"status": SUCCEEDED, "result": run(JobContext(job_id, repository))}
+        except JobCancelled:
+            return {"status": CANCELLED}
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed")
+            return {"status": FAILED, "error": str(e)}
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                held = list(self._queued.items()) + list(self._running.items())
+            by_repository = {}
+            for job_id, repository in held:
+                by_repository.setdefault(id(repository), (repository, []))[1].append(job_id)
+            for repository, job_ids in by_repository.values():
+                try:
+                    repository.heartbeat(job_ids, datetime.utcnow())
+                except Exception as e:
+                    logging.warning(f"Job heartbeat failed: {e}")
+
+    def is_stale(self, job) -> bool:
+        """Whether an unfinished job has not been heartbeated for three intervals"""
+        if job["status"] in FINISHED:
+            return False
+        deadline = datetime.utcnow() - timedelta(seconds=3 * self.heartbeat_seconds)
+        return job.get("heartbeat_at", job["created_at"]) < deadline
+
+job_runner = JobRunner(
+    Config.JOBS_MAX_WORKERS, Config.JOBS_MAX_QUEUED, Config.JOBS_BUDGET_MS, Config.JOBS_HEARTBEAT_SECONDS,
+    Config.JOBS_RETENTION_DAYS
+)
@@ -0,0 +1,222 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, request
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, label_values=()):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name, _format_labels(self.label_names, label_values), value
+
+class Gauge(Counter):
+    """Value that can go up and down, keyed by label values"""
+
+    kind = "gauge"
+
+    def dec(self, label_values=(), amount=1):
+        self.inc(label_values, -amount)
+
+    def set(self, label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+class Histogram:
+    """Cumulative histogram keyed by label values"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(e[0]), e[1], e[2])) for labels, e in self._values.items()]
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.label_names, label_values, ("le", repr(bound))),
+                       cumulative)
+            yield (f"{self.name}_bucket",
+                   _format_labels(self.label_names, label_values, ("le", "+Inf")),
+                   count)
+            yield f"{self.name}_sum", _format_labels(self.label_names, label_values), total
+            yield f"{self.name}_count", _format_labels(self.label_names, label_values), count
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status code",
+    ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and method",
+    ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+
+mongo_commands_total = registry.register(Counter(
+    "mongo_commands_total", "MongoDB commands by command, collection and outcome",
+    ("command", "collection", "outcome")
+))
+mongo_command_duration_seconds = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by command and collection",
+    ("command", "collection")
+))
+mongo_documents_returned_total = registry.register(Counter(
+    "mongo_documents_returned_total", "Documents returned by MongoDB read commands",
+    ("command", "collection")
+))
+mongo_documents_written_total = registry.register(Counter(
+    "mongo_documents_written_total", "Documents inserted, matched or deleted by MongoDB write commands",
+    ("command", "collection")
+))
+
+READ_COMMANDS = {"find", "aggregate", "getMore"}
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+IGNORED_COMMANDS = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Record per-command, per-collection durations and document counts"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return
+
+        labels = (event.command_name, collection)
+        mongo_commands_total.inc(labels + ("success",))
+        mongo_command_duration_seconds.observe(labels, event.duration_micros / 1e6)
+
+        reply = event.reply
+        if event.command_name in READ_COMMANDS:
+            cursor = reply.get("cursor") or {}
+            batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+            if batch is not None:
+                mongo_documents_returned_total.inc(labels, len(batch))
+        elif event.command_name in WRITE_COMMANDS:
+            mongo_documents_written_total.inc(labels, reply.get("n", 0))
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return
+
+        labels = (event.command_name, collection)
+        mongo_commands_total.inc(labels + ("failure",))
+        mongo_command_duration_seconds.observe(labels, event.duration_micros / 1e6)
+
+mongo_command_metrics = MongoCommandMetrics()
+
+def init_metrics(app):
+    """Record request latency, status codes and in-flight counts, and serve them on /metrics"""
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_started = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            http_requests_in_flight.dec()
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            http_requests_total.inc((request.method, route, str(response.status_code)))
+            http_request_duration_seconds.observe((request.method, route), time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def release_in_flight(error=None):
+        if g.pop('_metrics_started', None) is not None:
+            http_requests_in_flight.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,194 @@
+"""
+Opt-in sampling profiler for single requests.
+
+A request is profiled when it carries an X-Profile: true header along with
+the admin token (utils.admin), or at random with probability
+PROFILING_SAMPLE_RATE. A
+daemon thread samples the request thread's stack every PROFILING_INTERVAL_MS
+and produces:
+
+- collapsed stacks ("frame;frame;frame count" lines) for flamegraph.pl or
+  speedscope
+- the request's wall time split into phases by the innermost phase function
+  on each sampled stack: parse (reading the body), validate (pydantic), db
+  (storage calls through run_guarded), serialize (serialize_doc) and encode
+  (JSON, MessagePack or BSON encoding), with everything else under "other"
+
+Profiled responses carry X-Profile-Id and a Server-Timing header with the
+phases. The last PROFILING_KEEP profiles are served on /admin/profiles, and
+written to PROFILING_DIR if it is set. When neither ADMIN_TOKEN nor a sample
+rate is configured no hook is registered.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, OrderedDict, defaultdict
+from bson import ObjectId
+from flask import Response, g, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.wrappers.request import Request
+from utils.admin import has_admin_token, admin_required
+from utils.formats import binary_response
+from utils.helpers import serialize_doc, create_error_response
+from utils.resilience import run_guarded
+from utils.validation import validate_json, validate_json_list
+
+PHASES = ("parse", "validate", "db", "serialize", "encode", "other")
+
+PHASE_CODES = {
+    Request.get_data.__code__: "parse",
+    validate_json.__code__: "validate",
+    validate_json_list.__code__: "validate",
+    run_guarded.__code__: "db",
+    serialize_doc.__code__: "serialize",
+    DefaultJSONProvider.response.__code__: "encode",
+    binary_response.__code__: "encode"
+}
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class RequestSampler(threading.Thread):
+    """Sample one thread's stack at a fixed interval until stopped"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = StackCounter()
+        self.phase_seconds = defaultdict(float)
+        self._stopped = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.sample(frame, now - last)
+            last = now
+
+    def sample(self, frame, elapsed: float):
+        """Count a stack and charge the time since the previous sample to its phase"""
+        codes = []
+        phase = None
+        while frame is not None:
+            if phase is None:
+                phase = PHASE_CODES.get(frame.f_code)
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        self.stacks[tuple(reversed(codes))] += 1
+        self.phase_seconds[phase or "other"] += elapsed
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        """Sampled stacks in the collapsed format read by flamegraph.pl"""
+        return "\n".join(
+            f"{';'.join(frame_label(code) for code in stack)} {count}"
+            for stack, count in self.stacks.most_common()
+        )
+
+class ProfileStore:
+    """The most recent profiles in this worker, optionally also written to a directory"""
+
+    def __init__(self, keep: int, directory=None):
+        self.keep = keep
+        self.directory = directory
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles[profile["id"]] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        if self.directory:
+            path = os.path.join(self.directory, profile["id"])
+            with open(f"{path}.collapsed", "w") as f:
+                f.write(profile["collapsed"])
+            with open(f"{path}.json", "w") as f:
+                json.dump({key: value for key, value in profile.items() if key != "collapsed"}, f, indent=2)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self):
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [{key: value for key, value in profile.items() if key != "collapsed"} for profile in reversed(profiles)]
+
+def init_profiling(app):
+    """Profile requests that ask for it with the admin token, or a random sample of them"""
+    sample_rate = app.config['PROFILING_SAMPLE_RATE']
+    interval = app.config['PROFILING_INTERVAL_MS'] / 1000
+    store = ProfileStore(app.config['PROFILING_KEEP'], app.config['PROFILING_DIR'])
+    if store.directory:
+        os.makedirs(store.directory, exist_ok=True)
+    app.extensions['profiles'] = store
+
+    @app.before_request
+    def start_profiler():
+        if request.path.startswith('/admin/profiles'):
+            return
+        requested = request.headers.get('X-Profile', '').lower() == 'true' and has_admin_token()
+        if requested or (sample_rate and random.random() < sample_rate):
+            sampler = RequestSampler(threading.get_ident(), interval)
+            g._profile = (sampler, time.perf_counter())
+            sampler.start()
+
+    @app.after_request
+    def finish_profile(response):
+        profiling = g.pop('_profile', None)
+        if profiling is None:
+            return response
+        sampler, started = profiling
+        sampler.stop()
+        duration = time.perf_counter() - started
+
+        profile_id = str(ObjectId())
+        phases = {phase: round(sampler.phase_seconds.get(phase, 0.0) * 1000, 3) for phase in PHASES}
+        store.add({
+            "id": profile_id,
+            "method": request.method,
+            "path": request.full_path.rstrip('?'),
+            "route": request.url_rule.rule if request.url_rule is not None else None,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "samples": sum(sampler.stacks.values()),
+            "interval_ms": interval * 1000,
+            "phases_ms": phases,
+            "collapsed": sampler.collapsed()
+        })
+        response.headers['X-Profile-Id'] = profile_id
+        response.headers['Server-Timing'] = ", ".join(
+            [f"{phase};dur={ms}" for phase, ms in phases.items() if ms] + [f"total;dur={duration * 1000:.3f}"]
+        )
+        return response
+
+    @app.teardown_request
+    def stop_profiler(error=None):
+        profiling = g.pop('_profile', None)
+        if profiling is not None:
+            profiling[0].stop()
+
+    @app.route('/admin/profiles')
+    @admin_required
+    def list_profiles():
+        return {"data": store.summaries()}
+
+    @app.route('/admin/profiles/<profile_id>')
+    @admin_required
+    def get_profile(profile_id):
+        profile = store.get(profile_id)
+        if profile is None:
+            return create_error_response("Profile not found", 404)
+        if request.args.get('format') == 'collapsed':
+            return Response(profile["collapsed"], mimetype='text/plain')
+        return {"data": profile}
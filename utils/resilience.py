@@ -0,0 +1,178 @@
+"""
+Time budgets and a circuit breaker around storage calls.
+
+Every service call runs inside a pymongo.timeout() for its operation class,
+which bounds server selection, socket reads and maxTimeMS together, and with
+that class's read and write settings (utils.database.routed). Timeouts
+and connection failures count against a process-wide circuit breaker; once
+it opens, calls fail fast with StorageUnavailable, or return a stale cached
+value marked with an X-Cache-Status: stale response header, until a probe
+succeeds after the cool-down.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import pymongo
+from flask import g, has_request_context
+from pymongo.errors import PyMongoError, ConnectionFailure
+from config import Config
+from utils.database import operation_scope
+from utils.metrics import registry, Counter, Gauge
+
+QUERY_BUDGETS_MS = {
+    "lookup": Config.MONGO_BUDGET_LOOKUP_MS,
+    "list": Config.MONGO_BUDGET_LIST_MS,
+    "aggregate": Config.MONGO_BUDGET_AGGREGATE_MS,
+    "write": Config.MONGO_BUDGET_WRITE_MS
+}
+
+# Background jobs run the same service calls with a longer budget
+_budget_override = ContextVar("budget_override", default=None)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+circuit_breaker_open = registry.register(Gauge(
+    "circuit_breaker_open", "1 while the storage circuit breaker is open or half-open"
+))
+degraded_responses_total = registry.register(Counter(
+    "degraded_responses_total", "Storage calls answered without the database, by operation and outcome",
+    ("operation", "outcome")
+))
+
+class StorageUnavailable(Exception):
+    """Raised when the database timed out or the circuit breaker is open and nothing stale is cached"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Storage temporarily unavailable")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Open after consecutive failures and let one probe through per cool-down"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the database; moves an open breaker to half-open after the cool-down"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() >= self._opened_at + self.reset_seconds:
+                self._state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
+        circuit_breaker_open.set((), 0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            is_open = self._state == OPEN
+        if is_open:
+            circuit_breaker_open.set((), 1)
+
+    def record_abandoned(self):
+        """Put a half-open breaker back to open when its probe ended without an answer either way"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = OPEN
+
+    def retry_after(self) -> int:
+        """Seconds until the next probe, rounded up, for the Retry-After header"""
+        with self._lock:
+            if self._state == CLOSED:
+                return 1
+            return max(1, int(self._opened_at + self.reset_seconds - time.monotonic() + 0.999))
+
+    def reset(self):
+        """Close the breaker and forget past failures"""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = 0.0
+        circuit_breaker_open.set((), 0)
+
+mongo_breaker = CircuitBreaker(Config.CIRCUIT_BREAKER_FAILURES, Config.CIRCUIT_BREAKER_RESET_SECONDS)
+
+def is_unavailable_error(error: PyMongoError) -> bool:
+    """Whether an error means the database is slow or unreachable rather than the request being wrong"""
+    return isinstance(error, ConnectionFailure) or error.timeout
+
+@contextmanager
+def budget_scope(budget_ms: int):
+    """Give every storage call in the block budget_ms instead of its operation class's budget"""
+    token = _budget_override.set(budget_ms)
+    try:
+        yield
+    finally:
+        _budget_override.reset(token)
+
+def run_guarded(operation, query):
+    """Run a storage call within the operation's time budget, through the circuit breaker"""
+    if not mongo_breaker.allow():
+        raise StorageUnavailable(mongo_breaker.retry_after())
+    
+    budget_ms = _budget_override.get() or QUERY_BUDGETS_MS[operation]
+    try:
+        with pymongo.timeout(budget_ms / 1000), operation_scope(operation):
+            result = query()
+    except PyMongoError as e:
+        if not is_unavailable_error(e):
+            mongo_breaker.record_success()
+            raise
+        mongo_breaker.record_failure()
+        raise StorageUnavailable(mongo_breaker.retry_after()) from e
+    except BaseException:
+        mongo_breaker.record_abandoned()
+        raise
+    
+    mongo_breaker.record_success()
+    return result
+
+def serve_stale(operation, stale, error: StorageUnavailable):
+    """Answer with a stale cached value after a storage failure, or re-raise the failure if there is none"""
+    cached = stale() if stale is not None else None
+    if cached is None:
+        degraded_responses_total.inc((operation, "unavailable"))
+        raise error
+    
+    degraded_responses_total.inc((operation, "stale"))
+    if has_request_context():
+        g.served_stale = True
+    return cached
+
+def guarded(operation, query, stale=None):
+    """
+    Run a storage call like run_guarded, falling back to stale when the database cannot answer.
+
+    stale is an optional callable returning a cached value, or None if there
+    is none.
+    """
+    try:
+        return run_guarded(operation, query)
+    except StorageUnavailable as e:
+        return serve_stale(operation, stale, e)
+
+def init_resilience(app):
+    """Mark responses built from stale cached values"""
+
+    @app.after_request
+    def mark_stale_response(response):
+        if g.pop('served_stale', False):
+            response.headers['X-Cache-Status'] = 'stale'
+        return response
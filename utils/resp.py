@@ -0,0 +1,111 @@
+"""
+Minimal client for servers speaking the Redis protocol (RESP2): Redis,
+Valkey, KeyDB, or a stand-in in tests.
+
+Each thread keeps its own connection, and every execute() call writes all of
+its commands at once and then reads the replies, so a batch costs one round
+trip. After a connection error the client fails fast for retry_seconds
+instead of making every caller wait for the connect timeout again.
+"""
+import socket
+import threading
+import time
+from urllib.parse import unquote, urlparse
+from typing import Any, List, Optional, Sequence
+
+class RespError(Exception):
+    """Error reply from the server"""
+
+def encode_command(args: Sequence[Any]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif not isinstance(arg, (bytes, bytearray)):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+def read_reply(reader) -> Any:
+    """Read one reply; error replies are returned as RespError rather than raised"""
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the server")
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply from the server: {line[:40]!r}")
+
+class RespClient:
+    """Pipelining Redis protocol client for redis://[user:password@]host[:port][/db] URLs"""
+
+    def __init__(self, url: str, timeout: float, retry_seconds: float):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader = sock, sock.makefile("rb")
+        setup = []
+        if self.password is not None:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._send(setup)
+
+    def _send(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        self._local.sock.sendall(b"".join(encode_command(command) for command in commands))
+        replies = [read_reply(self._local.reader) for _ in commands]
+        # Every reply is read before raising, so the connection stays in step
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def execute(self, *commands: Sequence[Any]) -> List[Any]:
+        """Send commands in one write and return their replies in order"""
+        if time.monotonic() < self._down_until:
+            raise ConnectionError(f"{self.host}:{self.port} was unreachable less than {self.retry_seconds}s ago")
+        try:
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            return self._send(commands)
+        except (OSError, ValueError):
+            self.close()
+            self._down_until = time.monotonic() + self.retry_seconds
+            raise ConnectionError(f"{self.host}:{self.port} is unreachable")
+
+    def close(self):
+        """Close this thread's connection"""
+        sock: Optional[socket.socket] = getattr(self._local, "sock", None)
+        self._local.sock = self._local.reader = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
@@ -0,0 +1,251 @@
+"""
+Slow MongoDB operations, aggregated by query shape.
+
+A command listener times every find, aggregate, count, distinct and
+findAndModify. Those slower than SLOW_QUERY_THRESHOLD_MS are grouped by
+collection and query shape: the filter or pipeline with literal values
+replaced by "?", so ?owner=a and ?owner=b count as one shape. Each shape
+keeps its count, total, max and last duration, and a summary of
+explain("executionStats") captured on a background thread at most once per
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pymongo import monitoring
+from config import Config
+from utils.metrics import registry, Counter
+
+TRACKED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify"}
+
+# Fields pymongo adds to every command that explain must not repeat
+SESSION_FIELDS = {"lsid", "$clusterTime", "$db", "$readPreference", "txnNumber", "readConcern", "writeConcern"}
+
+slow_queries_total = registry.register(Counter(
+    "mongo_slow_queries_total", "MongoDB commands slower than SLOW_QUERY_THRESHOLD_MS by command and collection",
+    ("command", "collection")
+))
+
+def value_shape(value):
+    """Replace the literal values in a filter with "?", keeping field names, operators and $field paths"""
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [value_shape(item) for item in value]
+        return "?" if all(shape == "?" for shape in shapes) else shapes
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+def spec_shape(value):
+    """Keep a stage specification, replacing only values that vary between calls, like dates and IDs"""
+    if isinstance(value, dict):
+        return {key: spec_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [spec_shape(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return "?"
+
+def pipeline_shape(pipeline):
+    stages = []
+    for stage in pipeline:
+        name, spec = next(iter(stage.items()))
+        if name == "$match":
+            spec = value_shape(spec)
+        elif name in ("$skip", "$limit"):
+            spec = "?"
+        elif name == "$lookup" and "pipeline" in spec:
+            spec = dict(spec_shape(spec), pipeline=pipeline_shape(spec["pipeline"]))
+        elif name == "$facet":
+            spec = {key: pipeline_shape(value) for key, value in spec.items()}
+        else:
+            spec = spec_shape(spec)
+        stages.append({name: spec})
+    return stages
+
+def command_shape(command_name: str, command) -> dict:
+    """The parts of a command that decide its query plan, with literal values normalized"""
+    if command_name == "find":
+        shape = {"filter": value_shape(command.get("filter", {}))}
+        for option in ("sort", "projection"):
+            if command.get(option):
+                shape[option] = spec_shape(command[option])
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": pipeline_shape(command.get("pipeline", []))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": value_shape(command.get("query", {}))}
+    shape = {"query": value_shape(command.get("query", {}))}
+    if command.get("sort"):
+        shape["sort"] = spec_shape(command["sort"])
+    return shape
+
+def explainable(command_name: str, command) -> bool:
+    """Whether explain("executionStats") can run the command without side effects"""
+    if command_name == "findAndModify":
+        return False
+    if command_name == "aggregate":
+        return not any(next(iter(stage)) in ("$out", "$merge") for stage in command.get("pipeline", []))
+    return True
+
+def plan_summary(plan) -> str:
+    """A winning plan as its stages from the root down, with index names, e.g. "LIMIT > FETCH > IXSCAN owner_1" """
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f" {plan['indexName']}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(stages)
+
+def find_key(document, key):
+    """The first value stored under key anywhere in a nested explain result"""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        document = list(document.values())
+    if isinstance(document, list):
+        for item in document:
+            found = find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+def summarize_explain(result) -> dict:
+    stats = find_key(result, "executionStats") or {}
+    planner = find_key(result, "queryPlanner") or {}
+    return {
+        "winning_plan": plan_summary(planner.get("winningPlan", {}).get("queryPlan", planner.get("winningPlan"))),
+        "n_returned": stats.get("nReturned"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "execution_time_ms": stats.get("executionTimeMillis")
+    }
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    """Aggregate slow commands by shape and explain a sample of them"""
+
+    def __init__(self, threshold_ms: float, explain_interval: float, max_shapes: int):
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self.max_shapes = max_shapes
+        self._pending = {}
+        self._shapes = OrderedDict()
+        self._lock = threading.Lock()
+        self._explains = queue.Queue(maxsize=16)
+        self._explainer = None
+
+    def started(self, event):
+        if event.command_name in TRACKED_COMMANDS:
+            self._pending[(event.connection_id, event.request_id)] = (event.command, event.database_name)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed: bool):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            command, database = pending
+            self.record(event.command_name, command, database, duration_ms, failed)
+
+    def record(self, command_name: str, command, database: str, duration_ms: float, failed: bool = False):
+        collection = command.get(command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        shape = command_shape(command_name, command)
+        key = json.dumps([command_name, collection, shape], sort_keys=True)
+        slow_queries_total.inc((command_name, collection))
+        now = time.time()
+
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                entry = self._shapes[key] = {
+                    "command": command_name,
+                    "collection": collection,
+                    "shape": shape,
+                    "count": 0,
+                    "failures": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_ms": 0.0,
+                    "first_seen": datetime.utcnow(),
+                    "explain": None,
+                    "explained_at": None
+                }
+                while len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            self._shapes.move_to_end(key)
+            entry["count"] += 1
+            entry["failures"] += failed
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_ms"] = duration_ms
+            entry["last_seen"] = datetime.utcnow()
+
+            due = entry.get("_explain_after", 0) <= now
+            if due and explainable(command_name, command):
+                entry["_explain_after"] = now + self.explain_interval
+                explain = {field: value for field, value in command.items() if field not in SESSION_FIELDS}
+            else:
+                explain = None
+
+        if explain is not None:
+            self._queue_explain(key, database, explain)
+
+    def _queue_explain(self, key, database, command):
+        if self._explainer is None or not self._explainer.is_alive():
+            self._explainer = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+            self._explainer.start()
+        try:
+            self._explains.put_nowait((key, database, command))
+        except queue.Full:
+            pass
+
+    def _explain_loop(self):
+        from utils import database as storage
+        while True:
+            key, database, command = self._explains.get()
+            try:
+                result = storage.client[database].command("explain", command, verbosity="executionStats")
+                summary = summarize_explain(result)
+            except Exception as e:
+                logging.warning(f"explain of a slow query failed: {e}")
+                summary = {"error": str(e)}
+            with self._lock:
+                entry = self._shapes.get(key)
+                if entry is not None:
+                    entry["explain"] = summary
+                    entry["explained_at"] = datetime.utcnow()
+
+    def report(self, limit: int = 50, sort: str = "total_ms"):
+        """Recorded shapes, slowest first by total, max or count"""
+        with self._lock:
+            entries = [
+                {field: value for field, value in entry.items() if not field.startswith("_")}
+                for entry in self._shapes.values()
+            ]
+        for entry in entries:
+            entry["avg_ms"] = entry["total_ms"] / entry["count"]
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+slow_query_recorder = SlowQueryRecorder(
+    Config.SLOW_QUERY_THRESHOLD_MS, Config.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS, Config.SLOW_QUERY_MAX_SHAPES
+)
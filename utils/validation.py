@@ -0,0 +1,33 @@
+"""
+Request body validation straight from the raw request bytes.
+
+Payloads are validated with pydantic-core's JSON parser, so a body is never
+parsed into Python dicts and then walked a second time by the model. Bulk
+payloads go through a List[Model] TypeAdapter that is built once per model
+and size limit and validates the whole array in one call.
+"""
+from functools import lru_cache
+from typing import Annotated, List, Type, TypeVar
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel], max_items: int) -> TypeAdapter:
+    """Cached adapter for a JSON array of 1 to max_items model payloads"""
+    return TypeAdapter(Annotated[List[model], Field(min_length=1, max_length=max_items)])
+
+def validate_json(model: Type[ModelT], raw: bytes) -> ModelT:
+    """Validate one JSON payload"""
+    return model.model_validate_json(raw)
+
+def validate_json_list(model: Type[ModelT], raw: bytes, max_items: int) -> List[ModelT]:
+    """Validate a JSON array of payloads in one pass"""
+    return list_adapter(model, max_items).validate_json(raw)
+
+def format_validation_error(error: ValidationError) -> str:
+    """Summarize a validation error as 'location: message' pairs"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'body'}: {detail['msg']}"
+        for detail in error.errors(include_url=False)
+    )